@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la recepción de mensajes de Protocol según su tamaño.
+
+Compara, para mensajes con un segmento binario de distintos tamaños:
+- socket síncrono: el _recv_exact original (data += chunk) contra el
+  actual (recv_into en un buffer preasignado)
+- asyncio: asyncio.StreamReader.readexactly contra BufferedStreamReader
+
+Uso (desde TP2/):
+    python -m benchmarks.bench_protocol_receive [--max-mb 32] [--iterations 5]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.protocol import Protocol
+
+
+def legacy_recv_exact(sock, n):
+    """_recv_exact original: concatena cada bloque recibido"""
+    data = b''
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def legacy_receive_frame_socket(sock):
+    """receive_frame_socket con el _recv_exact original"""
+    length, extended = Protocol._parse_length(legacy_recv_exact(sock, 4))
+    flags = 0
+    if extended:
+        flags = legacy_recv_exact(sock, 6)[1]
+    return Protocol._decode_data(flags, legacy_recv_exact(sock, length))
+
+
+def bench_socket(receive, message, iterations):
+    """Segundos por mensaje recibiendo por un socketpair"""
+    left, right = socket.socketpair()
+    sender = threading.Thread(
+        target=lambda: [left.sendall(message) for _ in range(iterations)]
+    )
+    try:
+        start = time.perf_counter()
+        sender.start()
+        for _ in range(iterations):
+            receive(right)
+        elapsed = time.perf_counter() - start
+        sender.join()
+    finally:
+        left.close()
+        right.close()
+    return elapsed / iterations
+
+
+async def bench_asyncio(open_connection, message, iterations):
+    """Segundos por mensaje recibiendo por TCP local con asyncio"""
+    async def handle(reader, writer):
+        for _ in range(iterations):
+            writer.write(message)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await open_connection('127.0.0.1', port)
+    try:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await Protocol.receive_frame(reader)
+        return (time.perf_counter() - start) / iterations
+    finally:
+        writer.close()
+        server.close()
+        await server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de recepción de Protocol')
+    parser.add_argument('--max-mb', type=int, default=32, help='Tamaño máximo de mensaje en MB (default: 32)')
+    parser.add_argument('--iterations', type=int, default=5, help='Mensajes por medición (default: 5)')
+    args = parser.parse_args()
+
+    # De 64 KB al máximo (dejando lugar para el header del mensaje)
+    max_size = min(args.max_mb * 1024 * 1024, Protocol.MAX_MESSAGE_SIZE - 1024)
+    sizes = [64 * 1024]
+    while sizes[-1] * 4 < max_size:
+        sizes.append(sizes[-1] * 4)
+    sizes.append(max_size)
+
+    print(f"{'tamaño':>10} {'socket orig':>12} {'socket nuevo':>13} {'asyncio orig':>13} {'asyncio nuevo':>14}   (MB/s)")
+    for size in sizes:
+        message = Protocol.encode_frame(Protocol.RESPONSE, 1, {'screenshot': os.urandom(size)})
+        mb = len(message) / (1024 * 1024)
+        timings = [
+            bench_socket(legacy_receive_frame_socket, message, args.iterations),
+            bench_socket(Protocol.receive_frame_socket, message, args.iterations),
+            asyncio.run(bench_asyncio(asyncio.open_connection, message, args.iterations)),
+            asyncio.run(bench_asyncio(Protocol.open_connection, message, args.iterations))
+        ]
+        label = f"{size // 1024} KB" if size < 1024 * 1024 else f"{size / (1024 * 1024):.0f} MB"
+        rates = [mb / t for t in timings]
+        print(f"{label:>10} {rates[0]:>12.0f} {rates[1]:>13.0f} {rates[2]:>13.0f} {rates[3]:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
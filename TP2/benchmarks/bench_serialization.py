@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los códecs de common/serialization.py.
+
+Compara el camino original de Protocol (json.dumps/json.loads sobre
+strings) con cada códec registrado, para los mensajes típicos entre
+servidores: una solicitud con 10 KB de HTML y una respuesta con un
+screenshot de 500 KB en base64.
+
+Uso (desde TP2/):
+    python -m benchmarks.bench_serialization [--iterations N]
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.serialization import CODECS
+
+
+def sample_messages():
+    """Mensajes de prueba: (nombre, valor)"""
+    html = ('<div class="item"><a href="/página">Enlace ñ</a><img src="/i.png"></div>\n' * 150)[:10000]
+    screenshot = base64.b64encode(os.urandom(375 * 1024)).decode('ascii')
+    thumbnails = [base64.b64encode(os.urandom(8 * 1024)).decode('ascii') for _ in range(5)]
+    return [
+        ('request_html_10k', {
+            'url': 'https://example.com/',
+            'html': html,
+            'stream': True
+        }),
+        ('response_screenshot_500k', {
+            'screenshot': screenshot,
+            'performance': {'load_time_ms': 1234, 'total_size_kb': 2048, 'num_requests': 42},
+            'thumbnails': thumbnails
+        })
+    ]
+
+
+def legacy_encode(value):
+    """Camino original de Protocol.encode"""
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+def legacy_decode(data):
+    """Camino original de Protocol.receive"""
+    return json.loads(data.decode('utf-8'))
+
+
+def measure(encode, decode, value, iterations):
+    """Devuelve (bytes, µs por encode, µs por decode)"""
+    data = encode(value)
+    assert decode(data) == value
+    encode_us = timeit.timeit(lambda: encode(value), number=iterations) / iterations * 1e6
+    decode_us = timeit.timeit(lambda: decode(data), number=iterations) / iterations * 1e6
+    return len(data), encode_us, decode_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de los códecs de serialización')
+    parser.add_argument('--iterations', type=int, default=200, help='Repeticiones por medición (default: 200)')
+    args = parser.parse_args()
+
+    paths = [('legacy-json', legacy_encode, legacy_decode)]
+    paths += [(name, codec.encode, codec.decode) for name, codec in CODECS.items()]
+
+    print(f"{'mensaje':<26} {'códec':<12} {'bytes':>10} {'encode µs':>11} {'decode µs':>11}")
+    for message_name, value in sample_messages():
+        for codec_name, encode, decode in paths:
+            size, encode_us, decode_us = measure(encode, decode, value, args.iterations)
+            print(f"{message_name:<26} {codec_name:<12} {size:>10} {encode_us:>11.1f} {decode_us:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
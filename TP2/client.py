@@ -8,6 +8,7 @@ import requests
 import argparse
 import json
 import sys
+import time
 
 
 class ScrapingClient:
@@ -23,13 +24,17 @@ class ScrapingClient:
         """
         self.base_url = f"http://{host}:{port}"
     
-    def scrape(self, url, timeout=60):
+    def scrape(self, url, timeout=60, head_only=False, images=True):
         """
         Solicita el scraping de una URL.
         
         Args:
             url: URL a scrapear
             timeout: Timeout en segundos
+            head_only: Si es True, solo se piden los metadatos del <head>
+                (título, meta tags e idioma) a /scrape/head
+            images: Si es False, el servidor omite el screenshot y los
+                thumbnails (no los codifica ni los envía)
             
         Returns:
             Diccionario con los resultados o None si falla
@@ -38,9 +43,13 @@ class ScrapingClient:
             print(f"Solicitando scraping de: {url}")
             print("Esperando respuesta...")
             
+            endpoint = '/scrape/head' if head_only else '/scrape'
+            params = {'url': url}
+            if not images:
+                params['images'] = 'none'
             response = requests.get(
-                f"{self.base_url}/scrape",
-                params={'url': url},
+                f"{self.base_url}{endpoint}",
+                params=params,
                 timeout=timeout
             )
             
@@ -60,6 +69,82 @@ class ScrapingClient:
             print(f"Error: {e}")
             return None
     
+    def scrape_batch(self, urls, concurrency=None, timeout=600):
+        """
+        Solicita el scraping de varias URLs en una sola request.
+        
+        El servidor devuelve NDJSON; los resultados se entregan a medida
+        que llegan, en orden de finalización.
+        
+        Args:
+            urls: Lista de URLs a scrapear
+            concurrency: Máximo de URLs simultáneas (None usa el default del servidor)
+            timeout: Timeout en segundos
+            
+        Yields:
+            Diccionarios con los resultados (incluyen el campo 'index')
+        """
+        body = {'urls': urls}
+        if concurrency:
+            body['concurrency'] = concurrency
+        
+        try:
+            with requests.post(
+                f"{self.base_url}/scrape/batch",
+                json=body,
+                stream=True,
+                timeout=timeout
+            ) as response:
+                if response.status_code != 200:
+                    print(f"Error HTTP {response.status_code}: {response.text}")
+                    return
+                
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+                        
+        except requests.Timeout:
+            print("Error: Timeout esperando respuesta del servidor")
+        except requests.ConnectionError:
+            print("Error: No se pudo conectar al servidor")
+    
+    def crawl(self, urls, options=None, timeout=600):
+        """
+        Solicita un crawl recursivo a partir de una o más URLs.
+        
+        Args:
+            urls: Lista de URLs iniciales
+            options: Diccionario con max_depth, max_pages, same_domain,
+                include, exclude, concurrency, process, robots y crawl_id
+                (opcionales)
+            timeout: Timeout en segundos
+            
+        Yields:
+            Diccionarios con el resultado de cada página (incluyen 'depth')
+            y al final uno con la clave 'summary'
+        """
+        body = dict(options or {}, urls=urls)
+        
+        try:
+            with requests.post(
+                f"{self.base_url}/crawl",
+                json=body,
+                stream=True,
+                timeout=timeout
+            ) as response:
+                if response.status_code != 200:
+                    print(f"Error HTTP {response.status_code}: {response.text}")
+                    return
+                
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+                        
+        except requests.Timeout:
+            print("Error: Timeout esperando respuesta del servidor")
+        except requests.ConnectionError:
+            print("Error: No se pudo conectar al servidor")
+    
     def health_check(self):
         """
         Verifica que el servidor esté activo.
@@ -95,14 +180,21 @@ class ScrapingClient:
         if 'message' in results:
             print(f"Mensaje: {results['message']}")
         
+        if 'bytes_read' in results:
+            descarga = 'completa' if results.get('complete') else 'cancelada tras el <head>'
+            print(f"Bytes leídos: {results['bytes_read']} (descarga {descarga})")
+        
         # Datos de scraping
         if 'scraping_data' in results:
             print("\n--- DATOS DE SCRAPING ---")
             scraping = results['scraping_data']
             
             print(f"Título: {scraping.get('title', 'N/A')}")
-            print(f"Número de enlaces: {len(scraping.get('links', []))}")
-            print(f"Número de imágenes: {scraping.get('images_count', 0)}")
+            if 'links' in scraping:
+                print(f"Número de enlaces: {len(scraping['links'])}")
+                print(f"Número de imágenes: {scraping.get('images_count', 0)}")
+            if scraping.get('language'):
+                print(f"Idioma: {scraping['language']}")
             
             if scraping.get('structure'):
                 print("Estructura de headers:")
@@ -152,9 +244,91 @@ def parse_arguments():
     
     parser.add_argument(
         'url',
+        nargs='?',
         help='URL a scrapear'
     )
     
+    parser.add_argument(
+        '--batch',
+        metavar='ARCHIVO',
+        help='Archivo con una URL por línea para scrapear en lote'
+    )
+    
+    parser.add_argument(
+        '--no-images',
+        action='store_true',
+        help='No pedir el screenshot ni los thumbnails (respuesta más liviana)'
+    )
+    
+    parser.add_argument(
+        '--head-only',
+        action='store_true',
+        help='Solo título, meta tags e idioma: se descarga únicamente el <head> de la página'
+    )
+    
+    parser.add_argument(
+        '--crawl',
+        action='store_true',
+        help='Crawl recursivo (BFS) a partir de la URL indicada'
+    )
+    
+    parser.add_argument(
+        '--depth',
+        type=int,
+        default=2,
+        help='Profundidad máxima del crawl (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--max-pages',
+        type=int,
+        default=100,
+        help='Máximo de páginas del crawl (default: 100)'
+    )
+    
+    parser.add_argument(
+        '--include',
+        metavar='REGEX',
+        help='Seguir solo los enlaces que cumplan la regex'
+    )
+    
+    parser.add_argument(
+        '--exclude',
+        metavar='REGEX',
+        help='No seguir los enlaces que cumplan la regex'
+    )
+    
+    parser.add_argument(
+        '--all-domains',
+        action='store_true',
+        help='Seguir enlaces a otros dominios (por defecto solo el de la URL inicial)'
+    )
+    
+    parser.add_argument(
+        '--crawl-id',
+        metavar='ID',
+        help='Identificador para retomar el crawl si se interrumpe (requiere --crawl-state-dir en el servidor)'
+    )
+    
+    parser.add_argument(
+        '--ignore-robots',
+        action='store_true',
+        help='En modo crawl, no respetar robots.txt'
+    )
+    
+    parser.add_argument(
+        '--process',
+        action='store_true',
+        help='En modo crawl, enviar cada página al servidor de procesamiento'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=None,
+        help='URLs simultáneas en modo batch o crawl (default: el del servidor)'
+    )
+    
     parser.add_argument(
         '--host',
         default='127.0.0.1',
@@ -181,7 +355,89 @@ def parse_arguments():
         help='Imprimir resultado como JSON'
     )
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if not args.url and not args.batch:
+        parser.error('se requiere una URL o --batch')
+    if args.crawl and not args.url:
+        parser.error('--crawl requiere una URL inicial')
+    
+    return args
+
+
+def run_batch(client, args):
+    """Ejecuta el modo batch e imprime cada resultado al llegar"""
+    with open(args.batch, encoding='utf-8') as f:
+        urls = [line.strip() for line in f if line.strip()]
+    
+    ok = 0
+    total = 0
+    for record in client.scrape_batch(urls, args.concurrency, timeout=args.timeout):
+        total += 1
+        if record.get('status') == 'success':
+            ok += 1
+        
+        if args.json:
+            print(json.dumps(record, ensure_ascii=False))
+        else:
+            title = record.get('scraping_data', {}).get('title') or record.get('message', '')
+            print(f"[{record.get('index')}] {record.get('status')} {record.get('url')} - {title}")
+    
+    if not args.json:
+        print(f"\n{ok}/{len(urls)} URLs scrapeadas correctamente")
+    
+    return total == len(urls) and ok == total
+
+
+def run_crawl(client, args):
+    """Ejecuta el modo crawl e imprime cada página al llegar"""
+    options = {
+        'max_depth': args.depth,
+        'max_pages': args.max_pages,
+        'same_domain': not args.all_domains,
+        'process': args.process
+    }
+    if args.ignore_robots:
+        options['robots'] = False
+    if args.include:
+        options['include'] = args.include
+    if args.exclude:
+        options['exclude'] = args.exclude
+    if args.concurrency:
+        options['concurrency'] = args.concurrency
+    if args.crawl_id:
+        options['crawl_id'] = args.crawl_id
+    
+    start = time.monotonic()
+    count = 0
+    summary = None
+    for record in client.crawl([args.url], options, timeout=args.timeout):
+        if 'summary' in record:
+            summary = record['summary']
+            continue
+        
+        count += 1
+        if args.json:
+            print(json.dumps(record, ensure_ascii=False))
+        else:
+            title = record.get('scraping_data', {}).get('title') or record.get('message', '')
+            print(f"[{count}] d={record.get('depth')} {record.get('status')} "
+                  f"{record.get('url')} - {title}")
+    
+    if summary is None:
+        return False
+    
+    if args.json:
+        print(json.dumps({'summary': summary}))
+    else:
+        elapsed = time.monotonic() - start
+        if summary.get('resumed'):
+            print("\nCrawl retomado desde el último checkpoint")
+        print(f"\n{summary['pages']} páginas ({summary['errors']} con error) en "
+              f"{elapsed:.1f}s: {summary['pages_per_sec']} páginas/s")
+        if summary.get('blocked'):
+            print(f"{summary['blocked']} URLs bloqueadas por robots.txt")
+    
+    return summary['errors'] == 0
 
 
 def main():
@@ -198,8 +454,19 @@ def main():
     
     print("Servidor activo ✓")
     
+    if args.batch:
+        sys.exit(0 if run_batch(client, args) else 1)
+    
+    if args.crawl:
+        sys.exit(0 if run_crawl(client, args) else 1)
+    
     # Realizar scraping
-    results = client.scrape(args.url, timeout=args.timeout)
+    results = client.scrape(
+        args.url,
+        timeout=args.timeout,
+        head_only=args.head_only,
+        images=not args.no_images
+    )
     
     # Imprimir resultados
     if args.json:
@@ -1,3 +1,4 @@
-from .protocol import Protocol
+from .protocol import Protocol, MultiplexedClient, Capabilities
+from .document import ParsedDocument
 
-__all__ = ['Protocol']
\ No newline at end of file
+__all__ = ['Protocol', 'MultiplexedClient', 'Capabilities', 'ParsedDocument']
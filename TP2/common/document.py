@@ -0,0 +1,156 @@
+"""
+Documento HTML parseado una única vez y compartido entre extractores.
+"""
+
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin, urlparse
+
+
+class ParsedDocument:
+    """
+    Documento HTML parseado una sola vez.
+
+    Todos los extractores (HTMLParser, MetadataExtractor, ImageProcessor,
+    PerformanceAnalyzer) trabajan sobre el mismo árbol y guardan sus
+    resultados por campo, de modo que cada página se parsea exactamente
+    una vez por nodo. Los valores memorizados son compartidos: los
+    consumidores no deben modificarlos.
+    """
+
+    def __init__(self, html_content):
+        """
+        Parsea el contenido HTML.
+
+        Args:
+            html_content: String (o bytes) con el contenido HTML
+        """
+        self.html = html_content
+        self.soup = BeautifulSoup(html_content, 'lxml')
+        self._cache = {}
+
+    @classmethod
+    def ensure(cls, source):
+        """
+        Devuelve un ParsedDocument a partir de HTML o de un documento ya parseado.
+
+        Args:
+            source: String con HTML, objeto BeautifulSoup o ParsedDocument
+
+        Returns:
+            Instancia de ParsedDocument (la misma si ya lo era)
+        """
+        if isinstance(source, cls):
+            return source
+        if isinstance(source, BeautifulSoup):
+            return cls.from_soup(source)
+        return cls(source)
+
+    @classmethod
+    def from_soup(cls, soup):
+        """
+        Envuelve un árbol BeautifulSoup existente sin volver a parsearlo.
+
+        Args:
+            soup: Objeto BeautifulSoup
+
+        Returns:
+            Instancia de ParsedDocument
+        """
+        document = cls.__new__(cls)
+        document.html = None
+        document.soup = soup
+        document._cache = {}
+        return document
+
+    def memoize(self, key, compute):
+        """
+        Calcula un campo una sola vez y lo reutiliza en llamadas siguientes.
+
+        Args:
+            key: Clave hashable que identifica el campo
+            compute: Función sin argumentos que calcula el valor
+
+        Returns:
+            Valor memorizado del campo
+        """
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def resolve_attribute_urls(self, tag_name, attribute, base_url, **filters):
+        """
+        Resuelve a URLs absolutas un atributo de todos los tags indicados.
+
+        Args:
+            tag_name: Nombre del tag (ej: 'img')
+            attribute: Atributo con la URL (ej: 'src')
+            base_url: URL base para resolver URLs relativas
+            **filters: Filtros adicionales para find_all
+
+        Returns:
+            Lista de URLs absolutas HTTP(S), sin duplicados y en orden de aparición
+        """
+        key = ('urls', tag_name, attribute, base_url, tuple(sorted(filters.items())))
+
+        def compute():
+            urls = []
+            seen = set()
+            for tag in self.soup.find_all(tag_name, **{attribute: True}, **filters):
+                value = tag.get(attribute)
+                if not value:
+                    continue
+                absolute_url = urljoin(base_url, value)
+                if absolute_url not in seen and _is_http_url(absolute_url):
+                    urls.append(absolute_url)
+                    seen.add(absolute_url)
+            return urls
+
+        return self.memoize(key, compute)
+
+    def image_urls(self, base_url):
+        """
+        Extrae las URLs absolutas de todas las imágenes (<img src>).
+
+        Args:
+            base_url: URL base para resolver URLs relativas
+
+        Returns:
+            Lista de URLs absolutas sin duplicados
+        """
+        return self.resolve_attribute_urls('img', 'src', base_url)
+
+    def resource_urls(self, base_url):
+        """
+        Extrae las URLs de recursos (CSS, JS, imágenes) de la página.
+
+        Args:
+            base_url: URL base para resolver URLs relativas
+
+        Returns:
+            Lista de URLs absolutas sin duplicados
+        """
+        def compute():
+            resources = []
+            seen = set()
+            groups = (
+                self.resolve_attribute_urls('link', 'href', base_url, rel='stylesheet'),
+                self.resolve_attribute_urls('script', 'src', base_url),
+                self.image_urls(base_url),
+            )
+            for group in groups:
+                for url in group:
+                    if url not in seen:
+                        resources.append(url)
+                        seen.add(url)
+            return resources
+
+        return self.memoize(('resources', base_url), compute)
+
+
+def _is_http_url(url):
+    """Indica si la URL es HTTP(S) y tiene dominio"""
+    try:
+        parsed = urlparse(url)
+        return parsed.scheme in ['http', 'https'] and bool(parsed.netloc)
+    except:
+        return False
@@ -1,21 +1,224 @@
 """
 Protocolo de comunicación entre servidores.
 Implementa serialización y deserialización de mensajes.
+
+Hay dos formatos de mensaje sobre el mismo socket:
+
+- Simple: [4 bytes longitud][datos JSON]
+- Extendido: [4 bytes longitud | 0x80000000][1 byte tipo][1 byte flags]
+  [4 bytes request id][datos]
+
+El bit alto de la longitud distingue ambos formatos (los mensajes nunca
+superan MAX_MESSAGE_SIZE). El request id permite tener varias solicitudes
+en curso sobre una misma conexión y emparejar respuestas que llegan en
+cualquier orden. Los 4 bits bajos de los flags indican el códec de los
+datos (ver common/serialization.py); 0 es JSON.
+
+Si el flag ATTACHMENTS está activo, los datos son multi-parte: un header
+serializado con el códec y los valores bytes (imágenes) como segmentos
+crudos a continuación, sin base64:
+
+  [4 bytes largo del header][header][4 bytes cantidad N]
+  [N x 4 bytes largo de cada segmento][segmento 0]...[segmento N-1]
+
+En el header cada segmento se reemplaza por {"$attachment": índice}. Los
+mensajes se envían con escrituras vectorizadas (sendmsg/writelines), de
+modo que los segmentos no se copian para armar el mensaje.
+
+Si el flag COMPRESSED está activo, los datos serializados con el códec
+(el header, en los mensajes multi-parte) van comprimidos con zlib. Solo se
+comprimen a partir de un tamaño mínimo y si el resultado es más chico; los
+segmentos binarios nunca se comprimen (las imágenes ya lo están).
+
+Al abrir una conexión el cliente puede enviar un HELLO con su versión del
+protocolo, códecs, algoritmos de compresión, tamaño máximo de mensaje y
+features; el servidor responde con los suyos y ambos usan la intersección
+(ver Capabilities). El HELLO lleva el id de códec HANDSHAKE_CODEC y sus
+datos empiezan con HELLO_MAGIC, de modo que ningún servidor anterior al
+handshake lo procesa como solicitud: según la versión cierra la conexión
+o responde un error en formato simple. En ambos casos (cualquier
+respuesta que no sea un HELLO) el cliente reconecta sin handshake y se
+limita a LEGACY_CAPABILITIES: mensajes simples en JSON, sin streaming ni
+segmentos. Las features acordadas habilitan el streaming, los segmentos
+binarios y la multiplexación, de modo que los formatos nuevos se
+habilitan nodo por nodo.
+
+Al recibir, los datos de cada mensaje se leen con recv_into en un único
+bytearray del tamaño exacto (en asyncio, con BufferedStreamReader) y se
+decodifican desde ese buffer; los segmentos se entregan como memoryview
+sobre él, sin copiarlos.
 """
 
+import asyncio
+import functools
+import itertools
 import json
 import struct
+import zlib
+from collections import namedtuple
+
+from .serialization import CODECS, get_codec, codec_by_id, base64_default
+
+
+# Mensaje recibido: tipo, flags y request_id son None/0 en el formato simple
+Frame = namedtuple('Frame', ['type', 'flags', 'request_id', 'data'])
+
+
+class Capabilities(namedtuple('Capabilities', [
+        'version', 'codecs', 'compression', 'max_frame_size', 'features'])):
+    """
+    Capacidades de un extremo de la conexión (o las acordadas por ambos).
+    
+    Attributes:
+        version: Versión del protocolo
+        codecs: Nombres de los códecs que acepta
+        compression: Algoritmos de compresión que acepta ('zlib')
+        max_frame_size: Tamaño máximo de los datos de un mensaje
+        features: Features opcionales que entiende (ver Protocol.FEATURES)
+    """
+    
+    __slots__ = ()
+    
+    def to_dict(self):
+        """Datos del mensaje HELLO"""
+        return {
+            'version': self.version,
+            'codecs': list(self.codecs),
+            'compression': list(self.compression),
+            'max_frame_size': self.max_frame_size,
+            'features': list(self.features)
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Capacidades recibidas en un HELLO.
+        
+        Los valores desconocidos (códecs o features de versiones más
+        nuevas) se conservan; la negociación los descarta.
+        
+        Raises:
+            ValueError: Si faltan campos o tienen otro tipo
+        """
+        try:
+            version = data['version']
+            max_frame_size = data['max_frame_size']
+            lists = [data[key] for key in ('codecs', 'compression', 'features')]
+        except (KeyError, TypeError):
+            raise ValueError("HELLO inválido: faltan campos") from None
+        if not isinstance(version, int) or not isinstance(max_frame_size, int):
+            raise ValueError("HELLO inválido: versión o tamaño máximo no numéricos")
+        if not all(isinstance(items, list) and all(isinstance(item, str) for item in items)
+                   for items in lists):
+            raise ValueError("HELLO inválido: listas de capacidades mal formadas")
+        return cls(version, *lists[:2], max_frame_size, lists[2])
+    
+    def negotiate(self, remote):
+        """
+        Capacidades que pueden usar ambos extremos.
+        
+        Se toma la menor versión y el menor tamaño máximo, y la
+        intersección del resto en el orden de preferencia local.
+        
+        Args:
+            remote: Capabilities del otro extremo
+        """
+        return Capabilities(
+            min(self.version, remote.version),
+            [name for name in self.codecs if name in remote.codecs],
+            [name for name in self.compression if name in remote.compression],
+            min(self.max_frame_size, remote.max_frame_size),
+            [name for name in self.features if name in remote.features]
+        )
+    
+    @property
+    def legacy(self):
+        """Indica si el otro extremo es anterior al handshake"""
+        return self.version == 0
+    
+    def supports(self, feature):
+        """Indica si se acordó una feature (ver Protocol.FEATURES)"""
+        return feature in self.features
+    
+    def encode_options(self, codec=None, compress_level=0, compress_min_size=None):
+        """
+        Argumentos de encode_frame_parts limitados a lo acordado.
+        
+        Si el otro extremo no acepta el códec pedido se usa JSON, si no
+        acepta zlib no se comprime y si no acepta segmentos binarios los
+        bytes viajan en base64.
+        """
+        codec = get_codec(codec).name
+        return {
+            'codec': codec if codec in self.codecs else 'json',
+            'compress_level': compress_level if 'zlib' in self.compression else 0,
+            'compress_min_size': compress_min_size,
+            'max_size': self.max_frame_size,
+            'attachments': self.supports('attachments')
+        }
 
 
 class Protocol:
     """Protocolo para comunicación entre servidores"""
     
+    MAX_MESSAGE_SIZE = 50 * 1024 * 1024
+    
+    # Bit de la longitud que marca un mensaje extendido
+    EXTENDED = 0x80000000
+    
+    # Tipos de mensaje extendido
+    REQUEST = 1   # Solicitud del cliente
+    RESPONSE = 2  # Respuesta completa (cierra la solicitud)
+    PART = 3      # Resultado parcial de una solicitud en streaming
+    DONE = 4      # Fin de una solicitud en streaming
+    
+    HELLO = 5     # Handshake al abrir la conexión (request id 0)
+    
+    # Tipos que terminan una solicitud
+    FINAL_TYPES = (RESPONSE, DONE)
+    
+    # Versión del protocolo (0 es un extremo anterior al handshake)
+    VERSION = 1
+    
+    # Algoritmos de compresión de los datos (flag COMPRESSED)
+    COMPRESSION = ('zlib',)
+    
+    # Features opcionales que se anuncian en el HELLO
+    FEATURES = ('multiplex', 'streaming', 'attachments')
+    
+    # Id de códec reservado para el HELLO (ningún códec lo usa) y prefijo
+    # de sus datos, que tampoco son JSON válido
+    HANDSHAKE_CODEC = 0x0F
+    HELLO_MAGIC = b'TP2HELLO'
+    
+    # Bits de los flags con el id del códec de los datos
+    CODEC_MASK = 0x0F
+    
+    # Flag de datos comprimidos con zlib
+    COMPRESSED = 0x10
+    
+    # Flag de datos multi-parte con segmentos binarios
+    ATTACHMENTS = 0x20
+    
+    # Nivel de zlib por defecto y tamaño mínimo para comprimir los datos
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIN_SIZE = 1024
+    
+    # Clave que marca un segmento en el header multi-parte
+    ATTACHMENT_KEY = '$attachment'
+    
+    # Máximo de buffers por llamada a sendmsg
+    IOV_MAX = 1024
+    
     @staticmethod
     def encode(data):
         """
         Codifica datos a bytes para enviar por socket.
         Formato: [4 bytes longitud][datos JSON]
         
+        Este formato no admite segmentos binarios: los valores bytes se
+        envían en base64.
+        
         Args:
             data: Diccionario con los datos a enviar
             
@@ -23,7 +226,7 @@ class Protocol:
             Bytes con el mensaje codificado
         """
         # Serializar a JSON
-        json_data = json.dumps(data, ensure_ascii=False)
+        json_data = json.dumps(data, ensure_ascii=False, default=base64_default)
         json_bytes = json_data.encode('utf-8')
         
         # Obtener longitud
@@ -49,95 +252,905 @@ class Protocol:
         if len(data) < 4:
             raise ValueError("Datos insuficientes para decodificar")
         
-        length = struct.unpack('>I', data[:4])[0]
+        length, extended = Protocol._parse_length(data[:4])
         
-        # Extraer JSON
-        json_bytes = data[4:4+length]
-        json_data = json_bytes.decode('utf-8')
+        # Saltear el header de los mensajes extendidos
+        start = 10 if extended else 4
+        flags = data[5] if extended else 0
         
-        # Deserializar JSON
-        result = json.loads(json_data)
+        return Protocol._decode_data(flags, data[start:start+length])
+    
+    @staticmethod
+    def encode_frame(msg_type, request_id, data, flags=0, codec=None,
+                     compress_level=0, compress_min_size=None):
+        """
+        Codifica un mensaje extendido con tipo y request id.
         
-        return result
+        Args:
+            msg_type: Tipo de mensaje (REQUEST, RESPONSE, PART o DONE)
+            request_id: Identificador de la solicitud (entero de 32 bits)
+            data: Diccionario con los datos a enviar
+            flags: Byte de flags (los bits del códec se completan solos)
+            codec: Nombre del códec de los datos (default: JSON)
+            compress_level: Nivel de zlib (0 no comprime)
+            compress_min_size: Tamaño mínimo para comprimir (default:
+                COMPRESS_MIN_SIZE)
+            
+        Returns:
+            Bytes con el mensaje codificado
+        """
+        return b''.join(Protocol.encode_frame_parts(
+            msg_type, request_id, data, flags, codec, compress_level, compress_min_size
+        ))
     
     @staticmethod
-    async def receive(reader):
+    def encode_frame_parts(msg_type, request_id, data, flags=0, codec=None,
+                           compress_level=0, compress_min_size=None, max_size=None,
+                           attachments=True):
         """
-        Recibe un mensaje completo de forma asíncrona desde un StreamReader.
+        Codifica un mensaje extendido como lista de buffers.
+        
+        Los valores bytes de data viajan como segmentos crudos (flag
+        ATTACHMENTS) y se devuelven tal cual, sin copiarlos, para enviarlos
+        con send_parts o StreamWriter.writelines.
         
         Args:
-            reader: asyncio.StreamReader
+            msg_type: Tipo de mensaje (REQUEST, RESPONSE, PART o DONE)
+            request_id: Identificador de la solicitud (entero de 32 bits)
+            data: Diccionario con los datos a enviar
+            flags: Byte de flags (los bits del códec, de compresión y de
+                segmentos se completan solos)
+            codec: Nombre del códec de los datos (default: JSON)
+            compress_level: Nivel de zlib (0 no comprime)
+            compress_min_size: Tamaño mínimo para comprimir (default:
+                COMPRESS_MIN_SIZE)
+            max_size: Tamaño máximo de los datos que acepta el otro extremo
+                (default: MAX_MESSAGE_SIZE)
+            attachments: Si False, los bytes se envían en base64 dentro de
+                los datos en lugar de como segmentos
             
         Returns:
-            Diccionario con los datos recibidos
+            Lista de buffers que concatenados forman el mensaje
+        """
+        codec = get_codec(codec)
+        flags &= ~(Protocol.CODEC_MASK | Protocol.COMPRESSED | Protocol.ATTACHMENTS)
+        flags |= codec.codec_id
+        
+        segments = []
+        if attachments:
+            payload = codec.encode(Protocol._extract_attachments(data, segments))
+        else:
+            payload = codec.encode(Protocol._inline_attachments(data))
+        attachments = segments
+        
+        if compress_min_size is None:
+            compress_min_size = Protocol.COMPRESS_MIN_SIZE
+        if compress_level > 0 and len(payload) >= compress_min_size:
+            compressed = zlib.compress(payload, compress_level)
+            # Los datos poco comprimibles se envían tal cual
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= Protocol.COMPRESSED
+        
+        if attachments:
+            flags |= Protocol.ATTACHMENTS
+            sizes = [len(segment) for segment in attachments]
+            payload = b''.join((
+                struct.pack('>I', len(payload)),
+                payload,
+                struct.pack(f'>I{len(sizes)}I', len(sizes), *sizes)
+            ))
+            length = len(payload) + sum(sizes)
+        else:
+            length = len(payload)
+        
+        if length > min(max_size or Protocol.MAX_MESSAGE_SIZE, Protocol.MAX_MESSAGE_SIZE):
+            raise ValueError(f"Mensaje demasiado grande: {length} bytes")
+        
+        header = struct.pack('>IBBI', length | Protocol.EXTENDED, msg_type, flags, request_id)
+        return [header + payload] + attachments
+    
+    @staticmethod
+    def local_capabilities():
+        """Capacidades de este extremo (todo lo que soporta el módulo)"""
+        return Capabilities(
+            Protocol.VERSION,
+            list(CODECS),
+            list(Protocol.COMPRESSION),
+            Protocol.MAX_MESSAGE_SIZE,
+            list(Protocol.FEATURES)
+        )
+    
+    @staticmethod
+    def encode_hello(capabilities):
+        """
+        Codifica el mensaje HELLO del handshake.
+        
+        Args:
+            capabilities: Capabilities de este extremo
+            
+        Returns:
+            Bytes con el mensaje codificado
+        """
+        payload = Protocol.HELLO_MAGIC + json.dumps(capabilities.to_dict()).encode('utf-8')
+        header = struct.pack('>IBBI', len(payload) | Protocol.EXTENDED,
+                             Protocol.HELLO, Protocol.HANDSHAKE_CODEC, 0)
+        return header + payload
+    
+    @staticmethod
+    async def open_session(host, port, capabilities=None):
+        """
+        Abre una conexión y negocia las capacidades con el servidor.
+        
+        Si el servidor es anterior al handshake, cierra la conexión al
+        recibir el HELLO o responde un error en formato simple (la versión
+        original atiende un único mensaje por conexión). Ante cualquier
+        respuesta que no sea un HELLO se reconecta sin handshake y se
+        devuelven LEGACY_CAPABILITIES.
+        
+        Args:
+            host: Host del servidor
+            port: Puerto del servidor
+            capabilities: Capabilities a anunciar (default: local_capabilities())
+            
+        Returns:
+            Tupla (reader, writer, Capabilities acordadas)
+            
+        Raises:
+            ConnectionError: Si el servidor responde un HELLO inválido
+        """
+        local = capabilities or Protocol.local_capabilities()
+        reader, writer = await Protocol.open_connection(host, port)
+        try:
+            writer.write(Protocol.encode_hello(local))
+            await writer.drain()
+            frame = await Protocol.receive_frame(reader)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            frame = None
+        
+        if frame is None or frame.type != Protocol.HELLO:
+            await Protocol._close_writer(writer)
+            reader, writer = await Protocol.open_connection(host, port)
+            return reader, writer, LEGACY_CAPABILITIES
+        try:
+            remote = Capabilities.from_dict(frame.data)
+        except ValueError as e:
+            await Protocol._close_writer(writer)
+            raise ConnectionError(f"Handshake inválido: {e}") from None
+        return reader, writer, local.negotiate(remote)
+    
+    @staticmethod
+    async def _close_writer(writer):
+        """Cierra la conexión y espera a que termine, ignorando errores"""
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _extract_attachments(value, attachments):
+        """
+        Reemplaza los valores bytes por marcadores de segmento.
+        
+        Args:
+            value: Datos a enviar
+            attachments: Lista donde se agregan los segmentos extraídos
+            
+        Returns:
+            Copia de value con {"$attachment": índice} en lugar de cada bytes
+        """
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            attachments.append(value)
+            return {Protocol.ATTACHMENT_KEY: len(attachments) - 1}
+        if isinstance(value, dict):
+            return {
+                key: Protocol._extract_attachments(item, attachments)
+                for key, item in value.items()
+            }
+        if isinstance(value, (list, tuple)):
+            return [Protocol._extract_attachments(item, attachments) for item in value]
+        return value
+    
+    @staticmethod
+    def _inline_attachments(value):
+        """Copia de value con cada valor bytes en base64"""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return base64_default(value)
+        if isinstance(value, dict):
+            return {key: Protocol._inline_attachments(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [Protocol._inline_attachments(item) for item in value]
+        return value
+    
+    @staticmethod
+    def _restore_attachments(value, attachments):
+        """Reemplaza los marcadores de segmento por sus bytes"""
+        if isinstance(value, dict):
+            if len(value) == 1 and Protocol.ATTACHMENT_KEY in value:
+                index = value[Protocol.ATTACHMENT_KEY]
+                if not isinstance(index, int) or not 0 <= index < len(attachments):
+                    raise ValueError(f"Segmento inexistente: {index}")
+                return attachments[index]
+            return {
+                key: Protocol._restore_attachments(item, attachments)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [Protocol._restore_attachments(item, attachments) for item in value]
+        return value
+    
+    @staticmethod
+    def send_parts(sock, parts):
+        """
+        Envía un mensaje armado por partes con escrituras vectorizadas.
+        
+        Args:
+            sock: Socket conectado
+            parts: Lista de buffers (ej: de encode_frame_parts)
+        """
+        if not hasattr(sock, 'sendmsg'):
+            sock.sendall(b''.join(parts))  # Plataforma sin sendmsg
+            return
+        
+        views = [memoryview(part).cast('B') for part in parts if len(part)]
+        while views:
+            sent = sock.sendmsg(views[:Protocol.IOV_MAX])
+            # Descartar lo enviado (sendmsg puede enviar solo una parte)
+            while sent:
+                if sent >= len(views[0]):
+                    sent -= len(views.pop(0))
+                else:
+                    views[0] = views[0][sent:]
+                    sent = 0
+    
+    @staticmethod
+    def frame_compressed(frame):
+        """
+        Indica si un mensaje llegó comprimido.
+        
+        Sirve para comprimir las respuestas solo si el cliente lo hace.
+        """
+        return bool(frame.flags & Protocol.COMPRESSED)
+    
+    @staticmethod
+    def frame_codec(frame):
+        """
+        Nombre del códec con el que llegó un mensaje.
+        
+        Sirve para responder en el mismo formato que usó el cliente.
+        """
+        if frame.type is None:
+            return 'json'
+        return codec_by_id(frame.flags & Protocol.CODEC_MASK).name
+    
+    @staticmethod
+    def _decode_data(flags, data_bytes):
+        """Deserializa los datos con el códec indicado en los flags"""
+        if flags & Protocol.CODEC_MASK == Protocol.HANDSHAKE_CODEC:
+            magic = Protocol.HELLO_MAGIC
+            if bytes(data_bytes[:len(magic)]) != magic:
+                raise ValueError("HELLO sin prefijo")
+            return get_codec('json').decode(data_bytes[len(magic):])
+        
+        codec = codec_by_id(flags & Protocol.CODEC_MASK)
+        if not flags & Protocol.ATTACHMENTS:
+            if flags & Protocol.COMPRESSED:
+                data_bytes = Protocol._decompress(data_bytes)
+            return codec.decode(data_bytes)
+        
+        try:
+            (header_length,) = struct.unpack_from('>I', data_bytes, 0)
+            offset = 4 + header_length
+            header = data_bytes[4:offset]
+            (count,) = struct.unpack_from('>I', data_bytes, offset)
+            sizes = struct.unpack_from(f'>{count}I', data_bytes, offset + 4)
+        except struct.error:
+            raise ValueError("Mensaje multi-parte truncado") from None
+        
+        offset += 4 + 4 * count
+        if offset + sum(sizes) != len(data_bytes):
+            raise ValueError("Mensaje multi-parte inconsistente")
+        
+        # Los segmentos son vistas sobre el buffer recibido (sin copiarlos)
+        view = memoryview(data_bytes)
+        attachments = []
+        for size in sizes:
+            attachments.append(view[offset:offset + size])
+            offset += size
+        
+        if flags & Protocol.COMPRESSED:
+            header = Protocol._decompress(header)
+        return Protocol._restore_attachments(codec.decode(header), attachments)
+    
+    @staticmethod
+    def _decompress(data):
+        """
+        Descomprime los datos de un mensaje.
+        
+        El resultado se limita a MAX_MESSAGE_SIZE, de modo que unos pocos
+        bytes comprimidos no puedan expandirse sin control.
+        
+        Raises:
+            ValueError: Si los datos no son zlib válido o exceden el máximo
+        """
+        decompressor = zlib.decompressobj()
+        try:
+            result = decompressor.decompress(data, Protocol.MAX_MESSAGE_SIZE)
+        except zlib.error as e:
+            raise ValueError(f"Datos comprimidos inválidos: {e}") from None
+        if decompressor.unconsumed_tail:
+            raise ValueError("Mensaje descomprimido demasiado grande")
+        if not decompressor.eof:
+            raise ValueError("Datos comprimidos truncados")
+        if decompressor.unused_data:
+            raise ValueError("Datos sobrantes tras los datos comprimidos")
+        return result
+    
+    @staticmethod
+    def _parse_length(length_bytes):
+        """
+        Interpreta el campo de longitud.
+        
+        Returns:
+            Tupla (longitud de los datos, si el mensaje es extendido)
         """
-        # Leer longitud (4 bytes)
-        length_bytes = await reader.readexactly(4)
         length = struct.unpack('>I', length_bytes)[0]
+        extended = bool(length & Protocol.EXTENDED)
+        length &= ~Protocol.EXTENDED
         
         # Validar longitud razonable (máx 50MB)
-        if length > 50 * 1024 * 1024:
+        if length > Protocol.MAX_MESSAGE_SIZE:
             raise ValueError(f"Mensaje demasiado grande: {length} bytes")
         
-        # Leer datos
-        data_bytes = await reader.readexactly(length)
-        json_data = data_bytes.decode('utf-8')
+        return length, extended
+    
+    @staticmethod
+    async def open_connection(host, port):
+        """
+        Abre una conexión asíncrona con recepción sin copias.
         
-        # Deserializar
-        result = json.loads(json_data)
+        Equivale a asyncio.open_connection, pero el reader es un
+        BufferedStreamReader: cada readexactly grande se llena con
+        recv_into directamente en el buffer que se devuelve.
         
-        return result
+        Returns:
+            Tupla (BufferedStreamReader, BufferedStreamWriter)
+        """
+        loop = asyncio.get_running_loop()
+        transport, reader = await loop.create_connection(BufferedStreamReader, host, port)
+        return reader, BufferedStreamWriter(transport, reader)
     
     @staticmethod
-    def receive_socket(sock):
+    async def receive_frame(reader):
         """
-        Recibe un mensaje completo desde un socket (síncrono).
+        Recibe un mensaje (simple o extendido) desde un StreamReader.
+        
+        Args:
+            reader: asyncio.StreamReader o BufferedStreamReader
+            
+        Returns:
+            Frame con tipo, flags, request_id y datos
+        """
+        length, extended = Protocol._parse_length(await reader.readexactly(4))
+        
+        msg_type, flags, request_id = None, 0, None
+        if extended:
+            msg_type, flags, request_id = struct.unpack('>BBI', await reader.readexactly(6))
+        
+        data_bytes = await reader.readexactly(length)
+        return Frame(msg_type, flags, request_id, Protocol._decode_data(flags, data_bytes))
+    
+    @staticmethod
+    def receive_frame_socket(sock):
+        """
+        Recibe un mensaje (simple o extendido) desde un socket (síncrono).
         
         Args:
             sock: Socket conectado
             
         Returns:
-            Diccionario con los datos recibidos
+            Frame con tipo, flags, request_id y datos, o None si la conexión se cerró
         """
-        # Leer longitud (4 bytes)
         length_bytes = Protocol._recv_exact(sock, 4)
         if not length_bytes:
             return None
         
-        length = struct.unpack('>I', length_bytes)[0]
+        length, extended = Protocol._parse_length(length_bytes)
         
-        # Validar longitud razonable (máx 50MB)
-        if length > 50 * 1024 * 1024:
-            raise ValueError(f"Mensaje demasiado grande: {length} bytes")
+        msg_type, flags, request_id = None, 0, None
+        if extended:
+            header = Protocol._recv_exact(sock, 6)
+            if not header:
+                return None
+            msg_type, flags, request_id = struct.unpack('>BBI', header)
         
-        # Leer datos
         data_bytes = Protocol._recv_exact(sock, length)
-        if not data_bytes:
+        if data_bytes is None:
             return None
         
-        json_data = data_bytes.decode('utf-8')
+        return Frame(msg_type, flags, request_id, Protocol._decode_data(flags, data_bytes))
+    
+    @staticmethod
+    async def receive(reader):
+        """
+        Recibe un mensaje completo de forma asíncrona desde un StreamReader.
         
-        # Deserializar
-        result = json.loads(json_data)
+        Args:
+            reader: asyncio.StreamReader
+            
+        Returns:
+            Diccionario con los datos recibidos
+        """
+        frame = await Protocol.receive_frame(reader)
+        return frame.data
+    
+    @staticmethod
+    def receive_socket(sock):
+        """
+        Recibe un mensaje completo desde un socket (síncrono).
         
-        return result
+        Args:
+            sock: Socket conectado
+            
+        Returns:
+            Diccionario con los datos recibidos
+        """
+        frame = Protocol.receive_frame_socket(sock)
+        if frame is None:
+            return None
+        return frame.data
     
     @staticmethod
     def _recv_exact(sock, n):
         """
         Recibe exactamente n bytes del socket.
         
+        Los datos se leen con recv_into en un único buffer del tamaño
+        exacto, sin concatenar bloques.
+        
         Args:
             sock: Socket conectado
             n: Número de bytes a recibir
             
         Returns:
-            Bytes recibidos o None si la conexión se cerró
+            bytearray con los datos recibidos o None si la conexión se cerró
         """
-        data = b''
-        while len(data) < n:
-            chunk = sock.recv(n - len(data))
-            if not chunk:
+        data = bytearray(n)
+        view = memoryview(data)
+        received = 0
+        while received < n:
+            count = sock.recv_into(view[received:], n - received)
+            if not count:
                 return None
-            data += chunk
-        return data
\ No newline at end of file
+            received += count
+        return data
+
+
+# Capacidades que se asumen de un servidor anterior al handshake. Con
+# versión 0 los clientes envían mensajes simples (el formato original) en
+# JSON, sin 'stream' ni segmentos, y esperan una única respuesta
+LEGACY_CAPABILITIES = Capabilities(0, ['json'], [], Protocol.MAX_MESSAGE_SIZE, [])
+
+
+class BufferedStreamReader(asyncio.BufferedProtocol):
+    """
+    Reader asíncrono que recibe los mensajes grandes sin copiarlos.
+    
+    Implementa la parte de asyncio.StreamReader que usa Protocol
+    (readexactly y at_eof). Mientras hay un readexactly esperando, el loop
+    escribe los datos del socket directamente en el bytearray que se va a
+    devolver; el resto del tiempo se acumulan en un buffer chico, y si
+    éste se llena se deja de leer del socket hasta que se consuma.
+    """
+    
+    # Tamaño de cada lectura fuera de un readexactly
+    CHUNK_SIZE = 64 * 1024
+    
+    # Bytes acumulados a partir de los cuales se pausa la lectura
+    HIGH_WATER = 256 * 1024
+    
+    def __init__(self):
+        self._transport = None
+        self._buffer = bytearray()
+        self._chunk = bytearray(self.CHUNK_SIZE)
+        self._target = None    # memoryview del buffer de un readexactly en curso
+        self._filled = 0
+        self._waiter = None
+        self._eof = False
+        self._exception = None
+        self._reading_paused = False
+        
+        # Control de flujo de escritura (ver BufferedStreamWriter)
+        self._write_paused = False
+        self._drain_waiters = []
+        self._closed = None
+    
+    # Callbacks de asyncio.BufferedProtocol
+    
+    def connection_made(self, transport):
+        self._transport = transport
+        self._closed = asyncio.get_running_loop().create_future()
+    
+    def get_buffer(self, sizehint):
+        if self._target is not None:
+            return self._target[self._filled:]
+        return self._chunk
+    
+    def buffer_updated(self, nbytes):
+        if self._target is not None:
+            self._filled += nbytes
+            if self._filled == len(self._target):
+                # Completo: lo que siga llegando va al buffer chico
+                self._target = None
+                self._wakeup()
+            return
+        
+        self._buffer += memoryview(self._chunk)[:nbytes]
+        if len(self._buffer) >= self.HIGH_WATER and not self._reading_paused:
+            self._reading_paused = True
+            self._transport.pause_reading()
+        self._wakeup()
+    
+    def eof_received(self):
+        self.feed_eof()
+        return False
+    
+    def connection_lost(self, exc):
+        self._eof = True
+        if exc is not None:
+            self._exception = exc
+        self._wakeup()
+        
+        for waiter in self._drain_waiters:
+            if not waiter.done():
+                if exc is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(exc)
+        self._drain_waiters.clear()
+        if not self._closed.done():
+            self._closed.set_result(None)
+    
+    def pause_writing(self):
+        self._write_paused = True
+    
+    def resume_writing(self):
+        self._write_paused = False
+        for waiter in self._drain_waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._drain_waiters.clear()
+    
+    # API de lectura
+    
+    def at_eof(self):
+        """Indica si la conexión terminó y no quedan datos por leer"""
+        return self._eof and not self._buffer
+    
+    def feed_eof(self):
+        """Marca el fin de los datos (como StreamReader.feed_eof)"""
+        self._eof = True
+        self._wakeup()
+    
+    async def readexactly(self, n):
+        """
+        Lee exactamente n bytes.
+        
+        Returns:
+            bytearray con los datos
+            
+        Raises:
+            asyncio.IncompleteReadError: Si la conexión termina antes
+        """
+        if len(self._buffer) >= n:
+            data = self._buffer[:n]
+            del self._buffer[:n]
+            self._maybe_resume_reading()
+            return data
+        
+        # Los bytes ya acumulados van al principio y el resto lo escribe el
+        # loop directamente en data
+        data = bytearray(n)
+        filled = len(self._buffer)
+        data[:filled] = self._buffer
+        self._buffer.clear()
+        self._maybe_resume_reading()
+        
+        self._target = memoryview(data)
+        self._filled = filled
+        try:
+            while self._filled < n and not self._eof:
+                self._waiter = asyncio.get_running_loop().create_future()
+                await self._waiter
+        finally:
+            filled = self._filled
+            self._target = None
+            self._waiter = None
+        
+        if filled < n:
+            if self._exception is not None:
+                raise ConnectionResetError(str(self._exception))
+            raise asyncio.IncompleteReadError(bytes(data[:filled]), n)
+        return data
+    
+    def _wakeup(self):
+        """Despierta al readexactly en espera"""
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+    
+    def _maybe_resume_reading(self):
+        """Reanuda la lectura del socket si el buffer se vació"""
+        if self._reading_paused and len(self._buffer) < self.HIGH_WATER:
+            self._reading_paused = False
+            self._transport.resume_reading()
+
+
+class BufferedStreamWriter:
+    """
+    Writer de una conexión abierta con Protocol.open_connection.
+    
+    Implementa la parte de asyncio.StreamWriter que usa el proyecto.
+    """
+    
+    def __init__(self, transport, protocol):
+        self.transport = transport
+        self._protocol = protocol
+    
+    def write(self, data):
+        self.transport.write(data)
+    
+    def writelines(self, data):
+        self.transport.writelines(data)
+    
+    def get_extra_info(self, name, default=None):
+        return self.transport.get_extra_info(name, default)
+    
+    async def drain(self):
+        """Espera a que el buffer de escritura baje del límite"""
+        protocol = self._protocol
+        if protocol._exception is not None:
+            raise ConnectionResetError(str(protocol._exception))
+        if self.transport.is_closing():
+            # Igual que StreamWriter: dejar que connection_lost se ejecute
+            await asyncio.sleep(0)
+            if protocol._closed.done():
+                raise ConnectionResetError('Connection lost')
+        if protocol._write_paused:
+            waiter = asyncio.get_running_loop().create_future()
+            protocol._drain_waiters.append(waiter)
+            await waiter
+    
+    def is_closing(self):
+        return self.transport.is_closing()
+    
+    def close(self):
+        self.transport.close()
+    
+    async def wait_closed(self):
+        await self._protocol._closed
+
+
+class MultiplexedClient:
+    """
+    Cliente asíncrono que multiplexa solicitudes sobre una conexión.
+    
+    Cada solicitud lleva su propio request id, de modo que muchas pueden
+    estar en curso a la vez sobre el mismo socket. Una tarea lectora
+    reparte cada mensaje recibido a la solicitud que le corresponde, sin
+    importar el orden en que lleguen. Si la conexión se pierde, todas las
+    solicitudes pendientes fallan con ConnectionError y la siguiente
+    solicitud vuelve a conectar.
+    """
+    
+    def __init__(self, host, port, connect_timeout=5, codec=None,
+                 compress_level=0, compress_min_size=None, handshake=False,
+                 capabilities=None):
+        """
+        Inicializa el cliente (la conexión se abre en la primera solicitud).
+        
+        Args:
+            host: Host del servidor
+            port: Puerto del servidor
+            connect_timeout: Timeout en segundos para conectar
+            codec: Códec de las solicitudes (default: JSON); el servidor
+                responde con el mismo
+            compress_level: Nivel de zlib de las solicitudes (0 no comprime)
+            compress_min_size: Tamaño mínimo para comprimir (default:
+                Protocol.COMPRESS_MIN_SIZE)
+            handshake: Si True, negocia las capacidades al conectar y
+                limita el códec y la compresión a lo que acepta el servidor
+            capabilities: Capabilities a anunciar en el handshake
+                (default: Protocol.local_capabilities())
+        """
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.codec = get_codec(codec).name
+        self.compress_level = compress_level
+        self.compress_min_size = compress_min_size
+        self.handshake = handshake
+        self.capabilities = capabilities
+        
+        # Capacidades acordadas en la conexión actual (None sin handshake)
+        self.peer = None
+        
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = None
+        self._write_lock = None
+        
+        # Contadores
+        self.connects = 0
+        self.requests = 0
+    
+    @property
+    def connected(self):
+        """Indica si hay una conexión abierta"""
+        return self._writer is not None and not self._writer.is_closing()
+    
+    async def connect(self):
+        """Abre la conexión si no está abierta"""
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+        
+        async with self._connect_lock:
+            if self.connected:
+                return
+            
+            if self.handshake:
+                self._reader, self._writer, self.peer = await asyncio.wait_for(
+                    Protocol.open_session(self.host, self.port, self.capabilities),
+                    timeout=self.connect_timeout
+                )
+            else:
+                self._reader, self._writer = await asyncio.wait_for(
+                    Protocol.open_connection(self.host, self.port),
+                    timeout=self.connect_timeout
+                )
+            self.connects += 1
+            self._reader_task = asyncio.ensure_future(self._read_loop(self._reader))
+    
+    async def multiplexed(self):
+        """
+        Conecta y indica si el servidor acepta solicitudes multiplexadas.
+        
+        Sin handshake se asume que sí. Un servidor que no acordó la
+        feature 'multiplex' (por ejemplo, uno anterior al handshake) debe
+        usarse con una solicitud por conexión en formato simple.
+        """
+        await self.connect()
+        return self.peer is None or self.peer.supports('multiplex')
+    
+    async def request(self, data):
+        """
+        Envía una solicitud y espera su respuesta completa.
+        
+        Args:
+            data: Diccionario con la solicitud
+            
+        Returns:
+            Diccionario con la respuesta
+        """
+        async for frame in self.stream(data):
+            if frame.type == Protocol.RESPONSE:
+                return frame.data
+        return {}
+    
+    async def stream(self, data, offload=False):
+        """
+        Envía una solicitud y entrega cada mensaje de su respuesta.
+        
+        Termina después del mensaje RESPONSE o DONE. Si el consumidor deja
+        de iterar antes, los mensajes restantes de la solicitud se descartan.
+        
+        Args:
+            data: Diccionario con la solicitud
+            offload: Si True, la solicitud se serializa y comprime en el
+                executor por defecto del loop (para solicitudes grandes)
+            
+        Yields:
+            Frame de cada mensaje recibido para la solicitud
+        """
+        await self.connect()
+        
+        request_id = self._next_id()
+        queue = asyncio.Queue()
+        self._pending[request_id] = queue
+        self.requests += 1
+        
+        try:
+            options = {
+                'codec': self.codec,
+                'compress_level': self.compress_level,
+                'compress_min_size': self.compress_min_size
+            }
+            if self.peer is not None:
+                options = self.peer.encode_options(**options)
+            encode = functools.partial(
+                Protocol.encode_frame_parts, Protocol.REQUEST, request_id, data, **options
+            )
+            if offload:
+                parts = await asyncio.get_running_loop().run_in_executor(None, encode)
+            else:
+                parts = encode()
+            async with self._write_lock:
+                self._writer.writelines(parts)
+                await self._writer.drain()
+            
+            while True:
+                item = await queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                if item.type in Protocol.FINAL_TYPES:
+                    return
+        finally:
+            self._pending.pop(request_id, None)
+    
+    async def close(self):
+        """Cierra la conexión y hace fallar las solicitudes pendientes"""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+        
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        
+        self._fail_pending(ConnectionError('Connection closed'))
+    
+    def stats(self):
+        """
+        Devuelve el estado del cliente.
+        
+        Returns:
+            Diccionario con conexión, solicitudes en curso y contadores
+        """
+        return {
+            'connected': self.connected,
+            'in_flight': len(self._pending),
+            'requests': self.requests,
+            'connects': self.connects,
+            'peer': self.peer.to_dict() if self.peer is not None else None
+        }
+    
+    def _next_id(self):
+        """Siguiente request id libre de 32 bits"""
+        while True:
+            request_id = next(self._ids) & 0xFFFFFFFF
+            if request_id and request_id not in self._pending:
+                return request_id
+    
+    async def _read_loop(self, reader):
+        """Reparte los mensajes recibidos entre las solicitudes pendientes"""
+        try:
+            while True:
+                frame = await Protocol.receive_frame(reader)
+                queue = self._pending.get(frame.request_id)
+                if queue is not None:
+                    queue.put_nowait(frame)
+        except asyncio.CancelledError:
+            raise
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            self._writer.close()
+            self._fail_pending(ConnectionError(f'Connection lost: {e}'))
+        except Exception as e:
+            self._writer.close()
+            self._fail_pending(ConnectionError(f'Invalid message: {e}'))
+    
+    def _fail_pending(self, error):
+        """Hace fallar todas las solicitudes pendientes"""
+        for queue in self._pending.values():
+            queue.put_nowait(error)
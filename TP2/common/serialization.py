@@ -0,0 +1,283 @@
+"""
+Códecs de serialización de los mensajes entre servidores.
+
+Cada códec convierte un valor (diccionarios, listas, strings, números,
+booleanos, None y, en el binario, bytes) a bytes y viceversa. El códec de
+un mensaje extendido va en los bits bajos del byte de flags (ver
+Protocol), de modo que cada conexión puede usar el suyo:
+
+- JSONCodec (id 0): JSON en UTF-8, el formato original.
+- BinaryCodec (id 1): campos tipados con prefijo de longitud. Los strings
+  y bytes se copian tal cual, sin escapes, y se decodifican directamente
+  del buffer recibido; los bytes se entregan como memoryview sobre él,
+  sin copiarlos.
+"""
+
+import base64
+import json
+import struct
+from abc import ABC, abstractmethod
+
+
+class Codec(ABC):
+    """
+    Interfaz de un códec.
+
+    Las subclases definen 'name', 'codec_id' (0-14; el 15 está reservado
+    para el handshake del protocolo) y los métodos encode y decode.
+    """
+
+    name = None
+    codec_id = None
+
+    @abstractmethod
+    def encode(self, value):
+        """
+        Serializa un valor.
+
+        Args:
+            value: Valor a serializar
+
+        Returns:
+            Bytes con el valor serializado
+        """
+
+    @abstractmethod
+    def decode(self, data):
+        """
+        Deserializa un valor.
+
+        Args:
+            data: Objeto bytes-like (bytes, bytearray o memoryview)
+
+        Returns:
+            Valor deserializado
+
+        Raises:
+            ValueError: Si los datos no son válidos
+        """
+
+
+def base64_default(value):
+    """
+    Función 'default' de json.dumps que codifica los bytes en base64.
+
+    Se usa donde un mensaje con imágenes crudas tiene que salir como JSON
+    (el formato simple del protocolo y las respuestas HTTP).
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JSONCodec(Codec):
+    """JSON en UTF-8"""
+
+    name = 'json'
+    codec_id = 0
+
+    def encode(self, value):
+        return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+    def decode(self, data):
+        try:
+            return json.loads(str(data, 'utf-8'))
+        except RecursionError:
+            raise ValueError("Invalid JSON message: nesting too deep") from None
+
+
+# Tipos del códec binario (un byte por campo)
+_NONE = b'N'
+_TRUE = b'T'
+_FALSE = b'F'
+_INT = b'i'       # entero de 64 bits con signo
+_BIGINT = b'I'    # entero grande: longitud + decimal en ASCII
+_FLOAT = b'd'     # double IEEE 754
+_STR = b's'       # longitud + UTF-8
+_BYTES = b'b'     # longitud + bytes crudos
+_LIST = b'l'      # cantidad de elementos + elementos
+_DICT = b'm'      # cantidad de pares + (clave string, valor)
+
+_U32 = struct.Struct('>I')
+_I64 = struct.Struct('>q')
+_F64 = struct.Struct('>d')
+
+_I64_MIN = -(1 << 63)
+_I64_MAX = (1 << 63) - 1
+
+
+class BinaryCodec(Codec):
+    """
+    Formato binario compacto con campos tipados.
+
+    Cada campo es [1 byte tipo][datos]; los strings, bytes, listas y
+    diccionarios llevan su longitud en 4 bytes (big-endian). Las claves de
+    los diccionarios deben ser strings, igual que en JSON.
+    """
+
+    name = 'binary'
+    codec_id = 1
+
+    def encode(self, value):
+        parts = []
+        self._encode(value, parts)
+        return b''.join(parts)
+
+    def _encode(self, value, parts):
+        """Agrega a parts los fragmentos que serializan value"""
+        append = parts.append
+        # bool antes que int: True y False son instancias de int
+        if value is None:
+            append(_NONE)
+        elif value is True:
+            append(_TRUE)
+        elif value is False:
+            append(_FALSE)
+        elif isinstance(value, str):
+            raw = value.encode('utf-8')
+            append(_STR + _U32.pack(len(raw)))
+            append(raw)
+        elif isinstance(value, dict):
+            append(_DICT + _U32.pack(len(value)))
+            for key, item in value.items():
+                if not isinstance(key, str):
+                    raise TypeError(f"Dictionary keys must be str, not {type(key).__name__}")
+                raw = key.encode('utf-8')
+                append(_STR + _U32.pack(len(raw)))
+                append(raw)
+                self._encode(item, parts)
+        elif isinstance(value, (list, tuple)):
+            append(_LIST + _U32.pack(len(value)))
+            for item in value:
+                self._encode(item, parts)
+        elif isinstance(value, int):
+            if _I64_MIN <= value <= _I64_MAX:
+                append(_INT + _I64.pack(value))
+            else:
+                raw = str(value).encode('ascii')
+                append(_BIGINT + _U32.pack(len(raw)))
+                append(raw)
+        elif isinstance(value, float):
+            append(_FLOAT + _F64.pack(value))
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            append(_BYTES + _U32.pack(len(value)))
+            append(value)
+        else:
+            raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+    def decode(self, data):
+        view = memoryview(data).cast('B')
+        try:
+            value, offset = self._decode(view, 0)
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            raise ValueError(f"Invalid binary message: {e}") from None
+        except RecursionError:
+            # Listas o diccionarios anidados a más profundidad que la pila
+            raise ValueError("Invalid binary message: nesting too deep") from None
+        if offset != len(view):
+            raise ValueError("Invalid binary message: trailing data")
+        return value
+
+    def _decode(self, view, offset):
+        """
+        Decodifica el campo que empieza en offset.
+
+        Returns:
+            Tupla (valor, offset del campo siguiente)
+        """
+        tag = view[offset:offset + 1]
+        offset += 1
+
+        if tag == _STR or tag == _BYTES or tag == _BIGINT:
+            (length,) = _U32.unpack_from(view, offset)
+            start = offset + 4
+            end = start + length
+            if end > len(view):
+                raise ValueError("Invalid binary message: truncated field")
+            if tag == _STR:
+                return str(view[start:end], 'utf-8'), end
+            if tag == _BYTES:
+                return view[start:end], end
+            return int(str(view[start:end], 'ascii')), end
+        if tag == _DICT:
+            (count,) = _U32.unpack_from(view, offset)
+            offset += 4
+            result = {}
+            for _ in range(count):
+                key, offset = self._decode(view, offset)
+                if not isinstance(key, str):
+                    raise ValueError("Invalid binary message: non-string key")
+                result[key], offset = self._decode(view, offset)
+            return result, offset
+        if tag == _LIST:
+            (count,) = _U32.unpack_from(view, offset)
+            offset += 4
+            result = []
+            for _ in range(count):
+                item, offset = self._decode(view, offset)
+                result.append(item)
+            return result, offset
+        if tag == _INT:
+            return _I64.unpack_from(view, offset)[0], offset + 8
+        if tag == _FLOAT:
+            return _F64.unpack_from(view, offset)[0], offset + 8
+        if tag == _NONE:
+            return None, offset
+        if tag == _TRUE:
+            return True, offset
+        if tag == _FALSE:
+            return False, offset
+        raise ValueError(f"Invalid binary message: unknown type {tag.tobytes()!r}")
+
+
+# Códecs registrados por nombre y por id
+CODECS = {}
+_CODECS_BY_ID = {}
+
+DEFAULT_CODEC = 'json'
+
+
+def register_codec(codec):
+    """
+    Registra un códec.
+
+    Args:
+        codec: Instancia de Codec (reemplaza a otra con el mismo nombre o id)
+    """
+    if not 0 <= codec.codec_id < 0x0F:
+        raise ValueError("codec_id must be between 0 and 14")
+    CODECS[codec.name] = codec
+    _CODECS_BY_ID[codec.codec_id] = codec
+
+
+register_codec(JSONCodec())
+register_codec(BinaryCodec())
+
+
+def get_codec(name=None):
+    """
+    Devuelve un códec por nombre.
+
+    Args:
+        name: Nombre del códec (None para el default, JSON)
+
+    Raises:
+        ValueError: Si el códec no existe
+    """
+    try:
+        return CODECS[name or DEFAULT_CODEC]
+    except KeyError:
+        raise ValueError(f"Unknown codec: {name}") from None
+
+
+def codec_by_id(codec_id):
+    """
+    Devuelve un códec por su id (el que viaja en los flags del mensaje).
+
+    Raises:
+        ValueError: Si el id no corresponde a ningún códec
+    """
+    try:
+        return _CODECS_BY_ID[codec_id]
+    except KeyError:
+        raise ValueError(f"Unknown codec id: {codec_id}") from None
@@ -6,8 +6,8 @@ import base64
 from io import BytesIO
 from PIL import Image
 import requests
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
+
+from common.document import ParsedDocument
 
 
 class ImageProcessor:
@@ -30,20 +30,25 @@ class ImageProcessor:
             'User-Agent': 'Mozilla/5.0 (compatible; ImageProcessor/1.0)'
         })
     
-    def generate_thumbnails(self, url, html_content):
+    def generate_thumbnails(self, url, html_content, image_urls=None, raw=False):
         """
         Genera thumbnails de las imágenes principales de la página.
         
         Args:
             url: URL base de la página
-            html_content: Contenido HTML de la página
+            html_content: Contenido HTML de la página o ParsedDocument
+            image_urls: URLs de imágenes ya extraídas (evita parsear el HTML)
+            raw: Si es True, cada thumbnail se devuelve como bytes JPEG
             
         Returns:
-            Lista de strings con thumbnails en base64
+            Lista de strings con thumbnails en base64 (bytes si raw)
         """
         try:
             # Extraer URLs de imágenes
-            image_urls = self._extract_image_urls(html_content, url)
+            if image_urls is None:
+                image_urls = self._extract_image_urls(html_content, url)
+            else:
+                image_urls = [u for u in image_urls if self._is_valid_image_url(u)]
             
             if not image_urls:
                 return []
@@ -54,7 +59,7 @@ class ImageProcessor:
             # Generar thumbnails
             thumbnails = []
             for img_url in image_urls:
-                thumbnail = self._create_thumbnail(img_url)
+                thumbnail = self._create_thumbnail(img_url, raw)
                 if thumbnail:
                     thumbnails.append(thumbnail)
             
@@ -69,28 +74,18 @@ class ImageProcessor:
         Extrae URLs de imágenes del HTML.
         
         Args:
-            html_content: Contenido HTML
+            html_content: Contenido HTML o ParsedDocument
             base_url: URL base para resolver URLs relativas
             
         Returns:
             Lista de URLs de imágenes
         """
-        soup = BeautifulSoup(html_content, 'lxml')
-        image_urls = []
-        seen = set()
-        
-        for img in soup.find_all('img', src=True):
-            src = img.get('src')
-            if src:
-                # Resolver URL relativa
-                absolute_url = urljoin(base_url, src)
-                
-                # Validar y agregar
-                if self._is_valid_image_url(absolute_url) and absolute_url not in seen:
-                    image_urls.append(absolute_url)
-                    seen.add(absolute_url)
+        document = ParsedDocument.ensure(html_content)
         
-        return image_urls
+        return [
+            absolute_url for absolute_url in document.image_urls(base_url)
+            if self._is_valid_image_url(absolute_url)
+        ]
     
     def _is_valid_image_url(self, url):
         """
@@ -114,15 +109,16 @@ class ImageProcessor:
         except:
             return False
     
-    def _create_thumbnail(self, image_url):
+    def _create_thumbnail(self, image_url, raw=False):
         """
         Descarga una imagen y crea un thumbnail.
         
         Args:
             image_url: URL de la imagen
+            raw: Si es True, devuelve los bytes JPEG sin codificar
             
         Returns:
-            String con el thumbnail en base64 o None si falla
+            String con el thumbnail en base64 (bytes si raw) o None si falla
         """
         try:
             # Descargar imagen
@@ -156,6 +152,8 @@ class ImageProcessor:
             # Guardar como JPEG en memoria
             output = BytesIO()
             image.save(output, format='JPEG', quality=85, optimize=True)
+            if raw:
+                return output.getvalue()
             output.seek(0)
             
             # Convertir a base64
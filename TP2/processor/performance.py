@@ -4,8 +4,9 @@ Módulo para analizar el rendimiento de páginas web.
 
 import time
 import requests
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse
+
+from common.document import ParsedDocument
 
 
 class PerformanceAnalyzer:
@@ -24,12 +25,14 @@ class PerformanceAnalyzer:
             'User-Agent': 'Mozilla/5.0 (compatible; PerformanceAnalyzer/1.0)'
         })
     
-    def analyze(self, url):
+    def analyze(self, url, resources=None):
         """
         Analiza el rendimiento de una URL.
         
         Args:
             url: URL a analizar
+            resources: URLs de recursos ya extraídas de la página. Si se
+                indican, no se vuelve a parsear el HTML descargado.
             
         Returns:
             Diccionario con métricas de rendimiento
@@ -51,9 +54,11 @@ class PerformanceAnalyzer:
             # Tamaño de la página principal
             html_size = len(response.content)
             
-            # Parsear HTML para encontrar recursos
-            soup = BeautifulSoup(response.content, 'lxml')
-            resources = self._extract_resources(soup, url)
+            # Parsear HTML para encontrar recursos (solo si no se recibieron)
+            if resources is None:
+                resources = self._extract_resources(response.content, url)
+            else:
+                resources = [r for r in resources if self._is_valid_resource(r)]
             
             # Calcular métricas
             num_requests = 1 + len(resources)  # 1 para HTML + recursos
@@ -98,43 +103,19 @@ class PerformanceAnalyzer:
         Extrae URLs de recursos (CSS, JS, imágenes) del HTML.
         
         Args:
-            soup: Objeto BeautifulSoup
+            soup: Objeto BeautifulSoup, ParsedDocument o HTML sin parsear
             base_url: URL base para resolver URLs relativas
             
         Returns:
             Lista de URLs de recursos
         """
-        resources = []
-        seen = set()
-        
-        # CSS
-        for link in soup.find_all('link', rel='stylesheet'):
-            href = link.get('href')
-            if href:
-                absolute_url = urljoin(base_url, href)
-                if self._is_valid_resource(absolute_url) and absolute_url not in seen:
-                    resources.append(absolute_url)
-                    seen.add(absolute_url)
-        
-        # JavaScript
-        for script in soup.find_all('script', src=True):
-            src = script.get('src')
-            if src:
-                absolute_url = urljoin(base_url, src)
-                if self._is_valid_resource(absolute_url) and absolute_url not in seen:
-                    resources.append(absolute_url)
-                    seen.add(absolute_url)
-        
-        # Imágenes
-        for img in soup.find_all('img', src=True):
-            src = img.get('src')
-            if src:
-                absolute_url = urljoin(base_url, src)
-                if self._is_valid_resource(absolute_url) and absolute_url not in seen:
-                    resources.append(absolute_url)
-                    seen.add(absolute_url)
+        # CSS, JavaScript e imágenes, sin duplicados
+        document = ParsedDocument.ensure(soup)
         
-        return resources
+        return [
+            absolute_url for absolute_url in document.resource_urls(base_url)
+            if self._is_valid_resource(absolute_url)
+        ]
     
     def _is_valid_resource(self, url):
         """
@@ -25,15 +25,16 @@ class ScreenshotGenerator:
         self.headless = headless
         self.timeout = timeout
     
-    def capture(self, url):
+    def capture(self, url, raw=False):
         """
         Captura un screenshot de la URL.
         
         Args:
             url: URL de la página a capturar
+            raw: Si es True, devuelve los bytes PNG sin codificar
             
         Returns:
-            String con la imagen en base64 o None si falla
+            String con la imagen en base64 (bytes si raw) o None si falla
         """
         driver = None
         try:
@@ -59,6 +60,8 @@ class ScreenshotGenerator:
             
             # Capturar screenshot
             screenshot_png = driver.get_screenshot_as_png()
+            if raw:
+                return screenshot_png
             
             # Convertir a base64
             screenshot_b64 = base64.b64encode(screenshot_png).decode('utf-8')
@@ -81,7 +84,7 @@ class ScreenshotGenerator:
                 except:
                     pass
     
-    def capture_with_dimensions(self, url, width=1920, height=1080):
+    def capture_with_dimensions(self, url, width=1920, height=1080, raw=False):
         """
         Captura un screenshot con dimensiones específicas.
         
@@ -89,9 +92,10 @@ class ScreenshotGenerator:
             url: URL de la página a capturar
             width: Ancho de la ventana
             height: Alto de la ventana
+            raw: Si es True, devuelve los bytes PNG sin codificar
             
         Returns:
-            String con la imagen en base64 o None si falla
+            String con la imagen en base64 (bytes si raw) o None si falla
         """
         driver = None
         try:
@@ -109,6 +113,8 @@ class ScreenshotGenerator:
             time.sleep(2)
             
             screenshot_png = driver.get_screenshot_as_png()
+            if raw:
+                return screenshot_png
             screenshot_b64 = base64.b64encode(screenshot_png).decode('utf-8')
             
             return screenshot_b64
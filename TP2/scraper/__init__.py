@@ -1,6 +1,29 @@
-
 from .html_parser import HTMLParser
 from .metadata_extractor import MetadataExtractor
 from .async_http import AsyncHTTPClient
+from .head_parser import HeadParser
+from .host_scheduler import HostScheduler
+from .extraction import extract_page_data
+from .loop_monitor import LoopLagMonitor
+from .cache import ResponseCache
+from .compression import ResponseCompressor
+from .singleflight import SingleFlight
+from .url_utils import normalize_url
+from .jobs import JobManager
+from .processing_pool import ProcessingConnectionPool
+from .prefork import Supervisor, WorkerRegistry
+from .metrics import MetricsRegistry
+from .admission import AdmissionController
+from .crawler import Crawler, BloomFilter
+from .frontier import DiskFrontier
+from .robots import RobotsCache
 
-__all__ = ['HTMLParser', 'MetadataExtractor', 'AsyncHTTPClient']
\ No newline at end of file
+__all__ = [
+    'HTMLParser', 'MetadataExtractor', 'AsyncHTTPClient',
+    'extract_page_data', 'LoopLagMonitor', 'ResponseCache',
+    'SingleFlight', 'normalize_url', 'JobManager',
+    'ProcessingConnectionPool', 'Supervisor', 'WorkerRegistry',
+    'MetricsRegistry', 'AdmissionController', 'HostScheduler',
+    'Crawler', 'BloomFilter', 'DiskFrontier',
+    'RobotsCache', 'HeadParser', 'ResponseCompressor'
+]
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+Control de admisión: limita los requests en curso y descarta el exceso.
+
+En lugar de dejar que los requests se acumulen sin límite detrás del
+semáforo de AsyncHTTPClient hasta vencer por timeout, cada request pide un
+lugar. Si no hay, espera en una cola acotada y por un tiempo máximo; si
+la cola está llena o la espera vence, se rechaza enseguida para que el
+cliente reintente más tarde (503 + Retry-After).
+"""
+
+import asyncio
+import contextlib
+import math
+import time
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """El request no fue admitido (servidor sobrecargado)"""
+
+    def __init__(self, reason, retry_after):
+        """
+        Args:
+            reason: Motivo del rechazo ('queue_full', 'timeout' o 'codel')
+            retry_after: Segundos sugeridos antes de reintentar
+        """
+        super().__init__(f'Request rejected ({reason})')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Cola de admisión acotada con espera máxima y descarte estilo CoDel.
+
+    Los lugares libres se entregan en orden de llegada. Con `codel_target`
+    activo, si la cola no estuvo vacía en ningún momento durante el último
+    `codel_interval`, la cola se considera persistente (no una ráfaga) y
+    los requests que llegan esperan a lo sumo `codel_target` en lugar de
+    `max_wait`, de modo que la demora en cola vuelve a bajar rápido.
+    """
+
+    REASONS = ('queue_full', 'timeout', 'codel')
+
+    def __init__(self, max_concurrent=32, max_queue=64, max_wait=2.0,
+                 codel_target=None, codel_interval=0.1, clock=time.monotonic):
+        """
+        Inicializa el controlador.
+
+        Args:
+            max_concurrent: Requests admitidos a la vez
+            max_queue: Requests que pueden esperar un lugar
+            max_wait: Espera máxima en la cola en segundos
+            codel_target: Espera máxima en segundos cuando la cola es
+                persistente (None deshabilita el descarte CoDel)
+            codel_interval: Segundos sin vaciarse tras los cuales la cola
+                se considera persistente
+            clock: Función que devuelve el tiempo actual (para tests)
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.codel_target = codel_target
+        self.codel_interval = codel_interval
+        self.clock = clock
+
+        self.active = 0
+        self._waiters = deque()
+        self._last_empty = clock()
+
+        # Tiempo promedio (EWMA) que se ocupa un lugar, para Retry-After
+        self.avg_service_time = 0.0
+
+        # Contadores
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = dict.fromkeys(self.REASONS, 0)
+
+    @property
+    def queue_length(self):
+        """Requests esperando un lugar"""
+        return len(self._waiters)
+
+    def overloaded(self, now=None):
+        """Indica si la cola es persistente según el criterio CoDel"""
+        if self.codel_target is None or not self._waiters:
+            return False
+        now = self.clock() if now is None else now
+        return now - self._last_empty > self.codel_interval
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """
+        Ocupa un lugar mientras dura el bloque.
+
+        Yields:
+            Segundos que el request esperó en la cola
+
+        Raises:
+            AdmissionRejected: Si el request no fue admitido
+        """
+        waited = await self.acquire()
+        start = self.clock()
+        try:
+            yield waited
+        finally:
+            self.release(self.clock() - start)
+
+    async def acquire(self):
+        """
+        Obtiene un lugar, esperando en la cola si hace falta.
+
+        Returns:
+            Segundos que el request esperó en la cola
+
+        Raises:
+            AdmissionRejected: Si la cola está llena o la espera vence
+        """
+        now = self.clock()
+
+        # Camino rápido: hay lugar y nadie esperando
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            self._last_empty = now
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject('queue_full')
+
+        timeout, reason = self.max_wait, 'timeout'
+        if self.overloaded(now):
+            timeout, reason = min(self.max_wait, self.codel_target), 'codel'
+        if not self._waiters:
+            self._last_empty = now
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, now)
+        self._waiters.append(entry)
+        self.queued += 1
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._waiters.remove(entry)
+                future.cancel()
+                raise self._reject(reason)
+            # El lugar llegó justo al vencer la espera: se acepta
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Devolver el lugar que ya se había entregado
+            else:
+                self._waiters.remove(entry)
+                future.cancel()
+            raise
+
+        self.admitted += 1
+        return self.clock() - now
+
+    def release(self, service_time=None):
+        """
+        Libera un lugar, entregándolo al primero de la cola si lo hay.
+
+        Args:
+            service_time: Segundos que se ocupó el lugar (para Retry-After)
+        """
+        if service_time is not None:
+            self.avg_service_time += 0.1 * (service_time - self.avg_service_time)
+
+        while self._waiters:
+            future, _ = self._waiters.popleft()
+            if not self._waiters:
+                self._last_empty = self.clock()
+            if not future.done():
+                future.set_result(None)  # El lugar pasa al siguiente
+                return
+
+        self.active -= 1
+
+    def retry_after(self):
+        """Segundos estimados hasta que se vacíe la cola (mínimo 1)"""
+        pending = len(self._waiters) + 1
+        estimate = pending * self.avg_service_time / max(self.max_concurrent, 1)
+        return max(1, math.ceil(estimate))
+
+    def stats(self):
+        """
+        Devuelve el estado de la admisión.
+
+        Returns:
+            Diccionario con ocupación, cola y contadores
+        """
+        return {
+            'active': self.active,
+            'max_concurrent': self.max_concurrent,
+            'queued': len(self._waiters),
+            'max_queue': self.max_queue,
+            'overloaded': self.overloaded(),
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected)
+        }
+
+    def _reject(self, reason):
+        """Cuenta el rechazo y crea la excepción"""
+        self.rejected[reason] += 1
+        return AdmissionRejected(reason, self.retry_after())
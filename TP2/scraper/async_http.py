@@ -3,30 +3,131 @@ Cliente HTTP asíncrono para realizar requests sin bloquear el event loop.
 """
 
 import asyncio
+import contextlib
+from urllib.parse import urlsplit
 from aiohttp import ClientSession, ClientTimeout, TCPConnector
 import aiohttp
+from .head_parser import HeadParser
+from .host_scheduler import HostScheduler
+
+
+# Límites de tamaño de las descargas
+MAX_PAGE_BYTES = 10 * 1024 * 1024
+MAX_BINARY_BYTES = 5 * 1024 * 1024
+
+# Content-Types que se aceptan como página HTML
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Tamaño de los bloques en que se lee el cuerpo
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class ResponseTooLarge(ValueError):
+    """El cuerpo de la respuesta supera el límite de bytes"""
+
+
+class UnsupportedContentType(ValueError):
+    """El Content-Type de la respuesta no es el esperado (ej: no es HTML)"""
 
 
 class AsyncHTTPClient:
     """Cliente HTTP asíncrono con manejo de timeouts y límites de concurrencia"""
     
-    def __init__(self, max_concurrent=10, timeout=30):
+    def __init__(self, max_concurrent=10, timeout=30, max_per_host=5,
+                 host_rate=None, host_burst=1):
         """
         Inicializa el cliente HTTP asíncrono.
         
         Args:
             max_concurrent: Número máximo de conexiones concurrentes
             timeout: Timeout en segundos para las requests
+            max_per_host: Máximo de conexiones concurrentes por host
+            host_rate: Requests por segundo por host (None = sin límite)
+            host_burst: Requests seguidos permitidos a un host ocioso
         """
         self.max_concurrent = max_concurrent
+        self.max_per_host = max_per_host
         self.timeout = ClientTimeout(total=timeout)
         self.session = None
-        self.semaphore = asyncio.Semaphore(max_concurrent)
+        
+        # Reparte los lugares entre hosts con límites de tasa por host
+        self.scheduler = HostScheduler(
+            max_concurrent=max_concurrent,
+            max_per_host=max_per_host,
+            rate=host_rate,
+            burst=host_burst
+        )
+    
+    @property
+    def active(self):
+        """Descargas en curso"""
+        return self.scheduler.active
+    
+    @property
+    def waiting(self):
+        """Descargas esperando su turno"""
+        return self.scheduler.waiting
+    
+    @contextlib.asynccontextmanager
+    async def _slot(self, url):
+        """
+        Ocupa un lugar de descarga para el host de la URL.
+        
+        Yields:
+            Función feedback(response) que informa el status recibido para
+            ajustar la tasa del host
+        """
+        host = (urlsplit(url).hostname or '').lower()
+        
+        def feedback(response):
+            self.scheduler.feedback(host, response.status, response.headers.get('Retry-After'))
+        
+        async with self.scheduler.slot(host):
+            yield feedback
+    
+    def stats(self):
+        """
+        Devuelve la ocupación del cliente.
+        
+        Returns:
+            Diccionario con el límite de concurrencia, requests activas y en
+            espera, el estado por host y el uso del pool de conexiones
+        """
+        return {
+            'max_concurrent': self.max_concurrent,
+            'active': self.active,
+            'waiting': self.waiting,
+            'hosts': self.scheduler.stats(),
+            'connector': self.connector_stats()
+        }
+    
+    def connector_stats(self):
+        """
+        Devuelve el uso del pool de conexiones de aiohttp.
+        
+        aiohttp no expone estos contadores públicamente, así que se leen
+        de sus atributos internos si existen.
+        
+        Returns:
+            Diccionario con el límite, conexiones en uso y ociosas
+        """
+        connector = self.session.connector if self.session and not self.session.closed else None
+        if connector is None:
+            return {'limit': self.max_concurrent, 'acquired': 0, 'idle': 0}
+        
+        idle = getattr(connector, '_conns', {})
+        return {
+            'limit': connector.limit,
+            'acquired': len(getattr(connector, '_acquired', ())),
+            'idle': sum(len(conns) for conns in idle.values())
+        }
     
     async def _get_session(self):
         """Obtiene o crea la sesión HTTP"""
         if self.session is None or self.session.closed:
-            connector = TCPConnector(limit=self.max_concurrent, limit_per_host=5)
+            connector = TCPConnector(
+                limit=self.max_concurrent, limit_per_host=self.max_per_host
+            )
             self.session = ClientSession(
                 connector=connector,
                 timeout=self.timeout,
@@ -50,24 +151,144 @@ class AsyncHTTPClient:
             aiohttp.ClientError: Si hay error en la request
             asyncio.TimeoutError: Si se excede el timeout
         """
-        async with self.semaphore:  # Limitar concurrencia
+        page = await self.fetch_page(url)
+        return page['content']
+    
+    async def fetch_page(self, url, etag=None, last_modified=None, raise_for_status=True,
+                         content_types=HTML_CONTENT_TYPES, max_bytes=MAX_PAGE_BYTES,
+                         truncate=False):
+        """
+        Descarga una URL, opcionalmente como request condicional.
+        
+        Si se indican validadores (ETag/Last-Modified) y el origen responde
+        304 Not Modified, no se descarga el cuerpo.
+        
+        El cuerpo se lee por bloques: una respuesta con un Content-Type no
+        aceptado o con un Content-Length mayor al límite se descarta antes
+        de leer nada, y una sin Content-Length se corta apenas supera
+        `max_bytes`, sin descargarla entera.
+        
+        Args:
+            url: URL a descargar
+            etag: ETag de una respuesta anterior (If-None-Match)
+            last_modified: Last-Modified de una respuesta anterior (If-Modified-Since)
+            raise_for_status: Si es False, las respuestas 4xx/5xx se
+                devuelven en lugar de lanzar una excepción (ej: robots.txt)
+            content_types: Content-Types aceptados (None = cualquiera); si
+                la respuesta no indica Content-Type se acepta
+            max_bytes: Máximo de bytes del cuerpo
+            truncate: Si es True, un cuerpo más largo que max_bytes se
+                recorta en lugar de lanzar ResponseTooLarge
+            
+        Returns:
+            Diccionario con 'status', 'content' (None si es 304), 'etag',
+            'last_modified' y 'cache_control'
+            
+        Raises:
+            aiohttp.ClientError: Si hay error en la request (o un status
+                de error con raise_for_status)
+            asyncio.TimeoutError: Si se excede el timeout
+            UnsupportedContentType: Si el Content-Type no es aceptado
+            ResponseTooLarge: Si el cuerpo supera max_bytes
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        
+        async with self._slot(url) as feedback:  # Limitar concurrencia y tasa por host
             session = await self._get_session()
             
             try:
-                async with session.get(url) as response:
+                async with session.get(url, headers=headers) as response:
+                    feedback(response)
+                    
                     # Verificar status code
+                    if response.status >= 400 and raise_for_status:
+                        raise aiohttp.ClientError(
+                            f"HTTP {response.status} error for URL: {url}"
+                        )
+                    
+                    page = {
+                        'status': response.status,
+                        'content': None,
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'cache_control': response.headers.get('Cache-Control')
+                    }
+                    
+                    if response.status == 304:
+                        # Conservar los validadores anteriores si el 304 no los repite
+                        page['etag'] = page['etag'] or etag
+                        page['last_modified'] = page['last_modified'] or last_modified
+                        return page
+                    
+                    _check_content_type(response, content_types, url)
+                    body = await _read_body(response, max_bytes, truncate)
+                    page['content'] = _decode(body, response.charset)
+                    return page
+                    
+            except asyncio.TimeoutError:
+                raise asyncio.TimeoutError(f"Timeout fetching URL: {url}")
+            except aiohttp.ClientError as e:
+                raise aiohttp.ClientError(f"Error fetching {url}: {str(e)}")
+    
+    async def fetch_head(self, url, max_bytes=MAX_PAGE_BYTES):
+        """
+        Descarga solo lo necesario para extraer los metadatos del <head>.
+        
+        Cada bloque recibido se pasa a un HeadParser; en cuanto el head
+        está completo se cierra la conexión y el resto del cuerpo no se
+        descarga. El parseo incremental es liviano (unos pocos KB), así que
+        se hace en el event loop.
+        
+        Args:
+            url: URL a descargar
+            max_bytes: Máximo de bytes a leer buscando el fin del head
+            
+        Returns:
+            Diccionario con 'status', 'title', 'meta_tags', 'language',
+            'bytes_read' y 'complete' (si se leyó el cuerpo entero)
+            
+        Raises:
+            aiohttp.ClientError: Si hay error en la request
+            asyncio.TimeoutError: Si se excede el timeout
+            UnsupportedContentType: Si la respuesta no es HTML
+        """
+        async with self._slot(url) as feedback:
+            session = await self._get_session()
+            
+            try:
+                async with session.get(url) as response:
+                    feedback(response)
+                    
                     if response.status >= 400:
                         raise aiohttp.ClientError(
                             f"HTTP {response.status} error for URL: {url}"
                         )
+                    _check_content_type(response, HTML_CONTENT_TYPES, url)
                     
-                    # Limitar tamaño de descarga a 10MB
-                    content = await response.text(errors='ignore')
+                    parser = HeadParser(response.charset)
+                    chunks = _iter_body(response, max_bytes, truncate=True)
+                    async with contextlib.aclosing(chunks):
+                        async for chunk in chunks:
+                            if parser.feed(chunk):
+                                break
                     
-                    if len(content) > 10 * 1024 * 1024:  # 10MB
-                        raise ValueError("Content too large (>10MB)")
+                    complete = response.content.at_eof()
+                    if not complete:
+                        response.close()  # Cancelar el resto de la descarga
+                    parser.close()
                     
-                    return content
+                    return {
+                        'status': response.status,
+                        'title': parser.title,
+                        'meta_tags': parser.meta_tags(),
+                        'language': parser.language(),
+                        'bytes_read': parser.bytes_fed,
+                        'complete': complete
+                    }
                     
             except asyncio.TimeoutError:
                 raise asyncio.TimeoutError(f"Timeout fetching URL: {url}")
@@ -113,23 +334,19 @@ class AsyncHTTPClient:
         Returns:
             Bytes con el contenido binario
         """
-        async with self.semaphore:
+        async with self._slot(url) as feedback:
             session = await self._get_session()
             
             try:
                 async with session.get(url) as response:
+                    feedback(response)
+                    
                     if response.status >= 400:
                         raise aiohttp.ClientError(
                             f"HTTP {response.status} error for URL: {url}"
                         )
                     
-                    # Limitar a 5MB para binarios
-                    content = await response.read()
-                    
-                    if len(content) > 5 * 1024 * 1024:  # 5MB
-                        raise ValueError("Binary content too large (>5MB)")
-                    
-                    return content
+                    return await _read_body(response, MAX_BINARY_BYTES)
                     
             except asyncio.TimeoutError:
                 raise asyncio.TimeoutError(f"Timeout fetching binary from: {url}")
@@ -141,4 +358,92 @@ class AsyncHTTPClient:
         if self.session and not self.session.closed:
             await self.session.close()
             # Esperar a que las conexiones se cierren completamente
-            await asyncio.sleep(0.250)
\ No newline at end of file
+            await asyncio.sleep(0.250)
+
+
+def _check_content_type(response, content_types, url):
+    """
+    Rechaza la respuesta si su Content-Type no es uno de los aceptados.
+    
+    Una respuesta sin Content-Type se acepta. Se cierra la conexión sin
+    leer el cuerpo.
+    
+    Raises:
+        UnsupportedContentType: Si el Content-Type no es aceptado
+    """
+    if content_types is not None and 'Content-Type' in response.headers \
+            and response.content_type not in content_types:
+        response.close()
+        raise UnsupportedContentType(
+            f"Unsupported content type {response.content_type} for URL: {url}"
+        )
+
+
+async def _iter_body(response, max_bytes, truncate=False):
+    """
+    Recorre el cuerpo de una respuesta por bloques, con un límite de bytes.
+    
+    Si Content-Length ya supera el límite no se lee nada; si no lo indica
+    (o miente), la lectura se corta al superar el límite. En ambos casos
+    se cierra la conexión en lugar de devolverla al pool con el cuerpo a
+    medio leer.
+    
+    Args:
+        response: aiohttp.ClientResponse
+        max_bytes: Máximo de bytes a leer
+        truncate: Si es True, se entregan los primeros max_bytes en lugar
+            de lanzar ResponseTooLarge
+        
+    Yields:
+        Bloques de bytes del cuerpo
+        
+    Raises:
+        ResponseTooLarge: Si el cuerpo supera max_bytes (y truncate es False)
+    """
+    too_large = ResponseTooLarge(f"Content too large (>{max_bytes} bytes)")
+    
+    length = response.content_length
+    if length is not None and length > max_bytes and not truncate:
+        response.close()
+        raise too_large
+    
+    remaining = max_bytes
+    async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+        if len(chunk) > remaining:
+            response.close()
+            if not truncate:
+                raise too_large
+            yield chunk[:remaining]
+            return
+        remaining -= len(chunk)
+        yield chunk
+
+
+async def _read_body(response, max_bytes, truncate=False):
+    """
+    Lee el cuerpo completo de una respuesta con un límite de bytes.
+    
+    Args:
+        response: aiohttp.ClientResponse
+        max_bytes: Máximo de bytes a leer
+        truncate: Si es True, devuelve los primeros max_bytes en lugar de
+            lanzar ResponseTooLarge
+        
+    Returns:
+        Bytes del cuerpo
+        
+    Raises:
+        ResponseTooLarge: Si el cuerpo supera max_bytes (y truncate es False)
+    """
+    body = bytearray()
+    async for chunk in _iter_body(response, max_bytes, truncate):
+        body += chunk
+    return bytes(body)
+
+
+def _decode(body, charset):
+    """Decodifica el cuerpo con el charset de la respuesta (o UTF-8)"""
+    try:
+        return body.decode(charset or 'utf-8', errors='ignore')
+    except LookupError:
+        return body.decode('utf-8', errors='ignore')
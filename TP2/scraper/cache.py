@@ -0,0 +1,177 @@
+"""
+Caché de resultados de scraping con expiración (TTL) y desalojo LRU.
+"""
+
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    """Entrada de la caché con sus validadores HTTP"""
+    
+    __slots__ = ('value', 'size', 'expires_at', 'etag', 'last_modified')
+    
+    def __init__(self, value, size, expires_at, etag=None, last_modified=None):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.etag = etag
+        self.last_modified = last_modified
+    
+    def is_fresh(self, now):
+        """Indica si la entrada no expiró"""
+        return now < self.expires_at
+    
+    def has_validators(self):
+        """Indica si la entrada puede revalidarse con ETag/Last-Modified"""
+        return bool(self.etag or self.last_modified)
+
+
+class ResponseCache:
+    """
+    Caché LRU acotada por cantidad de entradas y por bytes.
+    
+    Las entradas expiradas no se descartan inmediatamente: se conservan
+    para poder revalidarlas con ETag/Last-Modified y, si el origen
+    responde 304, se reutilizan sin volver a procesar la página.
+    """
+    
+    def __init__(self, max_entries=1000, max_bytes=256 * 1024 * 1024, ttl=300,
+                 clock=time.monotonic):
+        """
+        Inicializa la caché.
+        
+        Args:
+            max_entries: Número máximo de entradas
+            max_bytes: Tamaño máximo total (estimado) en bytes
+            ttl: Tiempo de vida de cada entrada en segundos
+            clock: Función que devuelve el tiempo actual (para tests)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.evictions = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def lookup(self, key):
+        """
+        Busca una entrada y actualiza los contadores.
+        
+        Args:
+            key: Clave de la entrada (URL)
+            
+        Returns:
+            Tupla (entry, fresh): la entrada (o None) y si sigue vigente
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, False
+        
+        self._entries.move_to_end(key)
+        if entry.is_fresh(self.clock()):
+            self.hits += 1
+            return entry, True
+        
+        self.stale += 1
+        return entry, False
+    
+    def put(self, key, value, etag=None, last_modified=None):
+        """
+        Guarda un resultado en la caché.
+        
+        Args:
+            key: Clave de la entrada (URL)
+            value: Resultado a guardar
+            etag: Header ETag de la respuesta de origen
+            last_modified: Header Last-Modified de la respuesta de origen
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        
+        self.remove(key)
+        self._entries[key] = CacheEntry(
+            value, size, self.clock() + self.ttl, etag, last_modified
+        )
+        self.current_bytes += size
+        self._evict()
+    
+    def refresh(self, key):
+        """
+        Renueva el TTL de una entrada revalidada (respuesta 304).
+        
+        Args:
+            key: Clave de la entrada (URL)
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.expires_at = self.clock() + self.ttl
+            self.revalidated += 1
+    
+    def remove(self, key):
+        """Elimina una entrada si existe"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+    
+    def _evict(self):
+        """Desaloja las entradas menos usadas hasta respetar los límites"""
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self.current_bytes -= entry.size
+            self.evictions += 1
+    
+    def stats(self):
+        """
+        Devuelve los contadores de la caché.
+        
+        Returns:
+            Diccionario con aciertos, fallos, revalidaciones y desalojos
+        """
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'revalidated': self.revalidated,
+            'evictions': self.evictions
+        }
+
+
+def estimate_size(value):
+    """
+    Estima el tamaño en bytes de un resultado sin serializarlo.
+    
+    Args:
+        value: Estructura de dicts, listas, strings y escalares
+        
+    Returns:
+        Tamaño aproximado en bytes
+    """
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, memoryview):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    return 8
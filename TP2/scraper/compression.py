@@ -0,0 +1,184 @@
+"""
+Compresión de las respuestas HTTP según Accept-Encoding.
+
+Los códecs son intercambiables: cualquier objeto con 'name' y
+compress(data, level) puede registrarse con register_codec. Por defecto
+se ofrecen gzip y deflate de la biblioteca estándar.
+"""
+
+import asyncio
+import gzip
+import time
+import zlib
+from abc import ABC, abstractmethod
+
+
+class Codec(ABC):
+    """
+    Interfaz de un códec de Content-Encoding.
+
+    Las subclases definen 'name' (el token de Accept-Encoding) y
+    compress(). compress() puede correr en un thread, así que no debe
+    tocar estado compartido.
+    """
+
+    name = None
+
+    @abstractmethod
+    def compress(self, data, level):
+        """
+        Comprime un cuerpo completo.
+
+        Args:
+            data: Bytes a comprimir
+            level: Nivel de compresión (1-9)
+
+        Returns:
+            Bytes comprimidos
+        """
+
+
+class GzipCodec(Codec):
+    """gzip (RFC 1952)"""
+
+    name = 'gzip'
+
+    def compress(self, data, level):
+        # mtime fijo: el mismo cuerpo siempre produce los mismos bytes
+        return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class DeflateCodec(Codec):
+    """deflate de HTTP: formato zlib (RFC 1950), no deflate crudo"""
+
+    name = 'deflate'
+
+    def compress(self, data, level):
+        return zlib.compress(data, level)
+
+
+# Códecs disponibles por nombre, en orden de preferencia ante empates de q
+CODECS = {}
+
+
+def register_codec(codec):
+    """
+    Registra un códec para la negociación de Accept-Encoding.
+
+    Args:
+        codec: Instancia de Codec (reemplaza a otra con el mismo nombre)
+    """
+    CODECS[codec.name] = codec
+
+
+register_codec(GzipCodec())
+register_codec(DeflateCodec())
+
+
+def negotiate(accept_encoding, available):
+    """
+    Elige el códec preferido por el cliente entre los disponibles.
+
+    Respeta los valores q (q=0 excluye el códec) y el comodín '*'. Ante
+    empates se usa el orden de 'available'.
+
+    Args:
+        accept_encoding: Valor del header Accept-Encoding (o None)
+        available: Nombres de los códecs habilitados, en orden de preferencia
+
+    Returns:
+        Nombre del códec elegido, o None si no se debe comprimir
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(','):
+        token, _, params = item.partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip().lower()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    wildcard = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in available:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _compress_timed(codec, data, level):
+    """Comprime y mide el tiempo de CPU del thread que lo hace"""
+    start = time.thread_time()
+    body = codec.compress(data, level)
+    return body, time.thread_time() - start
+
+
+class ResponseCompressor:
+    """
+    Comprime cuerpos de respuesta con el códec negociado.
+
+    Los cuerpos menores que min_size se envían sin comprimir (el ahorro no
+    compensa el costo). Los mayores que offload_size se comprimen en un
+    executor, ya que comprimir varios MB bloquearía el event loop; zlib
+    libera el GIL, así que alcanza con threads.
+    """
+
+    def __init__(self, level=6, min_size=1024, offload_size=64 * 1024,
+                 codecs=None, executor=None):
+        """
+        Args:
+            level: Nivel de compresión (1-9)
+            min_size: Tamaño mínimo en bytes para comprimir
+            offload_size: Tamaño a partir del cual se comprime fuera del loop
+            codecs: Nombres de los códecs habilitados, en orden de
+                preferencia (default: todos los registrados)
+            executor: Executor para los cuerpos grandes (None usa el
+                executor por defecto del loop)
+        """
+        if not 1 <= level <= 9:
+            raise ValueError("level must be between 1 and 9")
+        self.level = level
+        self.min_size = min_size
+        self.offload_size = offload_size
+        self.codecs = list(codecs if codecs is not None else CODECS)
+        unknown = [name for name in self.codecs if name not in CODECS]
+        if unknown:
+            raise ValueError(f"Unknown codecs: {', '.join(unknown)}")
+        self.executor = executor
+
+    def eligible(self, body):
+        """Indica si un cuerpo es lo bastante grande para comprimirse"""
+        return body is not None and len(body) >= self.min_size
+
+    def choose(self, accept_encoding):
+        """Códec a usar para un Accept-Encoding (o None)"""
+        return negotiate(accept_encoding, self.codecs)
+
+    async def compress(self, body, encoding):
+        """
+        Comprime un cuerpo con el códec indicado.
+
+        Args:
+            body: Bytes a comprimir
+            encoding: Nombre del códec (devuelto por choose)
+
+        Returns:
+            Tupla (bytes comprimidos, segundos de CPU usados)
+        """
+        codec = CODECS[encoding]
+        if len(body) < self.offload_size:
+            return _compress_timed(codec, body, self.level)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, _compress_timed, codec, body, self.level
+        )
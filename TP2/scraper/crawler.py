@@ -0,0 +1,471 @@
+"""
+Crawl recursivo en anchura (BFS) a partir de una o más URLs.
+
+Los enlaces de cada página (HTMLParser.get_links) se agregan a la frontera
+con profundidad + 1 si están dentro del alcance (mismo dominio, regex de
+inclusión/exclusión) y no fueron vistos antes. Un número fijo de workers
+toma URLs de la frontera en orden FIFO, así que las páginas se visitan por
+niveles.
+
+Las URLs vistas se guardan en un filtro de Bloom: unos pocos bytes por URL
+en lugar del string completo, a cambio de una probabilidad de falso
+positivo acotada (una URL nueva que se toma por vista y no se visita).
+
+Con `robots` (un RobotsCache) las URLs que el robots.txt de su sitio
+prohíbe no se descargan: se informan con status 'blocked' y no cuentan
+para el límite de páginas.
+
+Con `state_dir` la frontera vive en disco (DiskFrontier) y el crawl guarda
+checkpoints periódicos; al volver a lanzarlo con el mismo directorio se
+retoma sin volver a visitar las páginas ya completadas.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from .frontier import DiskFrontier, Frontier
+from .url_utils import normalize_url
+
+
+# Archivo de checkpoint dentro de state_dir
+CHECKPOINT_FILE = 'checkpoint.json'
+
+
+class _BloomSlice:
+    """Un filtro de Bloom de tamaño fijo"""
+
+    __slots__ = ('bits', 'size', 'hashes', 'capacity', 'count')
+
+    def __init__(self, capacity, error_rate):
+        # Tamaño y cantidad de hashes óptimos para capacity y error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def positions(self, h1, h2):
+        """Posiciones de los bits (doble hashing de Kirsch-Mitzenmacher)"""
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def contains(self, h1, h2):
+        """Indica si todos los bits del elemento están encendidos"""
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(h1, h2))
+
+    def add(self, h1, h2):
+        """Enciende los bits del elemento"""
+        bits = self.bits
+        for pos in self.positions(h1, h2):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+
+class BloomFilter:
+    """
+    Conjunto compacto de strings con falsos positivos acotados.
+
+    Es escalable: cuando el filtro actual alcanza su capacidad se agrega
+    otro del doble de tamaño y la mitad de tasa de error, de modo que la
+    tasa total se mantiene por debajo de 2 * error_rate.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        """
+        Args:
+            capacity: Elementos esperados en el primer filtro
+            error_rate: Probabilidad de falso positivo del primer filtro
+        """
+        self.error_rate = error_rate
+        self._slices = [_BloomSlice(capacity, error_rate)]
+        self._count = 0
+
+    @staticmethod
+    def _hash(item):
+        """Dos hashes de 64 bits del elemento"""
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+    def __contains__(self, item):
+        h1, h2 = self._hash(item)
+        return any(s.contains(h1, h2) for s in self._slices)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, item):
+        """
+        Agrega un elemento.
+
+        Returns:
+            True si no estaba (o no parecía estar) en el conjunto
+        """
+        h1, h2 = self._hash(item)
+        if any(s.contains(h1, h2) for s in self._slices):
+            return False
+
+        current = self._slices[-1]
+        if current.count >= current.capacity:
+            current = _BloomSlice(
+                current.capacity * 2,
+                self.error_rate / 2 ** len(self._slices)
+            )
+            self._slices.append(current)
+
+        current.add(h1, h2)
+        self._count += 1
+        return True
+
+    @property
+    def nbytes(self):
+        """Memoria ocupada por los bits"""
+        return sum(len(s.bits) for s in self._slices)
+
+    def dumps(self):
+        """
+        Serializa el filtro.
+
+        Returns:
+            Bytes: una línea JSON con los parámetros y luego los bits
+        """
+        header = {
+            'error_rate': self.error_rate,
+            'count': self._count,
+            'slices': [[s.capacity, s.count, s.size, s.hashes] for s in self._slices]
+        }
+        return json.dumps(header).encode('utf-8') + b'\n' + b''.join(
+            bytes(s.bits) for s in self._slices
+        )
+
+    @classmethod
+    def loads(cls, data):
+        """Reconstruye un filtro serializado con dumps"""
+        header, _, bits = data.partition(b'\n')
+        header = json.loads(header)
+
+        bloom = cls.__new__(cls)
+        bloom.error_rate = header['error_rate']
+        bloom._count = header['count']
+        bloom._slices = []
+        position = 0
+        for capacity, count, size, hashes in header['slices']:
+            s = _BloomSlice.__new__(_BloomSlice)
+            s.capacity, s.count, s.size, s.hashes = capacity, count, size, hashes
+            length = (size + 7) // 8
+            s.bits = bytearray(bits[position:position + length])
+            position += length
+            bloom._slices.append(s)
+        return bloom
+
+
+class Crawler:
+    """
+    Crawl BFS con límites de profundidad y de páginas.
+
+    Cada página se obtiene con `fetch(url)`, que debe devolver un resultado
+    como el de ScrapingServer.scrape (con 'status' y
+    'scraping_data'['links']).
+    """
+
+    def __init__(self, fetch, max_depth=2, max_pages=100, same_domain=True,
+                 include=None, exclude=None, concurrency=8, seen=None,
+                 state_dir=None, checkpoint_every=100, robots=None, clock=time.monotonic):
+        """
+        Inicializa el crawler.
+
+        Args:
+            fetch: Corrutina fetch(url) que devuelve el resultado de la página
+            max_depth: Profundidad máxima (0 = solo las URLs iniciales)
+            max_pages: Máximo de páginas a visitar
+            same_domain: Si True, solo se siguen enlaces a los hosts iniciales
+            include: Regex que deben cumplir los enlaces a seguir
+            exclude: Regex de enlaces que no se siguen
+            concurrency: Páginas descargándose a la vez
+            seen: Conjunto de URLs vistas (por defecto un BloomFilter)
+            state_dir: Directorio para la frontera en disco y los
+                checkpoints (None = todo en memoria, sin checkpoints)
+            checkpoint_every: Páginas completadas entre checkpoints
+            robots: Objeto con una corrutina allowed(url) (ej: RobotsCache)
+                para respetar robots.txt (None = no se consulta)
+            clock: Función que devuelve el tiempo actual (para tests)
+        """
+        self.fetch = fetch
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.same_domain = same_domain
+        self.include = re.compile(include) if include else None
+        self.exclude = re.compile(exclude) if exclude else None
+        self.concurrency = max(1, concurrency)
+        self.seen = seen if seen is not None else BloomFilter(capacity=max(1024, max_pages))
+        self.clock = clock
+        self.robots = robots
+
+        self.state_dir = state_dir
+        self.checkpoint_every = max(1, checkpoint_every)
+        if state_dir is not None:
+            self.frontier = DiskFrontier(os.path.join(state_dir, 'frontier'))
+        else:
+            self.frontier = Frontier()
+        self._domains = set()
+        self._changed = None
+        self._in_flight = 0
+        self._checkpoint_lock = None
+        self._generation = 0
+        self._resumed_pages = 0
+        self.resumed = False
+
+        # Contadores
+        self.dispatched = 0
+        self.pages = 0
+        self.errors = 0
+        self.blocked = 0
+        self.started = None
+        self.finished = None
+
+    def in_scope(self, url):
+        """Indica si un enlace descubierto debe seguirse"""
+        if self.same_domain and (urlsplit(url).hostname or '').lower() not in self._domains:
+            return False
+        if self.include is not None and not self.include.search(url):
+            return False
+        if self.exclude is not None and self.exclude.search(url):
+            return False
+        return True
+
+    async def crawl(self, seeds):
+        """
+        Recorre las páginas a partir de las URLs iniciales.
+
+        Si el consumidor deja de iterar (ej: el cliente se desconecta), los
+        workers se cancelan.
+
+        Args:
+            seeds: Lista de URLs iniciales (profundidad 0)
+
+        Yields:
+            Resultado de cada página con 'depth' y 'links_queued', en orden
+            de finalización
+        """
+        self._changed = asyncio.Condition()
+        self._checkpoint_lock = asyncio.Lock()
+        self.started = self.clock()
+
+        if not self._restore():
+            for url in seeds:
+                self._domains.add((urlsplit(url).hostname or '').lower())
+                self._enqueue(url, 0)
+        self._resumed_pages = self.pages
+
+        results = asyncio.Queue(maxsize=self.concurrency)
+        workers = [asyncio.ensure_future(self._worker(results)) for _ in range(self.concurrency)]
+
+        try:
+            running = len(workers)
+            while running:
+                record = await results.get()
+                if record is None:
+                    running -= 1
+                else:
+                    yield record
+            await self.checkpoint()
+        finally:
+            self.finished = self.clock()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.frontier.close()
+
+    def stats(self):
+        """
+        Devuelve el avance del crawl.
+
+        Returns:
+            Diccionario con páginas visitadas (incluye las que fallaron),
+            errores, bloqueadas por robots.txt, pendientes, URLs vistas y
+            páginas por segundo
+        """
+        end = self.finished if self.finished is not None else self.clock()
+        elapsed = end - self.started if self.started is not None else 0.0
+        return {
+            'pages': self.pages,
+            'errors': self.errors,
+            'blocked': self.blocked,
+            'queued': len(self.frontier),
+            'in_flight': self._in_flight,
+            'seen': len(self.seen),
+            'frontier': self.frontier.stats(),
+            'resumed': self.resumed,
+            'elapsed_s': round(elapsed, 3),
+            'pages_per_sec': (
+                round((self.pages - self._resumed_pages) / elapsed, 2) if elapsed > 0 else 0.0
+            )
+        }
+
+    def _enqueue(self, url, depth):
+        """Agrega una URL a la frontera si no fue vista; True si se agregó"""
+        if self.dispatched + len(self.frontier) >= self.max_pages:
+            return False  # Ya hay suficientes páginas para llegar al límite
+        if not self.seen.add(normalize_url(url)):
+            return False
+        self.frontier.push(url, depth)
+        return True
+
+    async def _next(self):
+        """Toma la próxima URL o devuelve None si el crawl terminó"""
+        async with self._changed:
+            while True:
+                if self.dispatched >= self.max_pages:
+                    return None
+                if self.frontier:
+                    self.dispatched += 1
+                    self._in_flight += 1
+                    return self.frontier.pop()
+                if self._in_flight == 0:
+                    return None
+                # Otras páginas en curso pueden agregar enlaces
+                await self._changed.wait()
+
+    async def _worker(self, results):
+        """Visita páginas de la frontera hasta que se agote"""
+        while True:
+            item = await self._next()
+            if item is None:
+                await results.put(None)
+                return
+            url, depth = item
+
+            if self.robots is not None and not await self.robots.allowed(url):
+                self.blocked += 1
+                self.frontier.done(url)
+                async with self._changed:
+                    # No cuenta para max_pages
+                    self.dispatched -= 1
+                    self._in_flight -= 1
+                    self._changed.notify_all()
+                await results.put({
+                    'url': url,
+                    'timestamp': datetime.utcnow().isoformat() + 'Z',
+                    'status': 'blocked',
+                    'message': 'Disallowed by robots.txt',
+                    'depth': depth,
+                    'links_queued': 0
+                })
+                continue
+
+            try:
+                result = await self.fetch(url)
+            except Exception as e:
+                result = {
+                    'url': url,
+                    'timestamp': datetime.utcnow().isoformat() + 'Z',
+                    'status': 'error',
+                    'message': str(e) or type(e).__name__
+                }
+
+            self.pages += 1
+            queued = 0
+            if result.get('status') != 'success':
+                self.errors += 1
+            elif depth < self.max_depth:
+                links = (result.get('scraping_data') or {}).get('links') or []
+                for link in links:
+                    if self.in_scope(link) and self._enqueue(link, depth + 1):
+                        queued += 1
+
+            self.frontier.done(url)
+            async with self._changed:
+                self._in_flight -= 1
+                self._changed.notify_all()
+
+            if self.state_dir is not None and self.pages % self.checkpoint_every == 0:
+                await self.checkpoint()
+
+            await results.put(dict(result, depth=depth, links_queued=queued))
+
+    async def checkpoint(self):
+        """
+        Guarda el estado del crawl en state_dir.
+
+        El snapshot (frontera, URLs vistas y contadores) se toma de una vez
+        en el event loop; la escritura y el fsync se hacen en un thread. El
+        checkpoint se reemplaza de forma atómica, así que un crawl
+        interrumpido se retoma siempre desde uno completo.
+        """
+        if self.state_dir is None:
+            return
+
+        async with self._checkpoint_lock:
+            self._generation += 1
+            frontier = self.frontier.snapshot()
+            seen = self.seen.dumps()
+            state = {
+                'generation': self._generation,
+                'seen_file': f'seen.{self._generation}.bloom',
+                'frontier': frontier,
+                'pages': self.pages,
+                'errors': self.errors,
+                'blocked': self.blocked,
+                'domains': sorted(self._domains)
+            }
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write_checkpoint, state, seen)
+            self.frontier.commit(frontier)
+
+    def _write_checkpoint(self, state, seen):
+        """Escribe el checkpoint de forma atómica (se ejecuta en un thread)"""
+        self.frontier.sync(state['frontier'])
+
+        seen_path = os.path.join(self.state_dir, state['seen_file'])
+        with open(seen_path, 'wb') as f:
+            f.write(seen)
+            f.flush()
+            os.fsync(f.fileno())
+
+        path = os.path.join(self.state_dir, CHECKPOINT_FILE)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        # Los filtros de checkpoints anteriores ya no hacen falta
+        for name in os.listdir(self.state_dir):
+            if name.startswith('seen.') and name.endswith('.bloom') and name != state['seen_file']:
+                os.remove(os.path.join(self.state_dir, name))
+
+    def _restore(self):
+        """
+        Retoma el último checkpoint de state_dir si existe.
+
+        Returns:
+            True si se retomó un crawl anterior
+        """
+        if self.state_dir is None:
+            return False
+        try:
+            with open(os.path.join(self.state_dir, CHECKPOINT_FILE), encoding='utf-8') as f:
+                state = json.load(f)
+            with open(os.path.join(self.state_dir, state['seen_file']), 'rb') as f:
+                seen = BloomFilter.loads(f.read())
+        except FileNotFoundError:
+            return False
+
+        self.frontier.restore(state['frontier'])
+        self.seen = seen
+        self._generation = state['generation']
+        self._domains = set(state['domains'])
+        # Las páginas en curso al guardar vuelven a la frontera
+        self.pages = self.dispatched = state['pages']
+        self.errors = state['errors']
+        self.blocked = state.get('blocked', 0)
+        self.resumed = True
+        return True
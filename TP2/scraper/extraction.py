@@ -0,0 +1,50 @@
+"""
+Extracción de datos de una página (CPU-bound).
+
+Las funciones de este módulo se ejecutan en el pool de parsing del
+servidor de scraping (threads o procesos), fuera del event loop, por lo
+que deben ser funciones de módulo y devolver datos serializables.
+"""
+
+import time
+
+from common.document import ParsedDocument
+from .html_parser import HTMLParser
+from .metadata_extractor import MetadataExtractor
+
+
+def extract_page_data(html_content, base_url):
+    """
+    Parsea la página una sola vez y extrae todos sus datos.
+    
+    Args:
+        html_content: String con el contenido HTML
+        base_url: URL de la página (para resolver URLs relativas)
+        
+    Returns:
+        Diccionario con 'scraping_data' y la duración en segundos del
+        parseo y de la extracción de metadatos ('timings')
+    """
+    start = time.perf_counter()
+    document = ParsedDocument(html_content)
+    parser = HTMLParser(document)
+    parsed = time.perf_counter()
+    
+    meta_tags = MetadataExtractor.extract_meta_tags(document)
+    metadata_done = time.perf_counter()
+    
+    scraping_data = {
+        'title': parser.get_title(),
+        'links': parser.get_links(base_url),
+        'meta_tags': meta_tags,
+        'structure': parser.get_structure(),
+        'images_count': parser.count_images()
+    }
+    
+    return {
+        'scraping_data': scraping_data,
+        'timings': {
+            'parse': parsed - start,
+            'metadata': metadata_done - parsed
+        }
+    }
@@ -0,0 +1,382 @@
+"""
+Fronteras de crawl: URLs pendientes de visitar.
+
+`Frontier` es una cola FIFO en memoria, suficiente para crawls chicos.
+`DiskFrontier` mantiene en memoria solo un segmento "caliente" acotado por
+host y guarda el resto en archivos de solo-append en disco, así que la
+memoria no crece con el tamaño de la frontera. Sus snapshots permiten
+retomar un crawl interrumpido desde el último checkpoint.
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from urllib.parse import urlsplit
+
+
+class Frontier:
+    """Cola FIFO de URLs pendientes (url, profundidad) en memoria"""
+
+    def __init__(self):
+        self._items = deque()
+
+    def __len__(self):
+        return len(self._items)
+
+    def push(self, url, depth):
+        """Agrega una URL al final de la cola"""
+        self._items.append((url, depth))
+
+    def pop(self):
+        """Saca la URL más antigua (la cola no debe estar vacía)"""
+        return self._items.popleft()
+
+    def done(self, url):
+        """Marca una URL como visitada (sin efecto en memoria)"""
+
+    def close(self):
+        """Libera recursos (sin efecto en memoria)"""
+
+    def stats(self):
+        """Devuelve el tamaño de la frontera"""
+        return {'pending': len(self._items)}
+
+
+class _HostQueue:
+    """
+    Subcola de un host.
+
+    Los elementos se agregan al último segmento (write_seq) y se leen
+    desde (read_seq, read_offset); `hot` guarda los ya leídos junto con la
+    posición de cada uno para que un snapshot sepa desde dónde retomar.
+    """
+
+    __slots__ = ('key', 'hot', 'pending', 'first_seq', 'read_seq', 'read_offset',
+                 'write_seq', 'write_size')
+
+    def __init__(self, key):
+        self.key = key
+        self.hot = deque()
+        self.pending = 0
+        self.first_seq = 0
+        self.read_seq = 0
+        self.read_offset = 0
+        self.write_seq = 0
+        self.write_size = 0
+
+    def start(self):
+        """Posición del primer elemento todavía no entregado"""
+        if self.hot:
+            return [self.hot[0][2], self.hot[0][3]]
+        return [self.read_seq, self.read_offset]
+
+
+# Nombre de los segmentos: <clave del host>.<número de segmento>.q
+_SEGMENT_RE = re.compile(r'^([0-9a-f]{16})\.(\d+)\.q$')
+
+
+class DiskFrontier:
+    """
+    Frontera con subcolas por host que desborda a disco.
+
+    Cada host tiene su propia secuencia de segmentos de solo-append (una
+    línea JSON por URL) y un segmento caliente en memoria de hasta
+    `hot_size` URLs; en total nunca hay más de `max_hot` URLs en memoria.
+    pop() alterna entre los hosts con URLs pendientes (round-robin) y
+    respeta el orden FIFO dentro de cada host.
+
+    Para checkpoints: snapshot() toma el estado (rápido, en el event
+    loop), sync() lo hace durable (fsync, puede ir en un thread) y
+    commit() borra los segmentos que ese snapshot ya no necesita.
+    """
+
+    def __init__(self, directory, hot_size=256, max_hot=10000,
+                 segment_bytes=8 * 1024 * 1024, write_buffer_bytes=1024 * 1024):
+        """
+        Inicializa la frontera.
+
+        Args:
+            directory: Directorio de los segmentos (se crea si no existe)
+            hot_size: Máximo de URLs en memoria por host
+            max_hot: Máximo de URLs en memoria en total
+            segment_bytes: Tamaño a partir del cual se empieza otro segmento
+            write_buffer_bytes: Bytes que se acumulan en memoria antes de
+                escribir los segmentos (todos juntos, en bloque)
+        """
+        self.directory = directory
+        self.hot_size = max(1, hot_size)
+        self.max_hot = max(1, max_hot)
+        self.segment_bytes = segment_bytes
+        self.write_buffer_bytes = write_buffer_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._hosts = {}
+        self._ready = deque()          # Hosts con URLs pendientes (round-robin)
+        self._retry = deque()          # URLs en curso al hacer el checkpoint
+        self._in_flight = {}
+        self._buffers = {}             # Escrituras pendientes por segmento
+        self._buffered = 0
+        self._dirty = set()            # Segmentos escritos desde el último sync
+        self._pending = 0
+        self._hot_count = 0
+
+        # Contadores
+        self.spilled = 0
+        self.refills = 0
+
+    def __len__(self):
+        return self._pending + len(self._retry)
+
+    def push(self, url, depth):
+        """Agrega una URL a la subcola de su host"""
+        host = (urlsplit(url).hostname or '').lower()
+        queue = self._hosts.get(host)
+        if queue is None:
+            key = hashlib.blake2b(host.encode('utf-8'), digest_size=8).hexdigest()
+            queue = self._hosts[host] = _HostQueue(key)
+
+        if queue.write_size >= self.segment_bytes:
+            self._flush(queue.key, queue.write_seq)
+            queue.write_seq += 1
+            queue.write_size = 0
+
+        line = (json.dumps([url, depth], ensure_ascii=False) + '\n').encode('utf-8')
+        seq, offset = queue.write_seq, queue.write_size
+        self._write(queue.key, seq, line)
+        queue.write_size += len(line)
+
+        # Si la lectura está al día y hay lugar, la URL queda también en
+        # memoria y no hace falta volver a leerla del disco
+        caught_up = [queue.read_seq, queue.read_offset] == [seq, offset]
+        if caught_up and len(queue.hot) < self.hot_size and self._hot_count < self.max_hot:
+            queue.hot.append((url, depth, seq, offset))
+            queue.read_offset = queue.write_size
+            self._hot_count += 1
+        else:
+            self.spilled += 1
+
+        queue.pending += 1
+        self._pending += 1
+        if queue.pending == 1:
+            self._ready.append(host)
+
+    def pop(self):
+        """
+        Saca la próxima URL, alternando entre hosts.
+
+        Returns:
+            Tupla (url, profundidad)
+
+        Raises:
+            IndexError: Si la frontera está vacía
+        """
+        if self._retry:
+            url, depth = self._retry.popleft()
+            self._in_flight[url] = depth
+            return url, depth
+
+        if not self._ready:
+            raise IndexError('pop from an empty frontier')
+
+        host = self._ready[0]
+        self._ready.rotate(-1)
+        queue = self._hosts[host]
+        if not queue.hot:
+            self._refill(queue)
+
+        url, depth, _, _ = queue.hot.popleft()
+        self._hot_count -= 1
+        queue.pending -= 1
+        self._pending -= 1
+        if queue.pending == 0:
+            self._ready.pop()  # Tras rotate, el host quedó al final
+
+        self._in_flight[url] = depth
+        return url, depth
+
+    def done(self, url):
+        """Marca una URL entregada por pop() como visitada"""
+        self._in_flight.pop(url, None)
+
+    def stats(self):
+        """
+        Devuelve el estado de la frontera.
+
+        Returns:
+            Diccionario con URLs pendientes, en memoria, hosts y lecturas
+            desde disco
+        """
+        return {
+            'pending': len(self),
+            'in_memory': self._hot_count + len(self._retry),
+            'in_flight': len(self._in_flight),
+            'hosts': len(self._ready),
+            'spilled': self.spilled,
+            'refills': self.refills
+        }
+
+    def snapshot(self):
+        """
+        Toma el estado actual para un checkpoint.
+
+        Las URLs en curso (entregadas y no marcadas con done) se incluyen
+        para volver a visitarse al retomar.
+
+        Returns:
+            Diccionario serializable a JSON
+        """
+        self._flush_all()
+        dirty, self._dirty = self._dirty, set()
+
+        return {
+            'hosts': {
+                host: {
+                    'key': queue.key,
+                    'first_seq': queue.first_seq,
+                    'start': queue.start(),
+                    'write': [queue.write_seq, queue.write_size],
+                    'pending': queue.pending
+                }
+                for host, queue in self._hosts.items()
+            },
+            'retry': list(self._in_flight.items()) + [list(item) for item in self._retry],
+            'dirty': sorted(dirty)
+        }
+
+    def sync(self, snapshot):
+        """Hace durables en disco los segmentos escritos hasta el snapshot"""
+        for name in snapshot['dirty']:
+            try:
+                with open(os.path.join(self.directory, name), 'rb') as f:
+                    os.fsync(f.fileno())
+            except FileNotFoundError:
+                pass
+
+    def commit(self, snapshot):
+        """
+        Borra los segmentos que el snapshot (ya durable) no necesita.
+
+        Un host sin URLs pendientes desde el snapshot se olvida por
+        completo junto con sus segmentos.
+        """
+        for host, info in snapshot['hosts'].items():
+            queue = self._hosts.get(host)
+            if queue is None:
+                continue
+
+            if (info['pending'] == 0 and queue.pending == 0
+                    and [queue.write_seq, queue.write_size] == info['write']):
+                self._remove_segments(queue.key, queue.first_seq, queue.write_seq + 1)
+                del self._hosts[host]
+                continue
+
+            start_seq = info['start'][0]
+            if start_seq > queue.first_seq:
+                self._remove_segments(queue.key, queue.first_seq, start_seq)
+                queue.first_seq = start_seq
+
+    def restore(self, snapshot):
+        """
+        Retoma el estado de un snapshot.
+
+        Los segmentos se recortan al tamaño que tenían en el snapshot y se
+        borran los escritos después, de modo que las URLs agregadas tras el
+        checkpoint no se dupliquen al volver a visitar sus páginas.
+        """
+        self.close()
+        self._hosts.clear()
+        self._ready.clear()
+        self._in_flight.clear()
+        self._pending = 0
+        self._hot_count = 0
+
+        for host, info in snapshot['hosts'].items():
+            queue = _HostQueue(info['key'])
+            queue.first_seq = info['first_seq']
+            queue.read_seq, queue.read_offset = info['start']
+            queue.write_seq, queue.write_size = info['write']
+            queue.pending = info['pending']
+            self._hosts[host] = queue
+            self._pending += queue.pending
+            if queue.pending:
+                self._ready.append(host)
+
+        keys = {queue.key: queue for queue in self._hosts.values()}
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_RE.match(name)
+            if not match:
+                continue
+            queue = keys.get(match.group(1))
+            seq = int(match.group(2))
+            path = os.path.join(self.directory, name)
+            if queue is None or seq > queue.write_seq or seq < queue.first_seq:
+                os.remove(path)
+            elif seq == queue.write_seq:
+                os.truncate(path, queue.write_size)
+
+        self._retry = deque(tuple(item) for item in snapshot['retry'])
+
+    def close(self):
+        """Escribe en disco lo que quedó en los buffers"""
+        self._flush_all()
+
+    def _path(self, key, seq):
+        """Ruta de un segmento"""
+        return os.path.join(self.directory, f'{key}.{seq:06d}.q')
+
+    def _write(self, key, seq, data):
+        """Agrega datos al buffer de un segmento"""
+        buffer = self._buffers.get((key, seq))
+        if buffer is None:
+            buffer = self._buffers[(key, seq)] = bytearray()
+        buffer += data
+        self._buffered += len(data)
+        if self._buffered >= self.write_buffer_bytes:
+            self._flush_all()
+
+    def _flush(self, key, seq):
+        """Escribe en su segmento el buffer pendiente"""
+        buffer = self._buffers.pop((key, seq), None)
+        if buffer:
+            with open(self._path(key, seq), 'ab') as f:
+                f.write(buffer)
+            self._buffered -= len(buffer)
+            self._dirty.add(os.path.basename(self._path(key, seq)))
+
+    def _flush_all(self):
+        """Escribe todos los buffers pendientes"""
+        for key, seq in list(self._buffers):
+            self._flush(key, seq)
+
+    def _remove_segments(self, key, first, end):
+        """Borra los segmentos [first, end) de un host"""
+        for seq in range(first, end):
+            try:
+                os.remove(self._path(key, seq))
+            except FileNotFoundError:
+                pass
+
+    def _refill(self, queue):
+        """Lee del disco el próximo tramo de la subcola de un host"""
+        self.refills += 1
+        budget = max(1, min(self.hot_size, self.max_hot - self._hot_count))
+
+        while len(queue.hot) < budget:
+            self._flush(queue.key, queue.read_seq)
+
+            with open(self._path(queue.key, queue.read_seq), 'rb') as f:
+                f.seek(queue.read_offset)
+                for line in f:
+                    url, depth = json.loads(line)
+                    queue.hot.append((url, depth, queue.read_seq, queue.read_offset))
+                    queue.read_offset += len(line)
+                    self._hot_count += 1
+                    if len(queue.hot) >= budget:
+                        return
+
+            if queue.read_seq >= queue.write_seq:
+                return
+            queue.read_seq += 1
+            queue.read_offset = 0
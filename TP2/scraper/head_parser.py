@@ -0,0 +1,125 @@
+"""
+Parseo incremental del <head> de una página mientras se descarga.
+
+El título, los meta tags y el link canónico están en el <head>, que llega
+en los primeros KB de la respuesta. HeadParser recibe el cuerpo por
+bloques (lxml HTMLPullParser) y da el head por terminado al cerrarse
+</head> o empezar <body>, de modo que no hace falta esperar (ni descargar)
+el resto de la página para extraer los metadatos.
+"""
+
+from lxml import etree
+
+from .metadata_extractor import MetadataExtractor
+
+
+class HeadParser:
+    """
+    Parser incremental que extrae los metadatos del <head>.
+
+    Los resultados tienen el mismo formato que HTMLParser.get_title,
+    MetadataExtractor.extract_meta_tags y extract_language.
+    """
+
+    def __init__(self, encoding=None):
+        """
+        Args:
+            encoding: Charset de la respuesta, si se conoce (si no, lxml lo
+                detecta del <meta charset> o asume UTF-8)
+        """
+        self._parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+        self._meta = {}        # (atributo, valor) -> content, primera aparición
+        self._canonical = None
+        self._lang = None
+        self._content_language = None
+        self.title = None
+        self.done = False
+        self.bytes_fed = 0
+
+    def feed(self, chunk):
+        """
+        Procesa un bloque del cuerpo.
+
+        Args:
+            chunk: Bytes recibidos
+
+        Returns:
+            True si el head ya está completo (no hace falta seguir)
+        """
+        if self.done:
+            return True
+        self.bytes_fed += len(chunk)
+        self._parser.feed(chunk)
+        self._read_events()
+        return self.done
+
+    def close(self):
+        """Termina el parseo con lo recibido (ej: el cuerpo terminó antes)"""
+        if not self.done:
+            try:
+                self._parser.close()
+            except etree.XMLSyntaxError:
+                pass  # Documento vacío o truncado: se usa lo que haya
+            self._read_events()
+            self.done = True
+
+    def _read_events(self):
+        """Recorre los eventos nuevos del parser"""
+        for event, element in self._parser.read_events():
+            tag = element.tag
+            if not isinstance(tag, str):
+                continue  # Comentarios e instrucciones de procesamiento
+            tag = tag.lower()
+
+            if event == 'start':
+                if tag == 'body':
+                    self.done = True
+                elif tag == 'html':
+                    self._lang = element.get('lang') or None
+                elif tag == 'meta':
+                    self._add_meta(element)
+                elif tag == 'link' and self._canonical is None:
+                    rel = (element.get('rel') or '').lower().split()
+                    if 'canonical' in rel and element.get('href'):
+                        self._canonical = element.get('href')
+            elif tag == 'title' and self.title is None:
+                self.title = ''.join(element.itertext()).strip()
+            elif tag == 'head':
+                self.done = True
+
+            if self.done:
+                return
+
+    def _add_meta(self, element):
+        """Guarda el content de un meta tag (solo la primera aparición)"""
+        content = element.get('content')
+        if not content:
+            return
+        for attr in ('name', 'property'):
+            value = element.get(attr)
+            if value:
+                self._meta.setdefault((attr, value), content)
+        if (element.get('http-equiv') or '').lower() == 'content-language':
+            self._content_language = self._content_language or content
+
+    def meta_tags(self):
+        """
+        Devuelve los meta tags relevantes del head.
+
+        Returns:
+            Diccionario con el mismo formato que
+            MetadataExtractor.extract_meta_tags
+        """
+        metadata = {}
+        for attr, names in MetadataExtractor.META_TAGS:
+            for name in names:
+                value = self._meta.get((attr, name))
+                if value:
+                    metadata[name] = value
+        if self._canonical:
+            metadata['canonical'] = self._canonical
+        return metadata
+
+    def language(self):
+        """Idioma de la página (atributo lang o meta content-language)"""
+        return self._lang or self._content_language
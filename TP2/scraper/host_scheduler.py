@@ -0,0 +1,371 @@
+"""
+Planificador de descargas por host (politeness).
+
+Cada host tiene su propio token bucket (requests por segundo) y un máximo
+de descargas simultáneas. Los lugares libres del cliente se reparten entre
+los hosts con requests pendientes en round-robin, así que un batch contra
+un solo dominio no acapara el cliente mientras otros hosts esperan.
+
+Si un host responde 429 o 503, su tasa se reduce a la mitad (y se respeta
+Retry-After); cada respuesta exitosa la vuelve a subir de a poco hasta la
+tasa configurada (AIMD).
+"""
+
+import asyncio
+import contextlib
+import email.utils
+import math
+import time
+from collections import deque
+
+
+# Status que indican que el host nos está limitando
+THROTTLE_STATUSES = frozenset({429, 503})
+
+
+class TokenBucket:
+    """Token bucket: `rate` tokens por segundo, acumulando hasta `burst`"""
+
+    def __init__(self, rate, burst, now):
+        """
+        Args:
+            rate: Tokens por segundo (math.inf = sin límite)
+            burst: Máximo de tokens acumulados
+            now: Tiempo actual
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now):
+        """Suma los tokens generados desde la última actualización"""
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Segundos hasta que haya un token disponible (0 si ya lo hay)"""
+        if self.rate == math.inf:
+            return 0.0
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        """Consume un token (debe haber uno disponible)"""
+        if self.rate != math.inf:
+            self._refill(now)
+            self.tokens -= 1
+
+    def set_rate(self, rate, now):
+        """Cambia la tasa conservando los tokens acumulados"""
+        if self.rate != math.inf:
+            self._refill(now)
+        else:
+            self.tokens = min(self.tokens, self.burst)
+        self.rate = rate
+        self.updated = now
+
+    def full(self, now):
+        """Indica si el bucket está lleno (equivale a uno nuevo)"""
+        return self.delay(now) == 0.0 and (self.rate == math.inf or self.tokens >= self.burst)
+
+
+class _HostState:
+    """Estado de un host: bucket, descargas en curso y cola de espera"""
+
+    __slots__ = ('bucket', 'active', 'waiters', 'rate', 'recover_to', 'blocked_until',
+                 'throttles')
+
+    def __init__(self, rate, burst, now):
+        self.bucket = TokenBucket(rate, burst, now)
+        self.active = 0
+        self.waiters = deque()
+        self.rate = rate
+        self.recover_to = None   # Tasa a la que se vuelve a "sin límite"
+        self.blocked_until = 0.0
+        self.throttles = 0
+
+
+class HostScheduler:
+    """
+    Reparte los lugares de descarga entre hosts con límites por host.
+
+    Un request puede empezar cuando hay un lugar global libre, su host no
+    alcanzó `max_per_host`, el bucket del host tiene un token y no hay un
+    Retry-After vigente. Si no, espera en la cola de su host; al liberarse
+    un lugar (o generarse un token) se atiende al siguiente host en
+    round-robin.
+    """
+
+    def __init__(self, max_concurrent=10, max_per_host=5, rate=None, burst=1,
+                 min_rate=0.1, backoff=0.5, recovery=0.1, max_retry_after=60,
+                 clock=time.monotonic):
+        """
+        Inicializa el planificador.
+
+        Args:
+            max_concurrent: Descargas simultáneas en total
+            max_per_host: Descargas simultáneas por host
+            rate: Requests por segundo por host (None = sin límite)
+            burst: Requests que un host puede hacer seguidos tras estar ocioso
+            min_rate: Tasa mínima a la que se reduce un host limitado
+            backoff: Factor por el que se multiplica la tasa ante 429/503
+            recovery: Fracción de la tasa objetivo que se recupera por
+                cada respuesta exitosa
+            max_retry_after: Máximo de segundos de Retry-After que se respetan
+            clock: Función que devuelve el tiempo actual (para tests)
+        """
+        self.max_concurrent = max_concurrent
+        self.max_per_host = max_per_host
+        self.rate = rate if rate else math.inf
+        self.burst = max(1, burst)
+        self.min_rate = min_rate
+        self.backoff = backoff
+        self.recovery = recovery
+        self.max_retry_after = max_retry_after
+        self.clock = clock
+
+        self.active = 0
+        self.waiting = 0
+        self._hosts = {}
+        self._ready = deque()   # Hosts con requests en espera (round-robin)
+        self._timer = None
+        self._timer_at = None
+
+        # Contadores
+        self.throttle_events = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self, host):
+        """Ocupa un lugar de descarga para `host` mientras dura el bloque"""
+        await self.acquire(host)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    async def acquire(self, host):
+        """
+        Espera el turno de `host` para iniciar una descarga.
+
+        Args:
+            host: Nombre del host (clave de los límites)
+        """
+        now = self.clock()
+        state = self._state(host, now)
+
+        # Camino rápido: nadie esperando en el host y todo disponible
+        if not state.waiters and self._can_start(state, now):
+            self._start(state, now)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        state.waiters.append(future)
+        if len(state.waiters) == 1:
+            self._ready.append(host)
+        self.waiting += 1
+
+        try:
+            self._dispatch()
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(host)  # Devolver el lugar que ya se había entregado
+            else:
+                future.cancel()
+                self._dispatch()
+            raise
+        finally:
+            self.waiting -= 1
+
+    def release(self, host):
+        """Libera el lugar de `host` y atiende a los que esperan"""
+        state = self._hosts[host]
+        state.active -= 1
+        self.active -= 1
+        self._dispatch()
+        self._forget_if_idle(host, state)
+
+    def feedback(self, host, status, retry_after=None):
+        """
+        Ajusta la tasa de un host según el status de su respuesta.
+
+        Args:
+            host: Nombre del host
+            status: Código HTTP recibido
+            retry_after: Valor del header Retry-After, si vino
+        """
+        state = self._hosts.get(host)
+        if state is None:
+            return
+        now = self.clock()
+
+        if status in THROTTLE_STATUSES:
+            self.throttle_events += 1
+            state.throttles += 1
+            if state.rate == math.inf:
+                # Sin tasa configurada: partir de una por lugar del host
+                state.recover_to = float(self.max_per_host)
+                state.rate = state.recover_to
+            state.rate = max(self.min_rate, state.rate * self.backoff)
+            state.bucket.set_rate(state.rate, now)
+            state.bucket.tokens = min(state.bucket.tokens, 0)  # Sin ráfagas tras el límite
+
+            delay = parse_retry_after(retry_after, time.time())
+            if delay:
+                state.blocked_until = max(
+                    state.blocked_until, now + min(delay, self.max_retry_after)
+                )
+            return
+
+        if status < 400 and state.rate < self.rate:
+            # Recuperación lineal hacia la tasa objetivo
+            target = state.recover_to or self.rate
+            state.rate += target * self.recovery
+            if state.rate >= target or math.isclose(state.rate, target):
+                state.rate = self.rate if state.recover_to else target
+                state.recover_to = None
+            state.bucket.set_rate(state.rate, now)
+
+    def stats(self):
+        """
+        Devuelve el estado del planificador.
+
+        Returns:
+            Diccionario con ocupación, hosts y tasas reducidas
+        """
+        now = self.clock()
+        throttled = {
+            host: {
+                'rate': round(state.rate, 3),
+                'blocked_for': round(max(0.0, state.blocked_until - now), 3)
+            }
+            for host, state in self._hosts.items()
+            if state.rate < self.rate or state.blocked_until > now
+        }
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_per_host': self.max_per_host,
+            'rate': None if self.rate == math.inf else self.rate,
+            'hosts': len(self._hosts),
+            'hosts_waiting': len(self._ready),
+            'throttle_events': self.throttle_events,
+            'throttled': throttled
+        }
+
+    def _state(self, host, now):
+        """Obtiene (o crea) el estado de un host"""
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.rate, self.burst, now)
+        return state
+
+    def _can_start(self, state, now):
+        """Indica si el host puede iniciar una descarga ahora"""
+        return (
+            self.active < self.max_concurrent
+            and state.active < self.max_per_host
+            and now >= state.blocked_until
+            and state.bucket.delay(now) == 0.0
+        )
+
+    def _start(self, state, now):
+        """Ocupa un lugar global y uno del host"""
+        state.bucket.take(now)
+        state.active += 1
+        self.active += 1
+
+    def _dispatch(self):
+        """
+        Entrega lugares a los hosts en espera, uno por host en cada vuelta.
+
+        Si algún host espera solo por su tasa (o Retry-After), se programa
+        un timer para cuando pueda continuar.
+        """
+        now = self.clock()
+        wake = None
+
+        granted = True
+        while granted and self._ready and self.active < self.max_concurrent:
+            granted = False
+            for _ in range(len(self._ready)):
+                if self.active >= self.max_concurrent:
+                    break
+                host = self._ready.popleft()
+                state = self._hosts[host]
+
+                # Descartar requests cancelados
+                while state.waiters and state.waiters[0].done():
+                    state.waiters.popleft()
+                if not state.waiters:
+                    continue
+
+                if self._can_start(state, now):
+                    self._start(state, now)
+                    state.waiters.popleft().set_result(None)
+                    granted = True
+                elif state.active < self.max_per_host:
+                    delay = max(state.blocked_until - now, state.bucket.delay(now))
+                    wake = delay if wake is None else min(wake, delay)
+
+                while state.waiters and state.waiters[0].done():
+                    state.waiters.popleft()
+                if state.waiters:
+                    self._ready.append(host)
+                else:
+                    self._forget_if_idle(host, state)
+
+        if wake is not None:
+            self._schedule(now + wake)
+
+    def _schedule(self, when):
+        """Programa un _dispatch para `when` (si no hay uno antes)"""
+        if self._timer is not None:
+            if self._timer_at <= when:
+                return
+            self._timer.cancel()
+        loop = asyncio.get_running_loop()
+        self._timer_at = when
+        self._timer = loop.call_later(max(0.0, when - self.clock()), self._on_timer)
+
+    def _on_timer(self):
+        """Callback del timer: reintentar la entrega de lugares"""
+        self._timer = None
+        self._timer_at = None
+        self._dispatch()
+
+    def _forget_if_idle(self, host, state):
+        """Descarta el estado de un host que ya no aporta información"""
+        now = self.clock()
+        if (state.active == 0 and not state.waiters and state.rate == self.rate
+                and now >= state.blocked_until and state.bucket.full(now)):
+            self._hosts.pop(host, None)
+
+
+def parse_retry_after(value, now):
+    """
+    Interpreta un header Retry-After.
+
+    Args:
+        value: Segundos o fecha HTTP
+        now: Tiempo actual (epoch) para las fechas
+
+    Returns:
+        Segundos a esperar, o None si el valor no es válido
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return max(0.0, date.timestamp() - now)
@@ -2,8 +2,10 @@
 Módulo para parsear HTML y extraer información estructurada.
 """
 
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from bs4 import CData, NavigableString
+from urllib.parse import urlparse
+
+from common.document import ParsedDocument
 
 
 class HTMLParser:
@@ -14,9 +16,11 @@ class HTMLParser:
         Inicializa el parser con contenido HTML.
         
         Args:
-            html_content: String con el contenido HTML
+            html_content: String con el contenido HTML o ParsedDocument
+                ya parseado (se reutiliza sin volver a parsear)
         """
-        self.soup = BeautifulSoup(html_content, 'lxml')
+        self.document = ParsedDocument.ensure(html_content)
+        self.soup = self.document.soup
     
     def get_title(self):
         """
@@ -25,10 +29,13 @@ class HTMLParser:
         Returns:
             String con el título o None si no existe
         """
-        title_tag = self.soup.find('title')
-        if title_tag:
-            return title_tag.get_text(strip=True)
-        return None
+        def compute():
+            title_tag = self.soup.find('title')
+            if title_tag:
+                return title_tag.get_text(strip=True)
+            return None
+        
+        return self.document.memoize('title', compute)
     
     def get_links(self, base_url):
         """
@@ -40,39 +47,11 @@ class HTMLParser:
         Returns:
             Lista de URLs absolutas
         """
-        links = []
-        seen = set()
-        
-        for a_tag in self.soup.find_all('a', href=True):
-            href = a_tag['href']
-            
-            # Resolver URL relativa a absoluta
-            absolute_url = urljoin(base_url, href)
-            
-            # Validar y agregar si no se ha visto
-            if self._is_valid_link(absolute_url) and absolute_url not in seen:
-                links.append(absolute_url)
-                seen.add(absolute_url)
+        # URLs absolutas, validadas y sin duplicados (memorizadas en el documento)
+        links = self.document.resolve_attribute_urls('a', 'href', base_url)
         
         return links[:100]  # Limitar a 100 enlaces
     
-    def _is_valid_link(self, url):
-        """
-        Valida si un enlace es válido.
-        
-        Args:
-            url: URL a validar
-            
-        Returns:
-            Boolean indicando si es válida
-        """
-        try:
-            parsed = urlparse(url)
-            # Debe tener esquema (http/https) y dominio
-            return parsed.scheme in ['http', 'https'] and bool(parsed.netloc)
-        except:
-            return False
-    
     def get_structure(self):
         """
         Analiza la estructura de headers de la página.
@@ -80,16 +59,19 @@ class HTMLParser:
         Returns:
             Diccionario con conteo de cada nivel de header (h1-h6)
         """
-        structure = {}
-        
-        for level in range(1, 7):
-            tag_name = f'h{level}'
-            headers = self.soup.find_all(tag_name)
-            count = len(headers)
-            if count > 0:
-                structure[tag_name] = count
+        def compute():
+            structure = {}
+            
+            for level in range(1, 7):
+                tag_name = f'h{level}'
+                headers = self.soup.find_all(tag_name)
+                count = len(headers)
+                if count > 0:
+                    structure[tag_name] = count
+            
+            return structure
         
-        return structure
+        return dict(self.document.memoize('structure', compute))
     
     def count_images(self):
         """
@@ -98,8 +80,10 @@ class HTMLParser:
         Returns:
             Número entero de imágenes encontradas
         """
-        images = self.soup.find_all('img')
-        return len(images)
+        return self.document.memoize(
+            'images_count',
+            lambda: len(self.soup.find_all('img'))
+        )
     
     def get_images(self, base_url, limit=5):
         """
@@ -113,21 +97,13 @@ class HTMLParser:
             Lista de URLs absolutas de imágenes
         """
         images = []
-        seen = set()
         
-        for img_tag in self.soup.find_all('img', src=True):
+        for absolute_url in self.document.image_urls(base_url):
             if len(images) >= limit:
                 break
             
-            src = img_tag['src']
-            
-            # Resolver URL relativa a absoluta
-            absolute_url = urljoin(base_url, src)
-            
-            # Validar y agregar si no se ha visto
-            if self._is_valid_image_url(absolute_url) and absolute_url not in seen:
+            if self._is_valid_image_url(absolute_url):
                 images.append(absolute_url)
-                seen.add(absolute_url)
         
         return images
     
@@ -164,12 +140,20 @@ class HTMLParser:
         Returns:
             String con el texto visible
         """
-        # Remover scripts y styles
-        for script in self.soup(['script', 'style']):
-            script.decompose()
-        
-        # Obtener texto
-        text = self.soup.get_text(separator=' ', strip=True)
+        # Omitir scripts y styles sin modificar el árbol compartido
+        def compute():
+            parts = []
+            for string in self.soup.find_all(string=True):
+                if type(string) not in (NavigableString, CData):
+                    continue
+                if string.parent is not None and string.parent.name in ('script', 'style'):
+                    continue
+                stripped = string.strip()
+                if stripped:
+                    parts.append(stripped)
+            return ' '.join(parts)
+        
+        text = self.document.memoize('text_content', compute)
         
         # Limitar longitud
         if len(text) > max_length:
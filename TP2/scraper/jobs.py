@@ -0,0 +1,225 @@
+"""
+Trabajos de scraping asíncronos (submit / poll / fetch).
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+class JobTableFull(Exception):
+    """La tabla de trabajos está llena y no hay trabajos terminados para desalojar"""
+
+
+class Job:
+    """Trabajo de scraping con su progreso por etapa"""
+    
+    STAGES = ('fetch', 'parse', 'processing')
+    
+    def __init__(self, job_id, kind, params, created_at):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.status = 'queued'
+        self.stages = {stage: 'pending' for stage in self.STAGES}
+        self.created_at = created_at
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.task = None
+    
+    @property
+    def finished(self):
+        """Indica si el trabajo terminó (con éxito o con error)"""
+        return self.status in ('done', 'error')
+    
+    def update_stage(self, stage, state):
+        """
+        Actualiza el estado de una etapa.
+        
+        Args:
+            stage: Nombre de la etapa (ej: 'fetch')
+            state: Nuevo estado ('running', 'done', 'cached', ...)
+        """
+        self.stages[stage] = state
+    
+    def to_dict(self):
+        """
+        Representación pública del trabajo (sin el resultado).
+        
+        Returns:
+            Diccionario con estado, etapas y tiempos
+        """
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'stages': dict(self.stages),
+            'created_at': _iso(self.created_at),
+            'started_at': _iso(self.started_at),
+            'finished_at': _iso(self.finished_at),
+            'error': self.error
+        }
+
+
+class JobManager:
+    """
+    Tabla de trabajos en memoria, acotada y con expiración.
+    
+    Los trabajos se ejecutan como tareas del event loop con concurrencia
+    limitada. Los terminados expiran `ttl` segundos después de finalizar;
+    si la tabla se llena se desalojan primero los expirados y luego los
+    terminados más antiguos. Los trabajos pendientes nunca se desalojan.
+    """
+    
+    def __init__(self, max_jobs=1000, ttl=3600, max_running=8, clock=time.time,
+                 id_prefix=''):
+        """
+        Inicializa la tabla de trabajos.
+        
+        Args:
+            max_jobs: Número máximo de trabajos en la tabla
+            ttl: Segundos que se conserva un trabajo terminado
+            max_running: Número máximo de trabajos ejecutándose a la vez
+            clock: Función que devuelve el tiempo actual (para tests)
+            id_prefix: Prefijo de los ids (identifica al proceso dueño del
+                trabajo en el modo pre-fork)
+        """
+        self.id_prefix = id_prefix
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.max_running = max_running
+        self.clock = clock
+        self._jobs = {}
+        self._semaphore = None
+        
+        # Contadores
+        self.submitted = 0
+        self.rejected = 0
+        self.expired = 0
+    
+    def submit(self, kind, params, func):
+        """
+        Registra un trabajo y lo lanza en segundo plano.
+        
+        Args:
+            kind: Tipo de trabajo (ej: 'scrape')
+            params: Parámetros públicos del trabajo (ej: {'url': ...})
+            func: Función func(job) que devuelve una corutina con el resultado
+            
+        Returns:
+            Job registrado
+            
+        Raises:
+            JobTableFull: Si no hay lugar en la tabla
+        """
+        self._make_room()
+        
+        job = Job(self.id_prefix + uuid.uuid4().hex, kind, params, self.clock())
+        self._jobs[job.id] = job
+        job.task = asyncio.ensure_future(self._run(job, func))
+        self.submitted += 1
+        return job
+    
+    def get(self, job_id):
+        """
+        Busca un trabajo por id.
+        
+        Returns:
+            Job o None si no existe o expiró
+        """
+        job = self._jobs.get(job_id)
+        if job is not None and self._is_expired(job, self.clock()):
+            self._remove(job)
+            self.expired += 1
+            return None
+        return job
+    
+    async def _run(self, job, func):
+        """Ejecuta el trabajo respetando el límite de concurrencia"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_running)
+        
+        async with self._semaphore:
+            job.status = 'running'
+            job.started_at = self.clock()
+            try:
+                job.result = await func(job)
+                job.status = 'done'
+            except asyncio.CancelledError:
+                job.status = 'error'
+                job.error = 'Cancelled'
+                raise
+            except Exception as e:
+                job.status = 'error'
+                job.error = str(e) or type(e).__name__
+            finally:
+                job.finished_at = self.clock()
+                job.task = None
+    
+    def _is_expired(self, job, now):
+        """Indica si un trabajo terminado superó su TTL"""
+        return job.finished and now - job.finished_at > self.ttl
+    
+    def _remove(self, job):
+        """Quita un trabajo de la tabla"""
+        self._jobs.pop(job.id, None)
+    
+    def _make_room(self):
+        """Libera lugar en la tabla o lanza JobTableFull"""
+        if len(self._jobs) < self.max_jobs:
+            return
+        
+        now = self.clock()
+        for job in [j for j in self._jobs.values() if self._is_expired(j, now)]:
+            self._remove(job)
+            self.expired += 1
+        
+        if len(self._jobs) < self.max_jobs:
+            return
+        
+        # Desalojar el trabajo terminado más antiguo
+        finished = [j for j in self._jobs.values() if j.finished]
+        if finished:
+            self._remove(min(finished, key=lambda j: j.finished_at))
+            return
+        
+        self.rejected += 1
+        raise JobTableFull(f"Job table full ({self.max_jobs} active jobs)")
+    
+    async def close(self):
+        """Cancela los trabajos pendientes"""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def stats(self):
+        """
+        Devuelve los contadores de la tabla de trabajos.
+        
+        Returns:
+            Diccionario con trabajos por estado y contadores
+        """
+        by_status = {'queued': 0, 'running': 0, 'done': 0, 'error': 0}
+        for job in self._jobs.values():
+            by_status[job.status] += 1
+        
+        return {
+            'jobs': len(self._jobs),
+            'max_jobs': self.max_jobs,
+            'by_status': by_status,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'expired': self.expired
+        }
+
+
+def _iso(timestamp):
+    """Convierte un timestamp epoch a ISO 8601 (UTC) o None"""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace('+00:00', 'Z')
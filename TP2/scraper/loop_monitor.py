@@ -0,0 +1,84 @@
+"""
+Monitor de latencia (lag) del event loop.
+"""
+
+import asyncio
+
+
+class LoopLagMonitor:
+    """
+    Mide cuánto se retrasa el event loop respecto de lo programado.
+    
+    Duerme periódicamente `interval` segundos y registra el exceso de
+    tiempo hasta que vuelve a ejecutarse. Un lag alto indica que hay
+    código bloqueando el loop (por ejemplo, parsing inline).
+    """
+    
+    def __init__(self, interval=0.1, smoothing=0.1):
+        """
+        Inicializa el monitor.
+        
+        Args:
+            interval: Período de muestreo en segundos
+            smoothing: Factor de suavizado del promedio exponencial (0-1)
+        """
+        self.interval = interval
+        self.smoothing = smoothing
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.avg_lag = 0.0
+        self.samples = 0
+        self._task = None
+    
+    def start(self):
+        """Inicia el muestreo en una tarea del loop actual"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self):
+        """Detiene el muestreo"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        """Bucle de muestreo"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(loop.time() - start - self.interval)
+    
+    def record(self, lag):
+        """
+        Registra una muestra de lag.
+        
+        Args:
+            lag: Retraso observado en segundos
+        """
+        lag = max(lag, 0.0)
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        if self.samples == 0:
+            self.avg_lag = lag
+        else:
+            self.avg_lag += self.smoothing * (lag - self.avg_lag)
+        self.samples += 1
+    
+    def stats(self):
+        """
+        Devuelve las métricas de lag en milisegundos.
+        
+        Returns:
+            Diccionario con lag actual, promedio, máximo y cantidad de muestras
+        """
+        return {
+            'last_ms': round(self.last_lag * 1000, 3),
+            'avg_ms': round(self.avg_lag * 1000, 3),
+            'max_ms': round(self.max_lag * 1000, 3),
+            'samples': self.samples
+        }
@@ -2,46 +2,61 @@
 Módulo para extraer metadatos de páginas web.
 """
 
-from bs4 import BeautifulSoup
+import json
+
+from common.document import ParsedDocument
 
 
 class MetadataExtractor:
     """Extractor de metadatos de páginas HTML"""
     
+    # Meta tags extraídos: (atributo que los identifica, nombres)
+    META_TAGS = (
+        # Meta tags estándar
+        ('name', ('description', 'keywords', 'author', 'viewport', 'robots')),
+        # Open Graph tags
+        ('property', ('og:title', 'og:description', 'og:image', 'og:url', 'og:type',
+                      'og:site_name')),
+        # Twitter Card tags
+        ('name', ('twitter:card', 'twitter:title', 'twitter:description', 'twitter:image'))
+    )
+    
     @staticmethod
     def extract_meta_tags(html_content):
         """
         Extrae meta tags relevantes del HTML.
         
         Args:
-            html_content: String con el contenido HTML
+            html_content: String con el contenido HTML o ParsedDocument
             
         Returns:
             Diccionario con los meta tags encontrados
         """
-        soup = BeautifulSoup(html_content, 'lxml')
-        metadata = {}
-        
-        # Meta tags estándar
-        standard_tags = ['description', 'keywords', 'author', 'viewport', 'robots']
-        for tag_name in standard_tags:
-            value = MetadataExtractor._get_meta_content(soup, 'name', tag_name)
-            if value:
-                metadata[tag_name] = value
+        document = ParsedDocument.ensure(html_content)
+        metadata = document.memoize(
+            'meta_tags',
+            lambda: MetadataExtractor._extract_meta_tags(document.soup)
+        )
+        return dict(metadata)
+    
+    @staticmethod
+    def _extract_meta_tags(soup):
+        """
+        Extrae los meta tags desde un árbol ya parseado.
         
-        # Open Graph tags
-        og_tags = ['og:title', 'og:description', 'og:image', 'og:url', 'og:type', 'og:site_name']
-        for tag_name in og_tags:
-            value = MetadataExtractor._get_meta_content(soup, 'property', tag_name)
-            if value:
-                metadata[tag_name] = value
+        Args:
+            soup: Objeto BeautifulSoup
+            
+        Returns:
+            Diccionario con los meta tags encontrados
+        """
+        metadata = {}
         
-        # Twitter Card tags
-        twitter_tags = ['twitter:card', 'twitter:title', 'twitter:description', 'twitter:image']
-        for tag_name in twitter_tags:
-            value = MetadataExtractor._get_meta_content(soup, 'name', tag_name)
-            if value:
-                metadata[tag_name] = value
+        for attr_name, tag_names in MetadataExtractor.META_TAGS:
+            for tag_name in tag_names:
+                value = MetadataExtractor._get_meta_content(soup, attr_name, tag_name)
+                if value:
+                    metadata[tag_name] = value
         
         # Canonical URL
         canonical = soup.find('link', rel='canonical')
@@ -74,24 +89,27 @@ class MetadataExtractor:
         Extrae datos estructurados (JSON-LD, Schema.org) del HTML.
         
         Args:
-            html_content: String con el contenido HTML
+            html_content: String con el contenido HTML o ParsedDocument
             
         Returns:
             Lista de objetos de datos estructurados
         """
-        soup = BeautifulSoup(html_content, 'lxml')
-        structured_data = []
+        document = ParsedDocument.ensure(html_content)
         
-        # Buscar scripts con type="application/ld+json"
-        for script in soup.find_all('script', type='application/ld+json'):
-            try:
-                import json
-                data = json.loads(script.string)
-                structured_data.append(data)
-            except:
-                continue
+        def compute():
+            structured_data = []
+            
+            # Buscar scripts con type="application/ld+json"
+            for script in document.soup.find_all('script', type='application/ld+json'):
+                try:
+                    data = json.loads(script.string)
+                    structured_data.append(data)
+                except:
+                    continue
+            
+            return structured_data
         
-        return structured_data
+        return list(document.memoize('structured_data', compute))
     
     @staticmethod
     def extract_language(html_content):
@@ -99,13 +117,28 @@ class MetadataExtractor:
         Detecta el idioma de la página.
         
         Args:
-            html_content: String con el contenido HTML
+            html_content: String con el contenido HTML o ParsedDocument
             
         Returns:
             Código de idioma (ej: 'en', 'es') o None
         """
-        soup = BeautifulSoup(html_content, 'lxml')
+        document = ParsedDocument.ensure(html_content)
+        return document.memoize(
+            'language',
+            lambda: MetadataExtractor._extract_language(document.soup)
+        )
+    
+    @staticmethod
+    def _extract_language(soup):
+        """
+        Detecta el idioma desde un árbol ya parseado.
         
+        Args:
+            soup: Objeto BeautifulSoup
+            
+        Returns:
+            Código de idioma o None
+        """
         # Buscar en tag html
         html_tag = soup.find('html')
         if html_tag:
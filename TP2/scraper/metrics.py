@@ -0,0 +1,326 @@
+"""
+Métricas del servidor en formato de exposición de Prometheus.
+
+Las métricas se actualizan únicamente desde el event loop (un solo
+thread), así que no necesitan locks: cada actualización es una operación
+sobre un diccionario o una lista. Los valores que ya existen en otros
+componentes (caché, pools) se leen recién al exponer las métricas
+mediante callbacks, sin costo en el camino de cada request.
+"""
+
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+
+# Buckets por defecto en segundos (de 5ms a 60s)
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class _Metric(ABC):
+    """Base de las métricas con etiquetas"""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels):
+        """Valores de las etiquetas en el orden declarado"""
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, **extra):
+        """Diccionario de etiquetas de una muestra"""
+        labels = dict(zip(self.labelnames, key))
+        labels.update(extra)
+        return labels
+
+    @abstractmethod
+    def samples(self):
+        """
+        Devuelve las muestras actuales.
+
+        Returns:
+            Lista de tuplas (nombre, etiquetas, valor)
+        """
+
+
+class Counter(_Metric):
+    """Contador monótono (ej: errores por tipo)"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        """Incrementa el contador para las etiquetas indicadas"""
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Valor actual para las etiquetas indicadas"""
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        return [
+            (self.name, self._labels(key), value)
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """
+    Valor que sube y baja (ej: requests en curso).
+
+    Si se indica `func`, el valor se lee al exponer las métricas: func()
+    devuelve un número, o un diccionario {valores de etiquetas: número}
+    si la métrica tiene etiquetas.
+
+    `merge` indica cómo se combinan los valores de varios procesos (ver
+    merge_snapshots): 'sum' para cantidades que se reparten entre workers
+    (requests en curso, conexiones), 'max' o 'avg' para valores propios de
+    cada worker (lag del event loop) y 'worker' para conservar una serie
+    por worker con la etiqueta `worker` (ocupación frente a un límite por
+    worker).
+    """
+
+    type_name = 'gauge'
+
+    MERGE_MODES = ('sum', 'max', 'avg', 'worker')
+
+    def __init__(self, name, documentation, labelnames=(), func=None, merge='sum'):
+        super().__init__(name, documentation, labelnames)
+        if merge not in self.MERGE_MODES:
+            raise ValueError(f'merge must be one of {self.MERGE_MODES}')
+        self._values = {}
+        self.func = func
+        self.merge = merge
+
+    def inc(self, amount=1, **labels):
+        """Incrementa el valor para las etiquetas indicadas"""
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        """Decrementa el valor para las etiquetas indicadas"""
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        """Fija el valor para las etiquetas indicadas"""
+        self._values[self._key(labels)] = value
+
+    def value(self, **labels):
+        """Valor actual para las etiquetas indicadas"""
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        values = self._values
+        if self.func is not None:
+            current = self.func()
+            if not self.labelnames:
+                values = {(): current}
+            else:
+                values = {
+                    key if isinstance(key, tuple) else (key,): value
+                    for key, value in current.items()
+                }
+        return [
+            (self.name, self._labels(key), value)
+            for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    """
+    Distribución de valores en buckets fijos (ej: latencia por etapa).
+
+    Cada observación cuesta una búsqueda binaria y dos sumas; los buckets
+    acumulados se calculan recién al exponer.
+    """
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, **labels):
+        """Registra una observación"""
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            # Conteos por bucket (el último es +Inf), suma y cantidad
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels):
+        """Cantidad de observaciones para las etiquetas indicadas"""
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self):
+        samples = []
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                samples.append((
+                    f'{self.name}_bucket',
+                    self._labels(key, le=_format_value(bound)),
+                    cumulative
+                ))
+            samples.append((f'{self.name}_sum', self._labels(key), total))
+            samples.append((f'{self.name}_count', self._labels(key), count))
+        return samples
+
+
+class MetricsRegistry:
+    """Conjunto de métricas expuestas por un proceso"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """Registra una métrica y la devuelve"""
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Crea y registra un Counter"""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), func=None, merge='sum'):
+        """Crea y registra un Gauge"""
+        return self.register(Gauge(name, documentation, labelnames, func, merge))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Crea y registra un Histogram"""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        """
+        Devuelve el estado de todas las métricas en una estructura
+        serializable a JSON (para combinar las de varios procesos).
+
+        Returns:
+            Lista de familias {'name', 'type', 'help', 'merge', 'samples'}
+        """
+        return [
+            {
+                'name': metric.name,
+                'type': metric.type_name,
+                'help': metric.documentation,
+                'merge': getattr(metric, 'merge', 'sum'),
+                'samples': [list(sample) for sample in metric.samples()]
+            }
+            for metric in self._metrics
+        ]
+
+    def render(self):
+        """Devuelve las métricas en formato de texto de Prometheus"""
+        return render_snapshot(self.snapshot())
+
+
+def merge_snapshots(snapshots):
+    """
+    Combina los snapshots de varios procesos.
+
+    Los contadores y los histogramas se suman. Los gauges se combinan
+    según su modo 'merge': suma, máximo, promedio entre los workers que
+    reportan la muestra, o una serie por worker con la etiqueta `worker`.
+
+    Args:
+        snapshots: Diccionario {id de worker: snapshot} (o lista de
+            snapshots, identificados por su posición)
+
+    Returns:
+        Snapshot combinado
+    """
+    if not isinstance(snapshots, dict):
+        snapshots = dict(enumerate(snapshots))
+
+    families = {}
+    for worker_id, snapshot in snapshots.items():
+        for family in snapshot:
+            merged = families.setdefault(family['name'], {
+                'name': family['name'],
+                'type': family['type'],
+                'help': family['help'],
+                # Solo los gauges se combinan de otra forma que sumando
+                'merge': family.get('merge', 'sum') if family['type'] == 'gauge' else 'sum',
+                'samples': {}
+            })
+            for name, labels, value in family['samples']:
+                if merged['merge'] == 'worker':
+                    labels = dict(labels, worker=str(worker_id))
+                key = (name, tuple(sorted(labels.items())))
+                merged['samples'].setdefault(key, []).append(value)
+
+    return [
+        dict(family, samples=[
+            [name, dict(labels), _combine(values, family['merge'])]
+            for (name, labels), values in family['samples'].items()
+        ])
+        for family in families.values()
+    ]
+
+
+def _combine(values, mode):
+    """Combina los valores de una muestra en varios workers"""
+    if mode == 'max':
+        return max(values)
+    if mode == 'avg':
+        return sum(values) / len(values)
+    return sum(values)
+
+
+def render_snapshot(snapshot):
+    """
+    Convierte un snapshot al formato de texto de Prometheus.
+
+    Args:
+        snapshot: Snapshot devuelto por MetricsRegistry.snapshot
+
+    Returns:
+        String con una línea por muestra
+    """
+    lines = []
+    for family in snapshot:
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for name, labels, value in family['samples']:
+            if labels:
+                label_text = ','.join(
+                    f'{key}="{_escape(value_)}"' for key, value_ in labels.items()
+                )
+                lines.append(f'{name}{{{label_text}}} {_format_value(value)}')
+            else:
+                lines.append(f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _format_value(value):
+    """Formato numérico de Prometheus"""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    """Escapa el valor de una etiqueta"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
@@ -0,0 +1,325 @@
+"""
+Modo pre-fork del servidor de scraping.
+
+Un supervisor lanza N procesos worker, cada uno con su propio event loop,
+todos escuchando en el mismo puerto gracias a SO_REUSEPORT (el kernel
+reparte las conexiones entrantes). El supervisor reinicia los workers que
+terminan con error y los workers publican sus métricas en un registro
+compartido para que cualquiera de ellos pueda responder /stats con el
+agregado de todos.
+"""
+
+import json
+import multiprocessing as mp
+import multiprocessing.connection
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+
+
+def create_listening_socket(host, port, reuse_port=False, backlog=128):
+    """
+    Crea un socket TCP de escucha para IPv4 o IPv6 según la dirección.
+
+    Args:
+        host: Dirección de escucha (IPv4, IPv6 o nombre)
+        port: Puerto de escucha
+        reuse_port: Si True, habilita SO_REUSEPORT para compartir el puerto
+            entre varios procesos
+        backlog: Tamaño de la cola de conexiones pendientes
+
+    Returns:
+        Socket no bloqueante, ya enlazado y escuchando
+
+    Raises:
+        RuntimeError: Si SO_REUSEPORT no está disponible en la plataforma
+        OSError: Si no se puede enlazar la dirección
+    """
+    family, sock_type, proto, _, address = socket.getaddrinfo(
+        host, port, socket.AF_UNSPEC, socket.SOCK_STREAM, 0, socket.AI_PASSIVE
+    )[0]
+
+    sock = socket.socket(family, sock_type, proto)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            if not hasattr(socket, 'SO_REUSEPORT'):
+                raise RuntimeError('SO_REUSEPORT is not supported on this platform')
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(address)
+        sock.listen(backlog)
+        sock.setblocking(False)
+    except BaseException:
+        sock.close()
+        raise
+
+    return sock
+
+
+class WorkerRegistry:
+    """
+    Registro compartido entre el supervisor y los workers.
+
+    Cada worker escribe periódicamente un archivo JSON con su pid, su
+    dirección interna y sus métricas. La escritura es atómica (archivo
+    temporal + rename), así que un lector nunca ve un archivo a medias.
+    """
+
+    SUPERVISOR = 'supervisor'
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: Directorio donde se guardan los archivos del registro
+        """
+        self.directory = directory
+
+    def publish(self, name, info):
+        """
+        Publica la información de un worker (o del supervisor).
+
+        Args:
+            name: Identificador del worker o SUPERVISOR
+            info: Diccionario serializable a JSON
+        """
+        path = os.path.join(self.directory, f'{name}.json')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(tmp_path, path)
+
+    def remove(self, name):
+        """Elimina la información publicada por un worker"""
+        try:
+            os.remove(os.path.join(self.directory, f'{name}.json'))
+        except FileNotFoundError:
+            pass
+
+    def read(self, name):
+        """
+        Lee la información publicada por un worker.
+
+        Returns:
+            Diccionario publicado o None si no existe
+        """
+        try:
+            with open(os.path.join(self.directory, f'{name}.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def workers(self):
+        """
+        Lee la información de todos los workers.
+
+        Returns:
+            Diccionario {worker_id: info}
+        """
+        entries = {}
+        for filename in os.listdir(self.directory):
+            name, ext = os.path.splitext(filename)
+            if ext != '.json' or name == self.SUPERVISOR:
+                continue
+            info = self.read(name)
+            if info is not None:
+                entries[name] = info
+        return entries
+
+
+# Cómo se combina cada métrica numérica de los workers (por defecto se suma)
+_MAX_KEYS = {'max_ms'}
+_MEAN_KEYS = {'avg_ms', 'last_ms'}
+_SAME_KEYS = {'ttl', 'kind'}
+
+
+def aggregate_stats(stats_list, key=None):
+    """
+    Combina las métricas de varios workers en una sola.
+
+    Los contadores y capacidades se suman, los máximos se combinan con max,
+    los promedios se promedian y la configuración común se toma del primero.
+
+    Args:
+        stats_list: Lista de diccionarios devueltos por get_stats
+        key: Nombre de la métrica (uso interno de la recursión)
+
+    Returns:
+        Métricas agregadas con la misma estructura
+    """
+    values = [value for value in stats_list if value is not None]
+    if not values:
+        return None
+
+    first = values[0]
+    if isinstance(first, dict):
+        keys = []
+        for value in values:
+            keys.extend(k for k in value if k not in keys)
+        return {
+            k: aggregate_stats([value.get(k) for value in values], k)
+            for k in keys
+        }
+
+    if isinstance(first, bool):
+        return all(values)
+
+    if isinstance(first, (int, float)) and key not in _SAME_KEYS:
+        if key in _MAX_KEYS:
+            return max(values)
+        if key in _MEAN_KEYS:
+            return round(sum(values) / len(values), 3)
+        return sum(values)
+
+    return first
+
+
+class Supervisor:
+    """
+    Lanza y vigila los procesos worker del modo pre-fork.
+
+    Un worker que termina con código distinto de 0 se reinicia; si vuelve
+    a fallar enseguida, la espera antes de reiniciarlo se duplica hasta
+    max_restart_delay. Un worker que termina limpiamente no se reinicia.
+    """
+
+    # Un worker que vivió menos que esto se considera un fallo al arrancar
+    MIN_UPTIME = 5
+
+    def __init__(self, num_workers, target, args=(), restart_delay=1,
+                 max_restart_delay=30, stop_timeout=10):
+        """
+        Args:
+            num_workers: Cantidad de procesos worker
+            target: Función target(worker_id, registry_dir, *args) de cada worker
+            args: Argumentos adicionales (deben poder serializarse con pickle)
+            restart_delay: Espera inicial en segundos antes de reiniciar
+            max_restart_delay: Espera máxima entre reinicios
+            stop_timeout: Segundos que se espera a cada worker al detener
+        """
+        self.num_workers = num_workers
+        self.target = target
+        self.args = args
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stop_timeout = stop_timeout
+
+        # 'spawn': cada worker arranca limpio, sin heredar el estado del supervisor
+        self._context = mp.get_context('spawn')
+        self.registry = WorkerRegistry(tempfile.mkdtemp(prefix='scraping-workers-'))
+
+        self._processes = {}
+        self._started_at = {}
+        self._delays = {}
+        self._pending_restarts = {}
+        self._stopping = False
+        self.restarts = 0
+
+    def run(self):
+        """Lanza los workers y los vigila hasta recibir SIGINT o SIGTERM"""
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+
+        try:
+            for worker_id in range(self.num_workers):
+                self._spawn(worker_id)
+            self._publish()
+
+            while not self._stopping and (self._processes or self._pending_restarts):
+                sentinels = {
+                    process.sentinel: worker_id
+                    for worker_id, process in self._processes.items()
+                }
+                ready = mp.connection.wait(list(sentinels), timeout=1)
+
+                for sentinel in ready:
+                    self._handle_exit(sentinels[sentinel])
+
+                self._restart_due()
+                self._publish()
+
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Detiene todos los workers y elimina el registro"""
+        self._stopping = True
+
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        for process in self._processes.values():
+            process.join(self.stop_timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+        self._processes.clear()
+        shutil.rmtree(self.registry.directory, ignore_errors=True)
+
+    def _handle_sigterm(self, signum, frame):
+        """Detener el bucle de supervisión ante SIGTERM"""
+        self._stopping = True
+
+    def _spawn(self, worker_id):
+        """Lanza (o relanza) un worker"""
+        process = self._context.Process(
+            target=self.target,
+            args=(worker_id, self.registry.directory) + tuple(self.args),
+            name=f'scraping-worker-{worker_id}'
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._started_at[worker_id] = time.monotonic()
+
+    def _handle_exit(self, worker_id):
+        """Registra la salida de un worker y programa su reinicio si falló"""
+        process = self._processes.pop(worker_id)
+        process.join()
+        self.registry.remove(worker_id)
+
+        if self._stopping:
+            return
+
+        if process.exitcode == 0:
+            print(f"Worker {worker_id} (pid {process.pid}) terminó")
+            return
+
+        # Backoff si el worker falla apenas arranca
+        uptime = time.monotonic() - self._started_at[worker_id]
+        if uptime < self.MIN_UPTIME:
+            delay = min(self._delays.get(worker_id, self.restart_delay / 2) * 2,
+                        self.max_restart_delay)
+        else:
+            delay = self.restart_delay
+        self._delays[worker_id] = delay
+
+        print(f"Worker {worker_id} (pid {process.pid}) terminó con código "
+              f"{process.exitcode}; reiniciando en {delay:.1f}s")
+        self._pending_restarts[worker_id] = time.monotonic() + delay
+
+    def _restart_due(self):
+        """Relanza los workers cuyo tiempo de espera ya pasó"""
+        now = time.monotonic()
+        for worker_id, due in list(self._pending_restarts.items()):
+            if due <= now and not self._stopping:
+                del self._pending_restarts[worker_id]
+                self.restarts += 1
+                self._spawn(worker_id)
+
+    def _publish(self):
+        """Publica el estado del supervisor en el registro"""
+        self.registry.publish(WorkerRegistry.SUPERVISOR, {
+            'pid': os.getpid(),
+            'processes': self.num_workers,
+            'alive': len(self._processes),
+            'restarts': self.restarts,
+            'workers': {
+                str(worker_id): process.pid
+                for worker_id, process in self._processes.items()
+            }
+        })
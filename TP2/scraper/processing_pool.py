@@ -0,0 +1,263 @@
+"""
+Pool de conexiones persistentes hacia el servidor de procesamiento.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from common.protocol import Protocol, LEGACY_CAPABILITIES
+
+
+class ProcessingConnection:
+    """Conexión TCP persistente con el servidor de procesamiento"""
+
+    def __init__(self, reader, writer, peer=None):
+        self.reader = reader
+        self.writer = writer
+        self.peer = peer  # Capabilities acordadas (None sin handshake)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+    def is_healthy(self):
+        """
+        Indica si la conexión sigue abierta en ambos extremos.
+
+        Una conexión ociosa que el servidor cerró queda con el reader
+        en EOF; una que cerramos nosotros queda con el writer cerrándose.
+        """
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    async def close(self):
+        """Cierra la conexión ignorando errores"""
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+
+class ProcessingConnectionPool:
+    """
+    Pool de conexiones keep-alive hacia el servidor de procesamiento.
+
+    Mantiene al menos `min_size` conexiones abiertas y nunca más de
+    `max_size` en total. Una tarea de mantenimiento cierra las conexiones
+    ociosas que el servidor cerró o que superaron `idle_timeout` y
+    reabre las necesarias para volver a `min_size`.
+    """
+
+    def __init__(self, host, port, min_size=1, max_size=10, idle_timeout=60,
+                 connect_timeout=5, health_interval=10, handshake=False,
+                 capabilities=None):
+        """
+        Inicializa el pool (las conexiones se abren en start o a demanda).
+
+        Args:
+            host: Host del servidor de procesamiento
+            port: Puerto del servidor de procesamiento
+            min_size: Conexiones que se mantienen abiertas
+            max_size: Máximo de conexiones simultáneas
+            idle_timeout: Segundos tras los cuales se cierra una conexión ociosa
+            connect_timeout: Timeout en segundos para abrir una conexión
+            health_interval: Segundos entre revisiones de mantenimiento
+            handshake: Si True, cada conexión nueva negocia las capacidades
+                con el servidor (quedan en ProcessingConnection.peer). Si
+                el servidor resulta anterior al handshake, las conexiones
+                siguientes se abren sin negociar
+            capabilities: Capabilities a anunciar en el handshake
+                (default: Protocol.local_capabilities())
+        """
+        self.host = host
+        self.port = port
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.health_interval = health_interval
+        self.handshake = handshake
+        self.capabilities = capabilities
+
+        self._idle = deque()
+        self._in_use = 0
+        self._semaphore = None
+        self._health_task = None
+        self._closed = False
+        self._legacy = False  # El servidor no entiende el handshake
+
+        # Contadores
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.connect_failures = 0
+        self.legacy_peers = 0
+
+    async def start(self):
+        """Abre las conexiones mínimas (si se puede) e inicia el mantenimiento"""
+        await self._fill()
+        if self._health_task is None:
+            self._health_task = asyncio.ensure_future(self._health_loop())
+
+    async def acquire(self, fresh=False):
+        """
+        Obtiene una conexión del pool, esperando si se alcanzó max_size.
+
+        Args:
+            fresh: Si True, descarta las conexiones ociosas y abre una
+                nueva (se usa para reintentar tras un fallo)
+
+        Returns:
+            ProcessingConnection lista para usar. Debe devolverse con release.
+
+        Raises:
+            OSError: Si no se puede conectar al servidor de procesamiento
+            asyncio.TimeoutError: Si la conexión no se establece a tiempo
+        """
+        await self._get_semaphore().acquire()
+        try:
+            if fresh:
+                await self._close_idle()
+
+            while self._idle:
+                conn = self._idle.pop()
+                if conn.is_healthy():
+                    self.reused += 1
+                    break
+                self.discarded += 1
+                await conn.close()
+            else:
+                conn = await self._connect()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        self._in_use += 1
+        conn.uses += 1
+        return conn
+
+    async def release(self, conn, reusable=True):
+        """
+        Devuelve una conexión al pool.
+
+        Las conexiones con un servidor anterior al handshake nunca se
+        reutilizan: ese servidor atiende un único mensaje por conexión.
+
+        Args:
+            conn: Conexión obtenida con acquire
+            reusable: False si la conversación quedó incompleta o falló;
+                en ese caso la conexión se cierra en lugar de reutilizarse
+        """
+        self._in_use -= 1
+        self._semaphore.release()
+
+        if conn.peer is not None and conn.peer.legacy:
+            reusable = False
+        if reusable and conn.is_healthy() and not self._closed:
+            conn.last_used = time.monotonic()
+            self._idle.append(conn)
+        else:
+            self.discarded += 1
+            await conn.close()
+
+    async def close(self):
+        """Detiene el mantenimiento y cierra las conexiones ociosas"""
+        self._closed = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        await self._close_idle()
+
+    def stats(self):
+        """
+        Devuelve el estado del pool.
+
+        Returns:
+            Diccionario con conexiones ociosas, en uso y contadores
+        """
+        return {
+            'idle': len(self._idle),
+            'in_use': self._in_use,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'created': self.created,
+            'reused': self.reused,
+            'discarded': self.discarded,
+            'connect_failures': self.connect_failures,
+            'legacy_peers': self.legacy_peers
+        }
+
+    def _get_semaphore(self):
+        """Crea el semáforo en el loop en uso"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_size)
+        return self._semaphore
+
+    async def _connect(self):
+        """Abre una conexión nueva"""
+        peer = LEGACY_CAPABILITIES if self.handshake and self._legacy else None
+        try:
+            if self.handshake and not self._legacy:
+                reader, writer, peer = await asyncio.wait_for(
+                    Protocol.open_session(self.host, self.port, self.capabilities),
+                    timeout=self.connect_timeout
+                )
+            else:
+                reader, writer = await asyncio.wait_for(
+                    Protocol.open_connection(self.host, self.port),
+                    timeout=self.connect_timeout
+                )
+        except (OSError, asyncio.TimeoutError):
+            self.connect_failures += 1
+            raise
+
+        self.created += 1
+        if peer is not None and peer.legacy:
+            self._legacy = True
+            self.legacy_peers += 1
+        return ProcessingConnection(reader, writer, peer)
+
+    async def _close_idle(self):
+        """Cierra todas las conexiones ociosas"""
+        while self._idle:
+            self.discarded += 1
+            await self._idle.pop().close()
+
+    async def _fill(self):
+        """Abre conexiones hasta tener min_size en total"""
+        while len(self._idle) + self._in_use < self.min_size:
+            try:
+                conn = await self._connect()
+            except (OSError, asyncio.TimeoutError):
+                return  # El servidor no está disponible; se reintenta luego
+            self._idle.append(conn)
+
+    async def _health_loop(self):
+        """Revisa periódicamente las conexiones ociosas"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+    async def check_health(self):
+        """
+        Descarta conexiones ociosas caídas o vencidas y repone el mínimo.
+        """
+        now = time.monotonic()
+        keep = deque()
+        while self._idle:
+            conn = self._idle.popleft()
+            expired = (
+                now - conn.last_used > self.idle_timeout
+                and len(keep) + self._in_use >= self.min_size
+            )
+            if conn.is_healthy() and not expired:
+                keep.append(conn)
+            else:
+                self.discarded += 1
+                await conn.close()
+        self._idle = keep
+        await self._fill()
@@ -0,0 +1,373 @@
+"""
+Caché de robots.txt por host.
+
+Cada origen (esquema, host y puerto) descarga su robots.txt una sola vez:
+las consultas concurrentes comparten la misma descarga (single-flight) y
+el resultado se guarda compilado en una caché LRU con el TTL que indica
+Cache-Control (acotado entre un mínimo y un máximo).
+
+Las reglas Allow/Disallow del grupo que corresponde a nuestro user-agent
+se compilan en un trie, así que decidir si una URL está permitida cuesta
+O(largo del path) sin importar cuántas reglas tenga el archivo. Se sigue
+RFC 9309: gana la regla más larga que coincide y, a igual largo, Allow.
+"""
+
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import quote, unquote, urlsplit
+
+from .singleflight import SingleFlight
+
+
+# Token de producto con el que buscamos nuestro grupo en robots.txt
+DEFAULT_USER_AGENT = 'WebScraper'
+
+# RFC 9309: se deben procesar al menos 500 KiB
+MAX_ROBOTS_BYTES = 500 * 1024
+
+_MAX_AGE_RE = re.compile(r'(?:^|,)\s*(?:s-)?max-age\s*=\s*"?(\d+)', re.IGNORECASE)
+_NO_CACHE_RE = re.compile(r'(?:^|,)\s*(?:no-cache|no-store)\b', re.IGNORECASE)
+
+
+class _TrieNode:
+    """Nodo del trie de reglas"""
+
+    __slots__ = ('children', 'star', 'wild', 'rule', 'end_rule')
+
+    def __init__(self, wild=False):
+        self.children = {}
+        self.star = None       # Hijo por '*' (cualquier secuencia)
+        self.wild = wild       # Nodo '*': consume cualquier carácter
+        self.rule = None       # Regla que termina acá: (largo, allow)
+        self.end_rule = None   # Regla terminada en '$' (solo fin de path)
+
+
+def _normalize(path):
+    """Codifica un path (o patrón) de forma canónica para comparar"""
+    return quote(unquote(path), safe="/?=&;:@!$'()*+,-._~%")
+
+
+class RobotsRules:
+    """
+    Reglas compiladas de un robots.txt para un user-agent.
+
+    Los patrones se insertan en un trie carácter por carácter; '*' es un
+    nodo comodín que sigue activo mientras se recorre el path y '$' marca
+    reglas que solo valen al final. Sin comodines (el caso común) el
+    recorrido es un solo camino por el trie.
+    """
+
+    def __init__(self, rules=()):
+        """
+        Args:
+            rules: Iterable de tuplas (patrón, allow)
+        """
+        self._root = _TrieNode()
+        self.size = 0
+        for pattern, allow in rules:
+            self.add(pattern, allow)
+
+    @classmethod
+    def allow_all(cls):
+        """Reglas que permiten todo (robots.txt inexistente)"""
+        return cls()
+
+    @classmethod
+    def disallow_all(cls):
+        """Reglas que prohíben todo (robots.txt inaccesible)"""
+        return cls([('/', False)])
+
+    @classmethod
+    def parse(cls, text, user_agent=DEFAULT_USER_AGENT):
+        """
+        Compila las reglas de un robots.txt.
+
+        Se usan los grupos cuyo User-agent coincide con `user_agent` (sin
+        distinguir mayúsculas); si no hay ninguno, los de '*'.
+
+        Args:
+            text: Contenido del robots.txt
+            user_agent: Token de producto del crawler
+
+        Returns:
+            RobotsRules con las reglas del grupo elegido
+        """
+        agent = user_agent.lower()
+        specific, generic = [], []
+        agents, rules, in_rules = [], [], False
+
+        def close_group():
+            if agent in agents:
+                specific.extend(rules)
+            elif '*' in agents:
+                generic.extend(rules)
+
+        for line in text.splitlines():
+            line = line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            field, value = line.split(':', 1)
+            field, value = field.strip().lower(), value.strip()
+
+            if field == 'user-agent':
+                if in_rules:
+                    # Empieza un grupo nuevo
+                    close_group()
+                    agents, rules, in_rules = [], [], False
+                agents.append(value.lower())
+            elif field in ('allow', 'disallow'):
+                in_rules = True
+                if value:  # "Disallow:" vacío no prohíbe nada
+                    rules.append((value, field == 'allow'))
+        close_group()
+
+        return cls(specific if specific else generic)
+
+    def add(self, pattern, allow):
+        """Agrega una regla Allow (allow=True) o Disallow"""
+        if not pattern.startswith(('/', '*')):
+            pattern = '/' + pattern
+        pattern = _normalize(pattern)
+        anchored = pattern.endswith('$')
+        if anchored:
+            pattern = pattern[:-1]
+
+        node = self._root
+        for char in pattern:
+            if char == '*':
+                if node.star is None:
+                    node.star = _TrieNode(wild=True)
+                node = node.star
+            else:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _TrieNode()
+                node = child
+
+        rule = (len(pattern) + anchored, allow)
+        if anchored:
+            node.end_rule = max(node.end_rule, rule) if node.end_rule else rule
+        else:
+            node.rule = max(node.rule, rule) if node.rule else rule
+        self.size += 1
+
+    def allowed(self, path):
+        """
+        Indica si un path (con su query) está permitido.
+
+        Args:
+            path: Path de la URL, ej: '/a/b?x=1'
+
+        Returns:
+            True si ninguna regla lo prohíbe
+        """
+        if not self.size or path == '/robots.txt':
+            return True
+
+        best = None
+        active = self._expand([self._root])
+        for char in _normalize(path or '/'):
+            # Reglas sin '$' que ya coinciden con un prefijo del path
+            for node in active:
+                if node.rule and (best is None or node.rule > best):
+                    best = node.rule
+            following = []
+            for node in active:
+                child = node.children.get(char)
+                if child is not None:
+                    following.append(child)
+                if node.wild:
+                    following.append(node)
+            active = self._expand(following)
+            if not active:
+                break
+        else:
+            for node in active:
+                for rule in (node.rule, node.end_rule):
+                    if rule and (best is None or rule > best):
+                        best = rule
+
+        return best is None or best[1]
+
+    def _expand(self, nodes):
+        """Agrega los hijos '*' de los nodos (el comodín acepta vacío)"""
+        result, seen = [], set()
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            result.append(node)
+            if node.star is not None:
+                stack.append(node.star)
+        return result
+
+
+class _RobotsEntry:
+    """Reglas de un origen y su vencimiento"""
+
+    __slots__ = ('rules', 'expires_at')
+
+    def __init__(self, rules, expires_at):
+        self.rules = rules
+        self.expires_at = expires_at
+
+
+class RobotsCache:
+    """
+    Caché LRU de reglas de robots.txt por origen.
+
+    El robots.txt se descarga con el mismo AsyncHTTPClient que las
+    páginas, así que respeta los límites por host. Según RFC 9309, un 4xx
+    significa que no hay restricciones y un 5xx (o 429, o un error de red)
+    que el sitio no está disponible: se prohíbe todo por `error_ttl`
+    segundos y luego se vuelve a intentar.
+    """
+
+    def __init__(self, http_client, user_agent=DEFAULT_USER_AGENT, max_entries=1000,
+                 default_ttl=86400, min_ttl=60, max_ttl=7 * 86400, error_ttl=300,
+                 clock=time.monotonic):
+        """
+        Inicializa la caché.
+
+        Args:
+            http_client: AsyncHTTPClient con el que se descargan los robots.txt
+            user_agent: Token de producto con el que se eligen las reglas
+            max_entries: Máximo de orígenes en la caché
+            default_ttl: Segundos de vigencia si la respuesta no indica max-age
+            min_ttl: Vigencia mínima en segundos (también para no-cache)
+            max_ttl: Vigencia máxima en segundos
+            error_ttl: Vigencia de un robots.txt inaccesible (todo prohibido)
+            clock: Función que devuelve el tiempo actual (para tests)
+        """
+        self.http_client = http_client
+        self.user_agent = user_agent
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.error_ttl = error_ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._single_flight = SingleFlight()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.errors = 0
+        self.evictions = 0
+        self.blocked = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def allowed(self, url):
+        """
+        Indica si robots.txt permite descargar una URL.
+
+        Args:
+            url: URL absoluta a consultar
+
+        Returns:
+            True si está permitida
+        """
+        parts = urlsplit(url)
+        rules = await self.rules_for(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+
+        if rules.allowed(path):
+            return True
+        self.blocked += 1
+        return False
+
+    async def rules_for(self, url):
+        """
+        Obtiene las reglas del origen de una URL (de la caché o del sitio).
+
+        Args:
+            url: URL absoluta de cualquier página del origen
+
+        Returns:
+            RobotsRules del origen
+        """
+        origin = _origin(url)
+        entry = self._entries.get(origin)
+        if entry is not None and self.clock() < entry.expires_at:
+            self._entries.move_to_end(origin)
+            self.hits += 1
+            return entry.rules
+
+        self.misses += 1
+        return await self._single_flight.do(origin, lambda: self._fetch(origin))
+
+    def stats(self):
+        """
+        Devuelve los contadores de la caché.
+
+        Returns:
+            Diccionario con entradas, aciertos, descargas y URLs bloqueadas
+        """
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'fetches': self.fetches,
+            'coalesced': self._single_flight.coalesced,
+            'errors': self.errors,
+            'evictions': self.evictions,
+            'blocked': self.blocked
+        }
+
+    async def _fetch(self, origin):
+        """Descarga, compila y guarda el robots.txt de un origen"""
+        self.fetches += 1
+        try:
+            page = await self.http_client.fetch_page(
+                f'{origin}/robots.txt', raise_for_status=False,
+                content_types=None, max_bytes=MAX_ROBOTS_BYTES, truncate=True
+            )
+        except Exception:
+            page = None
+
+        if page is None or page['status'] >= 500 or page['status'] == 429:
+            self.errors += 1
+            rules, ttl = RobotsRules.disallow_all(), self.error_ttl
+        elif page['status'] >= 400:
+            rules, ttl = RobotsRules.allow_all(), self._ttl(page.get('cache_control'))
+        else:
+            rules = RobotsRules.parse(page['content'] or '', self.user_agent)
+            ttl = self._ttl(page.get('cache_control'))
+
+        self._entries.pop(origin, None)
+        self._entries[origin] = _RobotsEntry(rules, self.clock() + ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return rules
+
+    def _ttl(self, cache_control):
+        """Vigencia según Cache-Control, acotada a [min_ttl, max_ttl]"""
+        if cache_control:
+            if _NO_CACHE_RE.search(cache_control):
+                return self.min_ttl
+            match = _MAX_AGE_RE.search(cache_control)
+            if match:
+                return min(self.max_ttl, max(self.min_ttl, int(match.group(1))))
+        return self.default_ttl
+
+
+def _origin(url):
+    """Esquema, host y puerto de una URL (clave de la caché)"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f'[{host}]'  # IPv6
+    if parts.port:
+        host = f'{host}:{parts.port}'
+    return f'{parts.scheme.lower()}://{host}'
@@ -0,0 +1,69 @@
+"""
+Deduplicación de trabajos concurrentes idénticos (single-flight).
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    """
+    Comparte una única ejecución entre todas las llamadas concurrentes
+    con la misma clave.
+    
+    La primera llamada (líder) lanza el trabajo como tarea independiente;
+    las siguientes esperan esa misma tarea. Cada espera está protegida con
+    asyncio.shield, de modo que si un cliente se desconecta y su handler
+    se cancela, el trabajo compartido sigue corriendo para los demás.
+    """
+    
+    def __init__(self):
+        self._in_flight = {}
+        self.leaders = 0
+        self.coalesced = 0
+    
+    async def do(self, key, func):
+        """
+        Ejecuta func() una sola vez por clave entre llamadas concurrentes.
+        
+        Args:
+            key: Clave que identifica el trabajo (ej: URL normalizada)
+            func: Función sin argumentos que devuelve una corutina
+            
+        Returns:
+            Resultado del trabajo compartido
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        
+        return await asyncio.shield(task)
+    
+    def _forget(self, key, task):
+        """Quita la tarea terminada y marca su excepción como consumida"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Evita el warning si todos los que esperaban se cancelaron
+            task.exception()
+    
+    def in_flight(self):
+        """Número de trabajos en curso"""
+        return len(self._in_flight)
+    
+    def stats(self):
+        """
+        Devuelve los contadores de deduplicación.
+        
+        Returns:
+            Diccionario con trabajos en curso, líderes y llamadas coalescidas
+        """
+        return {
+            'in_flight': len(self._in_flight),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced
+        }
@@ -0,0 +1,43 @@
+"""
+Utilidades para normalizar URLs.
+"""
+
+from urllib.parse import urlsplit, urlunsplit
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """
+    Normaliza una URL para usarla como clave (caché, deduplicación).
+    
+    Pasa esquema y dominio a minúsculas, quita el puerto por defecto y el
+    fragmento, y usa '/' como path vacío. El query string se conserva tal
+    cual, porque su orden puede ser significativo para el servidor.
+    
+    Args:
+        url: URL absoluta
+        
+    Returns:
+        String con la URL normalizada
+    """
+    try:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').lower()
+        port = parts.port
+    except ValueError:
+        return url
+    
+    if ':' in host:
+        host = f'[{host}]'  # IPv6
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+    if parts.username or parts.password:
+        userinfo = parts.username or ''
+        if parts.password:
+            userinfo += f':{parts.password}'
+        host = f'{userinfo}@{host}'
+    
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
@@ -7,43 +7,174 @@ Maneja tareas computacionalmente intensivas usando multiprocessing.
 import argparse
 import socketserver
 import multiprocessing as mp
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import sys
 import signal
+import threading
 
 from processor.screenshot import ScreenshotGenerator
 from processor.performance import PerformanceAnalyzer
 from processor.image_processor import ImageProcessor
-from common.protocol import Protocol
+from common.document import ParsedDocument
+from common.protocol import Protocol, Capabilities
 
 
 class ProcessingHandler(socketserver.BaseRequestHandler):
     """Handler para procesar solicitudes del servidor de scraping"""
     
+    def setup(self):
+        """Prepara el estado de la conexión"""
+        self.send_lock = threading.Lock()
+        self.in_flight = threading.BoundedSemaphore(self.server.MAX_IN_FLIGHT)
+        self.workers = []
+        
+        # Capacidades acordadas en el handshake (None si el cliente no lo hizo)
+        self.peer = None
+    
     def handle(self):
-        """Maneja una conexión entrante"""
+        """
+        Maneja una conexión entrante.
+        
+        La conexión es persistente: se atienden solicitudes sucesivas hasta
+        que el cliente la cierra. Las solicitudes en formato simple se
+        atienden de a una; las que traen request id se atienden en paralelo
+        y cada respuesta se envía apenas está lista, en cualquier orden.
+        Un HELLO se responde con las capacidades del servidor. Un error de
+        procesamiento se responde y la conexión sigue abierta; un error de
+        protocolo la cierra.
+        """
         try:
-            # Recibir datos
-            data = Protocol.receive_socket(self.request)
-            
-            if data is None:
+            while True:
+                try:
+                    # Recibir datos
+                    frame = Protocol.receive_frame_socket(self.request)
+                except (OSError, ValueError):
+                    return
+                
+                if frame is None:
+                    return
+                
+                if frame.type == Protocol.HELLO:
+                    try:
+                        self.handshake(frame)
+                    except (OSError, ValueError):
+                        return
+                    continue
+                
+                if frame.request_id is None:
+                    try:
+                        self.process(frame.data, self.send_simple)
+                    except OSError:
+                        return
+                    continue
+                
+                # Limitar las solicitudes en curso por conexión
+                self.in_flight.acquire()
+                worker = threading.Thread(
+                    target=self.process_multiplexed,
+                    args=(frame,),
+                    daemon=True
+                )
+                worker.start()
+                self.workers = [w for w in self.workers if w.is_alive()]
+                self.workers.append(worker)
+        finally:
+            # Terminar de responder lo que ya estaba en curso
+            for worker in self.workers:
+                worker.join()
+    
+    def handshake(self, frame):
+        """
+        Responde el HELLO del cliente y guarda las capacidades acordadas.
+        
+        Raises:
+            ValueError: Si el HELLO no es válido
+        """
+        local = self.server.capabilities
+        self.peer = local.negotiate(Capabilities.from_dict(frame.data))
+        self.send_message([Protocol.encode_hello(local)])
+    
+    def process_multiplexed(self, frame):
+        """
+        Procesa una solicitud con request id y envía sus respuestas etiquetadas.
+        
+        Args:
+            frame: Frame recibido con la solicitud
+        """
+        # Responder con el mismo códec que usó el cliente, y comprimir solo
+        # si el cliente comprime (los anteriores no entienden el flag)
+        options = {
+            'codec': Protocol.frame_codec(frame),
+            'compress_level': Protocol.COMPRESS_LEVEL if Protocol.frame_compressed(frame) else 0
+        }
+        if self.peer is not None:
+            # Además, no superar el tamaño máximo que acepta el cliente
+            options = self.peer.encode_options(**options)
+        
+        def send(msg_type, payload):
+            self.send_message(Protocol.encode_frame_parts(
+                msg_type, frame.request_id, payload, **options
+            ))
+        
+        try:
+            self.process(frame.data, send)
+        except OSError:
+            pass  # El cliente cerró la conexión
+        finally:
+            self.in_flight.release()
+    
+    def send_simple(self, msg_type, payload):
+        """
+        Envía un mensaje en formato simple (el tipo va implícito).
+        
+        Este formato no admite segmentos binarios: las imágenes viajan en
+        base64, como esperan los clientes anteriores a los mensajes
+        multi-parte.
+        """
+        self.send_message([Protocol.encode(payload)])
+    
+    def send_message(self, parts):
+        """
+        Envía un mensaje completo sin intercalarlo con otros threads.
+        
+        Args:
+            parts: Buffers del mensaje (se envían con una escritura vectorizada)
+        """
+        with self.send_lock:
+            Protocol.send_parts(self.request, parts)
+    
+    def process(self, data, send):
+        """
+        Procesa una solicitud y envía su respuesta.
+        
+        Args:
+            data: Diccionario con la solicitud recibida
+            send: Función (tipo, datos) que envía cada mensaje de la respuesta
+        """
+        try:
+            if data.get('stream'):
+                # Enviar cada resultado en su propio mensaje apenas termina
+                for part, value in self.server.process_request_stream(data):
+                    send(Protocol.PART, {'part': part, 'data': value})
+                send(Protocol.DONE, {'done': True})
                 return
             
             # Procesar solicitud en el pool de procesos
             result = self.server.process_request_data(data)
             
             # Enviar respuesta
-            response = Protocol.encode(result)
-            self.request.sendall(response)
+            send(Protocol.RESPONSE, result)
             
+        except OSError:
+            raise
         except Exception as e:
-            error_response = Protocol.encode({
+            send(Protocol.RESPONSE, {
                 'error': f'Processing error: {str(e)}',
                 'screenshot': None,
                 'performance': None,
                 'thumbnails': []
             })
-            self.request.sendall(error_response)
 
 
 class ProcessingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
@@ -54,49 +185,77 @@ class ProcessingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     
     allow_reuse_address = True
     
+    # Las conexiones son persistentes: sus threads no deben impedir el cierre
+    daemon_threads = True
+    
     def __init__(self, server_address, handler_class, num_processes):
         super().__init__(server_address, handler_class)
         self.num_processes = num_processes
         self.executor = ProcessPoolExecutor(max_workers=num_processes)
+        self.capabilities = Protocol.local_capabilities()
         print(f"Pool de procesos inicializado con {num_processes} workers")
     
+    # Valor de cada resultado cuando su tarea falla
+    PART_DEFAULTS = {
+        'screenshot': None,
+        'performance': None,
+        'thumbnails': []
+    }
+    
+    TASK_TIMEOUT = 30
+    
+    # Solicitudes multiplexadas en curso por conexión
+    MAX_IN_FLIGHT = 32
+    
     def process_request_data(self, data):
         """
         Procesa la solicitud usando el pool de procesos.
         Cada tarea se ejecuta en un proceso separado.
         """
+        result = dict(self.PART_DEFAULTS)
+        result.update(self.process_request_stream(data))
+        return result
+    
+    def process_request_stream(self, data):
+        """
+        Procesa la solicitud entregando cada resultado apenas termina.
+        
+        Las tres tareas se lanzan en paralelo en el pool de procesos, el
+        screenshot primero por ser la más lenta; el generador devuelve sus
+        resultados en orden de finalización. El HTML se parsea dentro de
+        los workers que lo necesitan, nunca en el thread de la conexión.
+        Las tareas que fallan o no terminan en TASK_TIMEOUT segundos se
+        reportan con su valor por defecto.
+        
+        Yields:
+            Tuplas (nombre, valor) con 'screenshot', 'performance' y 'thumbnails'
+        """
         url = data.get('url', '')
         html = data.get('html', '')
         
-        # Crear futures para cada tarea
-        screenshot_future = self.executor.submit(generate_screenshot, url)
-        performance_future = self.executor.submit(analyze_performance, url)
-        thumbnails_future = self.executor.submit(process_images, url, html)
+        # Crear futures para cada tarea (el screenshot no depende del HTML)
+        futures = {self.executor.submit(generate_screenshot, url): 'screenshot'}
+        futures[self.executor.submit(analyze_performance, url, html)] = 'performance'
+        futures[self.executor.submit(process_images, url, html)] = 'thumbnails'
+        pending = set(futures)
         
         # Esperar resultados (esto bloquea el thread actual, no el proceso)
         try:
-            screenshot = screenshot_future.result(timeout=30)
-        except Exception as e:
-            screenshot = None
-            print(f"Screenshot error: {e}")
-        
-        try:
-            performance = performance_future.result(timeout=30)
-        except Exception as e:
-            performance = None
-            print(f"Performance error: {e}")
-        
-        try:
-            thumbnails = thumbnails_future.result(timeout=30)
-        except Exception as e:
-            thumbnails = []
-            print(f"Thumbnails error: {e}")
-        
-        return {
-            'screenshot': screenshot,
-            'performance': performance,
-            'thumbnails': thumbnails
-        }
+            for future in as_completed(futures, timeout=self.TASK_TIMEOUT):
+                pending.discard(future)
+                part = futures[future]
+                try:
+                    value = future.result()
+                except Exception as e:
+                    value = self.PART_DEFAULTS[part]
+                    print(f"{part.capitalize()} error: {e}")
+                yield part, value
+        except FutureTimeoutError:
+            for future in pending:
+                part = futures[future]
+                future.cancel()
+                print(f"{part.capitalize()} error: timeout")
+                yield part, self.PART_DEFAULTS[part]
     
     def shutdown_pool(self):
         """Cierra el pool de procesos de forma limpia"""
@@ -110,25 +269,28 @@ class ProcessingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
 def generate_screenshot(url):
     """
     Genera screenshot de la URL.
-    Se ejecuta en un proceso separado.
+    Se ejecuta en un proceso separado y devuelve los bytes PNG, que viajan
+    al Servidor A sin base64.
     """
     try:
         generator = ScreenshotGenerator()
-        screenshot = generator.capture(url)
+        screenshot = generator.capture(url, raw=True)
         return screenshot
     except Exception as e:
         print(f"Error generando screenshot: {e}")
         return None
 
 
-def analyze_performance(url):
+def analyze_performance(url, html=''):
     """
     Analiza el rendimiento de la página.
-    Se ejecuta en un proceso separado.
+    Se ejecuta en un proceso separado; los recursos se extraen del HTML
+    recibido (sin HTML, del que descarga el analizador).
     """
     try:
+        resources = ParsedDocument(html).resource_urls(url) if html else None
         analyzer = PerformanceAnalyzer()
-        performance = analyzer.analyze(url)
+        performance = analyzer.analyze(url, resources)
         return performance
     except Exception as e:
         print(f"Error analizando rendimiento: {e}")
@@ -138,11 +300,12 @@ def analyze_performance(url):
 def process_images(url, html):
     """
     Procesa imágenes de la página.
-    Se ejecuta en un proceso separado.
+    Se ejecuta en un proceso separado (donde se parsea el HTML) y devuelve
+    los thumbnails como bytes JPEG.
     """
     try:
         processor = ImageProcessor()
-        thumbnails = processor.generate_thumbnails(url, html)
+        thumbnails = processor.generate_thumbnails(url, html, raw=True)
         return thumbnails
     except Exception as e:
         print(f"Error procesando imágenes: {e}")
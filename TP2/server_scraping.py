@@ -6,39 +6,589 @@ Maneja solicitudes de scraping de forma asíncrona y coordina con el servidor de
 
 import asyncio
 import argparse
+import functools
 import json
-import socket
+import multiprocessing as mp
+import os
+import re
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from aiohttp import web, ClientSession, ClientTimeout
 from urllib.parse import urlparse
 import sys
 
 # Importar módulos propios
-from scraper.html_parser import HTMLParser
-from scraper.metadata_extractor import MetadataExtractor
+from scraper.admission import AdmissionController, AdmissionRejected
 from scraper.async_http import AsyncHTTPClient
-from common.protocol import Protocol
+from scraper.cache import ResponseCache
+from scraper.compression import ResponseCompressor
+from scraper.crawler import Crawler
+from scraper.extraction import extract_page_data
+from scraper.jobs import JobManager, JobTableFull
+from scraper.loop_monitor import LoopLagMonitor
+from scraper.metrics import MetricsRegistry, merge_snapshots, render_snapshot
+from scraper.prefork import (
+    Supervisor, WorkerRegistry, aggregate_stats, create_listening_socket
+)
+from scraper.processing_pool import ProcessingConnectionPool
+from scraper.robots import RobotsCache
+from scraper.singleflight import SingleFlight
+from scraper.url_utils import normalize_url
+from common.protocol import Protocol, MultiplexedClient
+from common.serialization import CODECS, get_codec, base64_default
+
+
+# Endpoints sujetos al control de admisión (los de monitoreo nunca se descartan)
+ADMISSION_ROUTES = frozenset({'/scrape', '/scrape/head', '/scrape/batch', '/crawl'})
+
+# Identificadores válidos de crawls retomables (nombre de directorio)
+CRAWL_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Valor de cada resultado del Servidor B cuando no está disponible
+PROCESSING_DEFAULTS = {
+    'screenshot': None,
+    'performance': None,
+    'thumbnails': []
+}
+
+
+# Formatos del modo streaming de /scrape y su Content-Type
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'sse': 'text/event-stream; charset=utf-8'
+}
+
+# Cómo se entregan las imágenes (screenshot y thumbnails) al cliente
+IMAGE_MODES = ('base64', 'none')
+
+
+def _no_progress(stage, state):
+    """Callback de progreso por defecto (no hace nada)"""
+
+
+def _elapsed_ms(start):
+    """Milisegundos transcurridos desde start (time.perf_counter)"""
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def _dumps(value, **kwargs):
+    """
+    json.dumps para las respuestas HTTP.
+    
+    Las imágenes llegan del Servidor B como bytes y se codifican en base64
+    recién acá, al serializar la respuesta.
+    """
+    return json.dumps(value, default=base64_default, **kwargs)
+
+
+def _omit_image(part, value):
+    """Valor de un resultado de procesamiento sin sus imágenes"""
+    if part == 'screenshot':
+        return None
+    if part == 'thumbnails':
+        return []
+    return value
+
+
+def _omit_images(result):
+    """Copia de un resultado sin screenshot ni thumbnails (images=none)"""
+    processing = result.get('processing_data')
+    if not processing:
+        return result
+    return dict(result, processing_data={
+        part: _omit_image(part, value) for part, value in processing.items()
+    })
 
 
 class ScrapingServer:
-    def __init__(self, host, port, workers, processing_host='127.0.0.1', processing_port=8001):
+    def __init__(self, host, port, workers, processing_host='127.0.0.1', processing_port=8001,
+                 parse_executor='process', parse_workers=None,
+                 cache_entries=1000, cache_max_bytes=256 * 1024 * 1024, cache_ttl=300,
+                 batch_concurrency=16, batch_max_urls=10000,
+                 job_max=1000, job_ttl=3600, job_concurrency=8,
+                 processing_pool_min=1, processing_pool_max=16, processing_pool_idle=60,
+                 processing_multiplex=False, processing_codec='json',
+                 processing_compression_level=6, processing_compression_min_bytes=1024,
+                 processing_handshake=True,
+                 worker_id=None, registry=None, reuse_port=False,
+                 max_inflight=32, max_queue=64, max_queue_wait=2.0,
+                 codel_target=None, codel_interval=0.1,
+                 host_concurrency=5, host_rate=None, host_burst=1,
+                 crawl_max_pages=1000, crawl_concurrency=16, crawl_state_dir=None,
+                 robots_cache_entries=1000, robots_ttl=86400,
+                 compression_level=6, compression_min_bytes=1024,
+                 compression_offload_bytes=64 * 1024, compression_codecs=None):
         self.host = host
         self.port = port
         self.workers = workers
         self.processing_host = processing_host
         self.processing_port = processing_port
-        self.app = web.Application()
+        self.app = web.Application(
+            middlewares=[
+                self.metrics_middleware,
+                self.compression_middleware,
+                self.admission_middleware
+            ]
+        )
         self.setup_routes()
-        self.http_client = AsyncHTTPClient(max_concurrent=workers)
+        self.http_client = AsyncHTTPClient(
+            max_concurrent=workers,
+            max_per_host=host_concurrency,
+            host_rate=host_rate,
+            host_burst=host_burst
+        )
+        
+        # Conexiones persistentes con el Servidor B
+        self.processing_pool = ProcessingConnectionPool(
+            processing_host,
+            processing_port,
+            min_size=processing_pool_min,
+            max_size=processing_pool_max,
+            idle_timeout=processing_pool_idle,
+            handshake=processing_handshake
+        )
+        
+        # Códec de los mensajes con el Servidor B (responde con el mismo).
+        # Con handshake, el códec y la compresión se limitan a lo que acepta
+        # cada Servidor B, de modo que se pueden actualizar de a uno
+        self.processing_codec = get_codec(processing_codec).name
+        
+        # Compresión zlib de las solicitudes al Servidor B (nivel 0 la
+        # deshabilita). El HTML se envía completo y comprime 5-10x
+        self.processing_compression_level = processing_compression_level
+        self.processing_compression_min_bytes = processing_compression_min_bytes
+        self.processing_offload_bytes = compression_offload_bytes
+        
+        # Alternativa: todas las solicitudes sobre una conexión multiplexada
+        self.processing_mux = (
+            MultiplexedClient(
+                processing_host, processing_port, codec=processing_codec,
+                compress_level=processing_compression_level,
+                compress_min_size=processing_compression_min_bytes,
+                handshake=processing_handshake
+            )
+            if processing_multiplex else None
+        )
+        
+        # Pool para el parsing (CPU-bound) fuera del event loop
+        self.parse_executor_kind = parse_executor
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.parse_executor = self._create_parse_executor()
+        self.loop_monitor = LoopLagMonitor()
+        
+        # Compresión de respuestas según Accept-Encoding (nivel 0 la
+        # deshabilita). Los cuerpos grandes se comprimen en threads
+        self.compressor = None
+        self.compression_executor = None
+        if compression_level > 0:
+            self.compression_executor = ThreadPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1),
+                thread_name_prefix='compress'
+            )
+            self.compressor = ResponseCompressor(
+                level=compression_level,
+                min_size=compression_min_bytes,
+                offload_size=compression_offload_bytes,
+                codecs=compression_codecs,
+                executor=self.compression_executor
+            )
+        
+        # Caché de resultados (deshabilitada si el TTL es 0)
+        self.cache = None
+        if cache_ttl > 0 and cache_entries > 0:
+            self.cache = ResponseCache(cache_entries, cache_max_bytes, cache_ttl)
+        
+        # Requests concurrentes a la misma URL comparten un único scraping
+        self.single_flight = SingleFlight()
+        
+        # Límites del endpoint de batch
+        self.batch_concurrency = batch_concurrency
+        self.batch_max_urls = batch_max_urls
+        
+        # Límites del endpoint de crawl
+        self.crawl_max_pages = crawl_max_pages
+        self.crawl_concurrency = crawl_concurrency
+        
+        # robots.txt por origen, compartido entre todos los crawls
+        self.robots = RobotsCache(
+            self.http_client,
+            max_entries=robots_cache_entries,
+            default_ttl=robots_ttl
+        )
+        
+        # Crawls con checkpoints (retomables por crawl_id)
+        self.crawl_state_dir = crawl_state_dir
+        self._active_crawls = set()
+        
+        # Modo pre-fork: identificador del worker y registro compartido
+        self.worker_id = worker_id
+        self.registry = registry
+        self.reuse_port = reuse_port
+        self.internal_port = None
+        self._peer_session = None
+        
+        # Trabajos asíncronos (POST /jobs). En modo pre-fork el id indica
+        # qué worker tiene el trabajo
+        self.jobs = JobManager(
+            job_max, job_ttl, job_concurrency,
+            id_prefix=f'w{worker_id}-' if worker_id is not None else ''
+        )
+        
+        # Control de admisión: cola acotada y descarte rápido con 503
+        self.admission = AdmissionController(
+            max_concurrent=max_inflight,
+            max_queue=max_queue,
+            max_wait=max_queue_wait,
+            codel_target=codel_target,
+            codel_interval=codel_interval
+        )
+        
+        self._setup_metrics()
+        
+    def _create_parse_executor(self):
+        """Crea el pool de parsing según la configuración"""
+        if self.parse_executor_kind == 'process':
+            # 'spawn' evita que los workers hereden el socket de escucha
+            return ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=mp.get_context('spawn')
+            )
+        if self.parse_executor_kind == 'thread':
+            return ThreadPoolExecutor(
+                max_workers=self.parse_workers,
+                thread_name_prefix='parse'
+            )
+        # 'inline': parsear en el event loop (solo para depuración)
+        return None
+        
+    def _setup_metrics(self):
+        """Define las métricas expuestas en /metrics"""
+        self.metrics = MetricsRegistry()
+        m = self.metrics
+        
+        # Latencias
+        self.stage_duration = m.histogram(
+            'scraper_stage_duration_seconds',
+            'Duración de cada etapa del scraping (fetch, parse, metadata, processing, head)',
+            ['stage']
+        )
+        self.scrape_duration = m.histogram(
+            'scraper_scrape_duration_seconds',
+            'Duración total de un scraping sin caché'
+        )
+        self.request_duration = m.histogram(
+            'scraper_http_request_duration_seconds',
+            'Duración de las respuestas HTTP por endpoint',
+            ['endpoint']
+        )
+        
+        # Requests y errores
+        self.requests_in_flight = m.gauge(
+            'scraper_requests_in_flight',
+            'Requests HTTP en curso por endpoint',
+            ['endpoint']
+        )
+        self.requests_total = m.counter(
+            'scraper_http_requests_total',
+            'Requests HTTP atendidas por endpoint y status',
+            ['endpoint', 'status']
+        )
+        self.errors = m.counter(
+            'scraper_errors_total',
+            'Errores por etapa y tipo de excepción',
+            ['stage', 'type']
+        )
+        
+        # Ocupación de recursos (se leen al exponer las métricas)
+        m.gauge(
+            'scraper_http_client_slots',
+            'Ocupación del semáforo de AsyncHTTPClient',
+            ['state'],
+            merge='worker',
+            func=lambda: {
+                'active': self.http_client.active,
+                'waiting': self.http_client.waiting,
+                'limit': self.http_client.max_concurrent
+            }
+        )
+        def host_states():
+            stats = self.http_client.scheduler.stats()
+            return {
+                'tracked': stats['hosts'],
+                'waiting': stats['hosts_waiting'],
+                'throttled': len(stats['throttled'])
+            }
+        
+        m.gauge(
+            'scraper_http_hosts',
+            'Hosts con estado en el planificador por host',
+            ['state'],
+            func=host_states
+        )
+        m.gauge(
+            'scraper_http_connector_connections',
+            'Conexiones del pool de aiohttp',
+            ['state'],
+            func=self.http_client.connector_stats
+        )
+        m.gauge(
+            'scraper_processing_pool_connections',
+            'Conexiones con el servidor de procesamiento',
+            ['state'],
+            func=lambda: {
+                state: self.processing_pool.stats()[state]
+                for state in ('idle', 'in_use')
+            }
+        )
+        m.gauge(
+            'scraper_event_loop_lag_seconds',
+            'Lag promedio del event loop (en modo multiproceso, el del worker más lento)',
+            merge='max',
+            func=lambda: self.loop_monitor.stats()['avg_ms'] / 1000
+        )
+        m.gauge(
+            'scraper_jobs',
+            'Trabajos en la tabla por estado',
+            ['status'],
+            func=lambda: self.jobs.stats()['by_status']
+        )
+        m.gauge(
+            'scraper_admission_slots',
+            'Requests admitidos y en cola del control de admisión',
+            ['state'],
+            merge='worker',
+            func=lambda: {
+                'active': self.admission.active,
+                'queued': self.admission.queue_length,
+                'limit': self.admission.max_concurrent
+            }
+        )
+        self.admission_wait = m.histogram(
+            'scraper_admission_queue_wait_seconds',
+            'Espera en la cola de admisión de los requests admitidos'
+        )
+        self.admission_rejected = m.counter(
+            'scraper_admission_rejected_total',
+            'Requests rechazados por el control de admisión por motivo',
+            ['reason']
+        )
+        self.compressed_responses = m.counter(
+            'scraper_response_compression_total',
+            'Respuestas elegibles para compresión por Content-Encoding (identity si no se comprimió)',
+            ['encoding']
+        )
+        self.compression_saved = m.counter(
+            'scraper_response_compression_saved_bytes_total',
+            'Bytes ahorrados al comprimir respuestas',
+            ['encoding']
+        )
+        self.compression_cpu = m.counter(
+            'scraper_response_compression_cpu_seconds_total',
+            'Tiempo de CPU usado para comprimir respuestas',
+            ['encoding']
+        )
+        self.crawl_pages = m.counter(
+            'scraper_crawl_pages_total',
+            'Páginas visitadas en modo crawl por estado',
+            ['status']
+        )
+        m.gauge(
+            'scraper_robots_cache',
+            'Caché de robots.txt: orígenes guardados, descargas y URLs bloqueadas',
+            ['state'],
+            func=lambda: {
+                key: self.robots.stats()[key]
+                for key in ('entries', 'fetches', 'blocked')
+            }
+        )
+        m.gauge(
+            'scraper_cache_entries',
+            'Resultados en la caché',
+            func=lambda: len(self.cache) if self.cache is not None else 0
+        )
+    
+    @web.middleware
+    async def metrics_middleware(self, request, handler):
+        """Cuenta requests en curso, atendidas y su duración por endpoint"""
+        resource = request.match_info.route.resource
+        endpoint = resource.canonical if resource is not None else 'unmatched'
+        
+        start = time.perf_counter()
+        status = 500
+        self.requests_in_flight.inc(endpoint=endpoint)
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            self.requests_in_flight.dec(endpoint=endpoint)
+            self.requests_total.inc(endpoint=endpoint, status=status)
+            self.request_duration.observe(time.perf_counter() - start, endpoint=endpoint)
+    
+    @web.middleware
+    async def compression_middleware(self, request, handler):
+        """
+        Comprime el cuerpo de las respuestas según Accept-Encoding.
+        
+        Solo se comprimen respuestas con el cuerpo ya armado (no las de
+        streaming) y de al menos compression_min_bytes; si el resultado no
+        es más chico se envía el original.
+        """
+        response = await handler(request)
+        compressor = self.compressor
+        if compressor is None or not isinstance(response, web.Response) \
+                or response.prepared or 'Content-Encoding' in response.headers \
+                or response.status in (204, 304) or request.method == 'HEAD':
+            return response
+        
+        body = response.body
+        if not isinstance(body, (bytes, bytearray)) or not compressor.eligible(body):
+            return response
+        
+        vary = response.headers.get('Vary')
+        response.headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+        
+        encoding = compressor.choose(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            self.compressed_responses.inc(encoding='identity')
+            return response
+        
+        compressed, cpu_seconds = await compressor.compress(bytes(body), encoding)
+        self.compression_cpu.inc(cpu_seconds, encoding=encoding)
+        if len(compressed) >= len(body):
+            self.compressed_responses.inc(encoding='identity')
+            return response
+        
+        response.body = compressed
+        response.headers['Content-Encoding'] = encoding
+        self.compressed_responses.inc(encoding=encoding)
+        self.compression_saved.inc(len(body) - len(compressed), encoding=encoding)
+        return response
+    
+    @web.middleware
+    async def admission_middleware(self, request, handler):
+        """
+        Admite los requests de scraping según la capacidad disponible.
+        
+        Si no hay lugar y la cola está llena (o la espera vence) responde
+        503 con Retry-After de inmediato, sin tocar la red.
+        """
+        resource = request.match_info.route.resource
+        if resource is None or resource.canonical not in ADMISSION_ROUTES:
+            return await handler(request)
         
+        try:
+            async with self.admission.slot() as waited:
+                if waited:
+                    self.admission_wait.observe(waited)
+                return await handler(request)
+        except AdmissionRejected as e:
+            self.admission_rejected.inc(reason=e.reason)
+            return web.json_response(
+                {'status': 'error', 'message': 'Server overloaded, retry later'},
+                status=503,
+                headers={'Retry-After': str(e.retry_after)}
+            )
+    
+    def record_error(self, stage, error):
+        """Cuenta un error de una etapa por tipo de excepción"""
+        self.errors.inc(stage=stage, type=type(error).__name__)
+    
     def setup_routes(self):
         self.app.router.add_get('/scrape', self.handle_scrape)
+        self.app.router.add_get('/scrape/head', self.handle_scrape_head)
+        self.app.router.add_post('/scrape/batch', self.handle_scrape_batch)
+        self.app.router.add_post('/crawl', self.handle_crawl)
+        self.app.router.add_post('/jobs', self.handle_job_submit)
+        self.app.router.add_get('/jobs/{job_id}', self.handle_job_status)
+        self.app.router.add_get('/jobs/{job_id}/result', self.handle_job_result)
         self.app.router.add_get('/health', self.handle_health)
+        self.app.router.add_get('/stats', self.handle_stats)
+        self.app.router.add_get('/metrics', self.handle_metrics)
         
     async def handle_health(self, request):
         """Endpoint para verificar que el servidor está activo"""
         return web.json_response({'status': 'healthy'})
     
+    async def handle_stats(self, request):
+        """
+        Endpoint con métricas internas del servidor.
+        
+        En modo pre-fork devuelve además las métricas publicadas por cada
+        worker y su agregado, sin importar qué worker atiende el request.
+        """
+        stats = self.get_stats()
+        if self.registry is None:
+            return web.json_response(stats)
+        
+        workers = {
+            worker_id: info['stats']
+            for worker_id, info in self.registry.workers().items()
+        }
+        workers[str(self.worker_id)] = stats
+        
+        return web.json_response({
+            'worker': self.worker_id,
+            'supervisor': self.registry.read(WorkerRegistry.SUPERVISOR),
+            'aggregate': aggregate_stats(list(workers.values())),
+            'workers': workers
+        })
+    
+    async def handle_metrics(self, request):
+        """
+        Endpoint de métricas en formato de texto de Prometheus.
+        
+        En modo pre-fork combina las métricas publicadas por todos los
+        workers, de modo que cualquier worker devuelve el total (los
+        gauges se combinan según su modo, ver merge_snapshots).
+        """
+        if self.registry is None:
+            body = self.metrics.render()
+        else:
+            snapshots = {
+                worker_id: info['metrics']
+                for worker_id, info in self.registry.workers().items()
+                if worker_id != str(self.worker_id) and 'metrics' in info
+            }
+            snapshots[str(self.worker_id)] = self.metrics.snapshot()
+            body = render_snapshot(merge_snapshots(snapshots))
+        
+        return web.Response(
+            text=body,
+            content_type='text/plain',
+            headers={'X-Content-Type-Options': 'nosniff'}
+        )
+    
+    def get_stats(self):
+        """
+        Reúne las métricas internas del servidor.
+        
+        Returns:
+            Diccionario con las métricas de cada componente
+        """
+        return {
+            'loop_lag': self.loop_monitor.stats(),
+            'http_client': self.http_client.stats(),
+            'admission': self.admission.stats(),
+            'parse_executor': {
+                'kind': self.parse_executor_kind,
+                'workers': self.parse_workers if self.parse_executor else 0
+            },
+            'cache': self.cache.stats() if self.cache else None,
+            'single_flight': self.single_flight.stats(),
+            'robots': self.robots.stats(),
+            'processing_pool': self.processing_pool.stats(),
+            'processing_multiplex': (
+                self.processing_mux.stats() if self.processing_mux is not None else None
+            ),
+            'jobs': self.jobs.stats()
+        }
+    
     async def handle_scrape(self, request):
         """
         Endpoint principal de scraping.
@@ -60,9 +610,28 @@ class ScrapingServer:
                     status=400
                 )
             
-            # Realizar scraping completo
-            result = await self.scrape_url(url)
-            return web.json_response(result)
+            images = request.query.get('images', 'base64')
+            if images not in IMAGE_MODES:
+                return web.json_response(
+                    {'status': 'error', 'message': 'images must be base64 or none'},
+                    status=400
+                )
+            
+            # Modo streaming: resultados parciales a medida que se completan
+            stream_format = request.query.get('stream')
+            if stream_format:
+                if stream_format not in STREAM_FORMATS:
+                    return web.json_response(
+                        {'status': 'error', 'message': 'stream must be ndjson or sse'},
+                        status=400
+                    )
+                return await self.stream_scrape(request, url, stream_format, images)
+            
+            # Realizar scraping completo (compartido entre requests idénticos)
+            result = await self.scrape(url)
+            if images == 'none':
+                result = _omit_images(result)
+            return web.json_response(result, dumps=_dumps)
             
         except asyncio.TimeoutError:
             return web.json_response(
@@ -75,6 +644,517 @@ class ScrapingServer:
                 status=500
             )
     
+    async def handle_scrape_head(self, request):
+        """
+        Endpoint de metadatos: título, meta tags e idioma.
+        
+        Espera un parámetro 'url' en la query string. Solo se descarga el
+        <head> de la página (se parsea a medida que llega y el resto de la
+        descarga se cancela), sin parseo completo ni Servidor B.
+        """
+        url = request.query.get('url')
+        if not url:
+            return web.json_response(
+                {'status': 'error', 'message': 'URL parameter is required'},
+                status=400
+            )
+        if not self._is_valid_url(url):
+            return web.json_response(
+                {'status': 'error', 'message': 'Invalid URL format'},
+                status=400
+            )
+        
+        timestamp = datetime.utcnow().isoformat() + 'Z'
+        started = time.perf_counter()
+        try:
+            head = await self.http_client.fetch_head(url)
+        except asyncio.TimeoutError as e:
+            self.record_error('head', e)
+            return web.json_response(
+                {'status': 'error', 'message': 'Request timeout'},
+                status=504
+            )
+        except Exception as e:
+            self.record_error('head', e)
+            return web.json_response(
+                {'status': 'error', 'message': str(e)},
+                status=500
+            )
+        
+        elapsed_ms = _elapsed_ms(started)
+        self.stage_duration.observe(elapsed_ms / 1000, stage='head')
+        return web.json_response({
+            'url': url,
+            'timestamp': timestamp,
+            'scraping_data': {
+                'title': head['title'],
+                'meta_tags': head['meta_tags'],
+                'language': head['language']
+            },
+            'bytes_read': head['bytes_read'],
+            'complete': head['complete'],
+            'status': 'success',
+            'timings': {'total_ms': elapsed_ms}
+        })
+    
+    async def stream_scrape(self, request, url, stream_format, images='base64'):
+        """
+        Responde un scraping en modo streaming (NDJSON o Server-Sent Events).
+        
+        Emite 'scraping_data', 'performance', 'thumbnails' y 'screenshot'
+        en el orden en que terminan. El evento final 'done' lleva url,
+        timestamp, status y timings. Con images='none' el screenshot y los
+        thumbnails se emiten vacíos.
+        Si el resultado sale de la caché, todos los eventos se emiten juntos.
+        
+        Este modo no se deduplica con otros requests de la misma URL,
+        porque cada cliente necesita sus propios eventos parciales.
+        """
+        response = web.StreamResponse(headers={
+            'Content-Type': STREAM_FORMATS[stream_format],
+            'Cache-Control': 'no-cache'
+        })
+        await response.prepare(request)
+        
+        async def emit(event, data):
+            if images == 'none':
+                data = _omit_image(event, data)
+            payload = _dumps(data, ensure_ascii=False)
+            if stream_format == 'sse':
+                chunk = f'event: {event}\ndata: {payload}\n\n'
+            else:
+                chunk = f'{{"event": {json.dumps(event)}, "data": {payload}}}\n'
+            await response.write(chunk.encode('utf-8'))
+        
+        emitted = set()
+        events = self.scrape_events(url)
+        try:
+            async for event, data in events:
+                if event != 'result':
+                    emitted.add(event)
+                    await emit(event, data)
+                    continue
+                
+                # Emitir lo que no se emitió antes (caché o error) y cerrar
+                if 'scraping_data' in data and 'scraping_data' not in emitted:
+                    await emit('scraping_data', data['scraping_data'])
+                for part, value in data.get('processing_data', {}).items():
+                    if part not in emitted:
+                        await emit(part, value)
+                
+                summary = {
+                    key: value for key, value in data.items()
+                    if key not in ('scraping_data', 'processing_data')
+                }
+                await emit('done', summary)
+        finally:
+            await events.aclose()
+        
+        await response.write_eof()
+        return response
+    
+    async def handle_scrape_batch(self, request):
+        """
+        Endpoint de scraping por lotes.
+        
+        Espera un JSON {"urls": [...], "concurrency": N} y devuelve los
+        resultados como NDJSON (un objeto JSON por línea) a medida que se
+        completan, en orden de finalización y con el índice original en
+        el campo 'index'.
+        """
+        try:
+            body = await request.json()
+        except Exception:
+            return web.json_response(
+                {'status': 'error', 'message': 'Invalid JSON body'},
+                status=400
+            )
+        
+        urls = body.get('urls') if isinstance(body, dict) else None
+        if not isinstance(urls, list) or not all(isinstance(u, str) for u in urls):
+            return web.json_response(
+                {'status': 'error', 'message': 'urls must be a list of strings'},
+                status=400
+            )
+        
+        if len(urls) > self.batch_max_urls:
+            return web.json_response(
+                {'status': 'error', 'message': f'Too many URLs (max {self.batch_max_urls})'},
+                status=413
+            )
+        
+        try:
+            concurrency = int(body.get('concurrency', self.batch_concurrency))
+        except (TypeError, ValueError):
+            concurrency = self.batch_concurrency
+        concurrency = max(1, min(concurrency, self.batch_concurrency))
+        
+        images = body.get('images', 'base64')
+        if images not in IMAGE_MODES:
+            return web.json_response(
+                {'status': 'error', 'message': 'images must be base64 or none'},
+                status=400
+            )
+        
+        response = web.StreamResponse(
+            headers={'Content-Type': 'application/x-ndjson; charset=utf-8'}
+        )
+        await response.prepare(request)
+        
+        async for index, result in self.scrape_many(urls, concurrency):
+            if images == 'none':
+                result = _omit_images(result)
+            record = dict(result, index=index)
+            line = _dumps(record, ensure_ascii=False) + '\n'
+            await response.write(line.encode('utf-8'))
+        
+        await response.write_eof()
+        return response
+    
+    async def scrape_many(self, urls, concurrency):
+        """
+        Scrapea una lista de URLs con concurrencia acotada.
+        
+        Un número fijo de workers toma URLs de la lista compartida, por lo
+        que no se crean miles de tareas a la vez. Si el consumidor deja de
+        iterar (ej: el cliente se desconecta), los workers se cancelan.
+        
+        Args:
+            urls: Lista de URLs
+            concurrency: Número máximo de URLs en proceso simultáneamente
+            
+        Yields:
+            Tuplas (índice original, resultado) en orden de finalización
+        """
+        if not urls:
+            return
+        
+        results = asyncio.Queue(maxsize=concurrency)
+        pending = iter(enumerate(urls))
+        
+        async def worker():
+            for index, url in pending:
+                timestamp = datetime.utcnow().isoformat() + 'Z'
+                if not self._is_valid_url(url):
+                    result = {
+                        'url': url,
+                        'timestamp': timestamp,
+                        'status': 'error',
+                        'message': 'Invalid URL format'
+                    }
+                else:
+                    try:
+                        result = await self.scrape(url)
+                    except Exception as e:
+                        result = {
+                            'url': url,
+                            'timestamp': timestamp,
+                            'status': 'error',
+                            'message': str(e) or type(e).__name__
+                        }
+                await results.put((index, result))
+        
+        workers = [
+            asyncio.ensure_future(worker())
+            for _ in range(min(concurrency, len(urls)))
+        ]
+        
+        try:
+            for _ in range(len(urls)):
+                yield await results.get()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def handle_crawl(self, request):
+        """
+        Endpoint de crawl recursivo (BFS).
+        
+        Espera un JSON {"url" o "urls", "max_depth", "max_pages",
+        "same_domain", "include", "exclude", "concurrency", "process",
+        "robots", "crawl_id"} y devuelve NDJSON: una línea por página visitada, en
+        orden de finalización, y una última línea {"summary": {...}} con el
+        total de páginas y las páginas por segundo.
+        
+        Con "crawl_id" (y --crawl-state-dir) la frontera se guarda en disco
+        con checkpoints periódicos: repetir la solicitud con el mismo id
+        retoma el crawl sin volver a visitar las páginas completadas.
+        
+        Por defecto se respeta robots.txt; con "robots": false no se
+        consulta.
+        """
+        try:
+            body = await request.json()
+        except Exception:
+            return web.json_response(
+                {'status': 'error', 'message': 'Invalid JSON body'},
+                status=400
+            )
+        
+        if not isinstance(body, dict):
+            return web.json_response(
+                {'status': 'error', 'message': 'Body must be a JSON object'},
+                status=400
+            )
+        
+        seeds = body.get('urls') or ([body['url']] if body.get('url') else None)
+        if not isinstance(seeds, list) or not all(isinstance(u, str) for u in seeds):
+            return web.json_response(
+                {'status': 'error', 'message': 'url or urls is required'},
+                status=400
+            )
+        
+        invalid = [url for url in seeds if not self._is_valid_url(url)]
+        if invalid:
+            return web.json_response(
+                {'status': 'error', 'message': f'Invalid URL format: {invalid[0]}'},
+                status=400
+            )
+        
+        try:
+            max_depth = max(0, int(body.get('max_depth', 2)))
+            max_pages = max(1, min(int(body.get('max_pages', 100)), self.crawl_max_pages))
+            concurrency = int(body.get('concurrency', self.crawl_concurrency))
+        except (TypeError, ValueError):
+            return web.json_response(
+                {'status': 'error', 'message': 'max_depth, max_pages and concurrency must be integers'},
+                status=400
+            )
+        concurrency = max(1, min(concurrency, self.crawl_concurrency))
+        
+        state_dir = None
+        crawl_id = body.get('crawl_id')
+        if crawl_id is not None:
+            if self.crawl_state_dir is None:
+                return web.json_response(
+                    {'status': 'error', 'message': 'Crawl checkpoints are not enabled'},
+                    status=400
+                )
+            if not isinstance(crawl_id, str) or not CRAWL_ID_RE.match(crawl_id):
+                return web.json_response(
+                    {'status': 'error', 'message': 'Invalid crawl_id'},
+                    status=400
+                )
+            if crawl_id in self._active_crawls:
+                return web.json_response(
+                    {'status': 'error', 'message': 'Crawl already running'},
+                    status=409
+                )
+            state_dir = os.path.join(self.crawl_state_dir, crawl_id)
+        
+        # Por defecto solo descarga y parseo; 'process' agrega el Servidor B
+        fetch = self.scrape if body.get('process') else self.fetch_and_parse
+        
+        try:
+            crawler = Crawler(
+                fetch,
+                max_depth=max_depth,
+                max_pages=max_pages,
+                same_domain=body.get('same_domain', True) is not False,
+                include=body.get('include'),
+                exclude=body.get('exclude'),
+                concurrency=concurrency,
+                state_dir=state_dir,
+                robots=self.robots if body.get('robots', True) is not False else None
+            )
+        except re.error as e:
+            return web.json_response(
+                {'status': 'error', 'message': f'Invalid regex: {e}'},
+                status=400
+            )
+        
+        response = web.StreamResponse(
+            headers={'Content-Type': 'application/x-ndjson; charset=utf-8'}
+        )
+        await response.prepare(request)
+        
+        if crawl_id is not None:
+            self._active_crawls.add(crawl_id)
+        try:
+            async for record in crawler.crawl(seeds):
+                self.crawl_pages.inc(status=record.get('status', 'error'))
+                line = _dumps(record, ensure_ascii=False) + '\n'
+                await response.write(line.encode('utf-8'))
+        finally:
+            self._active_crawls.discard(crawl_id)
+        
+        summary = json.dumps({'summary': crawler.stats()}) + '\n'
+        await response.write(summary.encode('utf-8'))
+        await response.write_eof()
+        return response
+    
+    async def fetch_and_parse(self, url):
+        """
+        Descarga y parsea una página sin consultar al Servidor B.
+        
+        Es el paso por página del modo crawl: solo hacen falta los datos
+        de scraping (incluidos los enlaces a seguir).
+        
+        Returns:
+            Diccionario con 'url', 'timestamp', 'scraping_data', 'status'
+            y 'timings'
+        """
+        timestamp = datetime.utcnow().isoformat() + 'Z'
+        started = time.perf_counter()
+        timings = {}
+        
+        try:
+            page = await self.http_client.fetch_page(url)
+        except Exception as e:
+            self.record_error('fetch', e)
+            raise
+        timings['fetch_ms'] = _elapsed_ms(started)
+        self.stage_duration.observe(timings['fetch_ms'] / 1000, stage='fetch')
+        
+        start = time.perf_counter()
+        try:
+            page_data = await self.parse_page(page['content'], url)
+        except Exception as e:
+            self.record_error('parse', e)
+            raise
+        timings['parse_ms'] = _elapsed_ms(start)
+        self.stage_duration.observe(timings['parse_ms'] / 1000, stage='parse')
+        timings['total_ms'] = _elapsed_ms(started)
+        
+        return {
+            'url': url,
+            'timestamp': timestamp,
+            'scraping_data': page_data['scraping_data'],
+            'status': 'success',
+            'timings': timings
+        }
+    
+    async def handle_job_submit(self, request):
+        """
+        Crea un trabajo de scraping y devuelve su id inmediatamente.
+        
+        La URL se recibe en un JSON {"url": ...} o en el query string.
+        """
+        url = request.query.get('url')
+        if not url and request.can_read_body:
+            try:
+                body = await request.json()
+                url = body.get('url') if isinstance(body, dict) else None
+            except Exception:
+                return web.json_response(
+                    {'status': 'error', 'message': 'Invalid JSON body'},
+                    status=400
+                )
+        
+        if not url:
+            return web.json_response(
+                {'status': 'error', 'message': 'URL parameter is required'},
+                status=400
+            )
+        
+        if not self._is_valid_url(url):
+            return web.json_response(
+                {'status': 'error', 'message': 'Invalid URL format'},
+                status=400
+            )
+        
+        try:
+            job = self.jobs.submit(
+                'scrape',
+                {'url': url},
+                lambda job: self.scrape(url, progress=job.update_stage)
+            )
+        except JobTableFull as e:
+            return web.json_response(
+                {'status': 'error', 'message': str(e)},
+                status=503,
+                headers={'Retry-After': '5'}
+            )
+        
+        return web.json_response(
+            {
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f'/jobs/{job.id}',
+                'result_url': f'/jobs/{job.id}/result'
+            },
+            status=202
+        )
+    
+    async def handle_job_status(self, request):
+        """Devuelve el estado y el progreso por etapa de un trabajo"""
+        job = self.jobs.get(request.match_info['job_id'])
+        if job is None:
+            forwarded = await self.forward_job_request(request)
+            if forwarded is not None:
+                return forwarded
+            return web.json_response(
+                {'status': 'error', 'message': 'Job not found'},
+                status=404
+            )
+        return web.json_response(job.to_dict())
+    
+    async def handle_job_result(self, request):
+        """
+        Devuelve el resultado de un trabajo terminado.
+        
+        Si todavía no terminó responde 202 con su estado actual.
+        """
+        job = self.jobs.get(request.match_info['job_id'])
+        if job is None:
+            forwarded = await self.forward_job_request(request)
+            if forwarded is not None:
+                return forwarded
+            return web.json_response(
+                {'status': 'error', 'message': 'Job not found'},
+                status=404
+            )
+        
+        if not job.finished:
+            return web.json_response(job.to_dict(), status=202)
+        
+        if job.status == 'error':
+            return web.json_response(
+                {'status': 'error', 'message': job.error},
+                status=500
+            )
+        
+        return web.json_response(job.result, dumps=_dumps)
+    
+    async def forward_job_request(self, request):
+        """
+        Reenvía la consulta de un trabajo al worker que lo creó.
+        
+        En modo pre-fork el kernel reparte las conexiones entre workers, así
+        que la consulta puede llegar a uno que no tiene el trabajo. El id
+        indica el dueño, que atiende en su puerto interno de loopback.
+        
+        Returns:
+            Respuesta del worker dueño, o None si no corresponde reenviar
+        """
+        if self.registry is None:
+            return None
+        
+        job_id = request.match_info['job_id']
+        owner, sep, _ = job_id.partition('-')
+        if not sep or not owner.startswith('w') or owner[1:] == str(self.worker_id):
+            return None
+        
+        info = self.registry.read(owner[1:])
+        if info is None:
+            return None
+        
+        if self._peer_session is None:
+            self._peer_session = ClientSession(timeout=ClientTimeout(total=10))
+        
+        url = f"http://127.0.0.1:{info['internal_port']}{request.path_qs}"
+        try:
+            async with self._peer_session.get(url) as response:
+                body = await response.read()
+                return web.Response(
+                    body=body,
+                    status=response.status,
+                    content_type=response.content_type
+                )
+        except Exception:
+            return None
+    
     def _is_valid_url(self, url):
         """Validar formato de URL"""
         try:
@@ -83,125 +1163,548 @@ class ScrapingServer:
         except:
             return False
     
-    async def scrape_url(self, url):
+    async def scrape(self, url, progress=None):
+        """
+        Realiza el scraping de una URL deduplicando requests concurrentes.
+        
+        Todas las llamadas simultáneas con la misma URL normalizada esperan
+        una única ejecución de scrape_url. Si una de ellas se cancela (el
+        cliente se desconecta), el trabajo continúa para las demás.
+        
+        Args:
+            url: URL a scrapear
+            progress: Callback progress(stage, state). Solo lo recibe la
+                llamada que inicia el trabajo; las que se suman a uno en
+                curso no reportan etapas intermedias.
+        """
+        return await self.single_flight.do(
+            normalize_url(url),
+            lambda: self.scrape_url(url, progress)
+        )
+    
+    async def scrape_url(self, url, progress=None):
         """
         Orquesta el proceso completo de scraping y procesamiento.
         Esta función coordina las operaciones asíncronas.
+        
+        Args:
+            url: URL a scrapear
+            progress: Callback progress(stage, state) para reportar el avance
+                de las etapas 'fetch', 'parse' y 'processing'
+            
+        Returns:
+            Diccionario con el resultado consolidado
+        """
+        async for event, data in self.scrape_events(url, progress):
+            if event == 'result':
+                return data
+    
+    async def scrape_events(self, url, progress=None):
         """
+        Ejecuta el scraping emitiendo cada resultado parcial apenas está listo.
+        
+        El parsing y la consulta al Servidor B corren en paralelo, así que
+        'scraping_data', 'performance', 'thumbnails' y 'screenshot' se
+        emiten en el orden en que terminan. El último evento es siempre
+        'result', con el resultado consolidado y la duración de cada etapa
+        en 'timings'.
+        
+        Los resultados exitosos se guardan en la caché. Una entrada vigente
+        se devuelve directamente; una expirada se revalida con ETag/
+        Last-Modified y, si el origen responde 304, se reutiliza sin volver
+        a parsear ni consultar al Servidor B. En ambos casos solo se emite
+        el evento 'result'.
+        
+        Args:
+            url: URL a scrapear
+            progress: Callback progress(stage, state) para reportar el avance
+            
+        Yields:
+            Tuplas (evento, datos)
+        """
+        progress = progress or _no_progress
         timestamp = datetime.utcnow().isoformat() + 'Z'
+        cache_key = normalize_url(url)
+        started = time.perf_counter()
+        timings = {}
+        
+        entry = None
+        if self.cache is not None:
+            entry, fresh = self.cache.lookup(cache_key)
+            if fresh:
+                for stage in ('fetch', 'parse', 'processing'):
+                    progress(stage, 'cached')
+                timings['total_ms'] = _elapsed_ms(started)
+                yield 'result', dict(entry.value, cache='hit', timings=timings)
+                return
+            if entry is not None and not entry.has_validators():
+                entry = None
         
         try:
-            # Paso 1: Descargar HTML de forma asíncrona
-            html_content = await self.http_client.fetch(url)
-            
-            # Paso 2: Parsear HTML (CPU-bound pero rápido)
-            parser = HTMLParser(html_content)
-            scraping_data = {
-                'title': parser.get_title(),
-                'links': parser.get_links(url),
-                'meta_tags': MetadataExtractor.extract_meta_tags(html_content),
-                'structure': parser.get_structure(),
-                'images_count': parser.count_images()
-            }
-            
-            # Paso 3: Solicitar procesamiento al Servidor B de forma asíncrona
-            processing_data = await self.request_processing(url, html_content)
-            
-            # Paso 4: Consolidar resultados
-            result = {
-                'url': url,
-                'timestamp': timestamp,
-                'scraping_data': scraping_data,
-                'processing_data': processing_data,
-                'status': 'success'
-            }
+            # Paso 1: Descargar HTML de forma asíncrona (condicional si hay
+            # una entrada expirada con validadores)
+            progress('fetch', 'running')
+            page = await self.http_client.fetch_page(
+                url,
+                etag=entry.etag if entry else None,
+                last_modified=entry.last_modified if entry else None
+            )
+            timings['fetch_ms'] = _elapsed_ms(started)
+            self.stage_duration.observe(timings['fetch_ms'] / 1000, stage='fetch')
+            progress('fetch', 'done')
+        
+        except Exception as e:
+            self.record_error('fetch', e)
+            progress('fetch', 'error')
+            yield 'result', self._error_result(url, timestamp, e)
+            return
+        
+        if page['status'] == 304 and entry is not None:
+            self.cache.refresh(cache_key)
+            progress('parse', 'cached')
+            progress('processing', 'cached')
+            timings['total_ms'] = _elapsed_ms(started)
+            yield 'result', dict(entry.value, cache='revalidated', timings=timings)
+            return
+        
+        # Pasos 2 y 3: parsear y consultar al Servidor B en paralelo. El
+        # Servidor B solo necesita el HTML, así que la solicitud sale apenas
+        # llega el cuerpo y la latencia es max(parse, processing)
+        scraping_data = None
+        processing_data = {}
+        try:
+            async for event, value in self.parse_and_process(
+                url, page['content'], progress, timings
+            ):
+                if event == 'scraping_data':
+                    scraping_data = value
+                else:
+                    processing_data[event] = value
+                yield event, value
+        
+        except Exception as e:
+            yield 'result', self._error_result(url, timestamp, e)
+            return
+        
+        # Paso 4: Consolidar resultados
+        result = {
+            'url': url,
+            'timestamp': timestamp,
+            'scraping_data': scraping_data,
+            'processing_data': processing_data,
+            'status': 'success'
+        }
+        
+        # No cachear resultados incompletos (ej: Servidor B caído)
+        if self.cache is not None and not processing_data.get('error'):
+            self.cache.put(cache_key, result, page['etag'], page['last_modified'])
+        
+        timings['total_ms'] = _elapsed_ms(started)
+        self.scrape_duration.observe(timings['total_ms'] / 1000)
+        yield 'result', dict(result, timings=timings)
+    
+    async def parse_and_process(self, url, html_content, progress, timings):
+        """
+        Parsea la página y solicita el procesamiento de forma concurrente.
+        
+        Los eventos se emiten en el orden en que terminan: 'scraping_data'
+        cuando termina el parsing y cada resultado del Servidor B apenas
+        llega. Si el parsing falla se cancela el procesamiento y se propaga
+        el error.
+        
+        Args:
+            url: URL de la página
+            html_content: HTML descargado
+            progress: Callback progress(stage, state)
+            timings: Diccionario donde se registra la duración de cada etapa
             
-            return result
+        Yields:
+            Tuplas (evento, datos)
+        """
+        events = asyncio.Queue()
+        
+        async def parse():
+            progress('parse', 'running')
+            start = time.perf_counter()
+            try:
+                page_data = await self.parse_page(html_content, url)
+            except Exception as e:
+                self.record_error('parse', e)
+                progress('parse', 'error')
+                events.put_nowait(('parse_error', e))
+                return
+            finally:
+                timings['parse_ms'] = _elapsed_ms(start)
             
-        except Exception as e:
-            return {
-                'url': url,
-                'timestamp': timestamp,
-                'status': 'error',
-                'message': str(e)
-            }
+            self.stage_duration.observe(timings['parse_ms'] / 1000, stage='parse')
+            worker_timings = page_data.get('timings', {})
+            if 'metadata' in worker_timings:
+                self.stage_duration.observe(worker_timings['metadata'], stage='metadata')
+            progress('parse', 'done')
+            events.put_nowait(('scraping_data', page_data['scraping_data']))
+            events.put_nowait((None, None))
+        
+        async def process():
+            progress('processing', 'running')
+            start = time.perf_counter()
+            failed = False
+            async for part, value in self.request_processing_stream(url, html_content):
+                failed = failed or part == 'error'
+                events.put_nowait((part, value))
+            timings['processing_ms'] = _elapsed_ms(start)
+            self.stage_duration.observe(timings['processing_ms'] / 1000, stage='processing')
+            progress('processing', 'error' if failed else 'done')
+            events.put_nowait((None, None))
+        
+        tasks = [asyncio.ensure_future(process()), asyncio.ensure_future(parse())]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                event, value = await events.get()
+                if event is None:
+                    remaining -= 1
+                elif event == 'parse_error':
+                    raise value
+                else:
+                    yield event, value
+        finally:
+            # Si el parsing falló o el consumidor se fue, no seguir procesando
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    @staticmethod
+    def _error_result(url, timestamp, error):
+        """Resultado de un scraping que falló antes de consolidarse"""
+        return {
+            'url': url,
+            'timestamp': timestamp,
+            'status': 'error',
+            'message': str(error)
+        }
+    
+    async def parse_page(self, html_content, url):
+        """
+        Extrae los datos de la página en el pool de parsing.
+        
+        Returns:
+            Diccionario devuelto por extract_page_data
+        """
+        if self.parse_executor is None:
+            return extract_page_data(html_content, url)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.parse_executor, extract_page_data, html_content, url
+        )
     
     async def request_processing(self, url, html_content):
         """
         Comunica con el Servidor B para solicitar procesamiento.
         Implementa comunicación asíncrona mediante sockets.
+        
+        Returns:
+            Diccionario con 'screenshot', 'performance' y 'thumbnails'
+            (y 'error' si la comunicación falló)
+        """
+        processing_data = {}
+        async for part, value in self.request_processing_stream(url, html_content):
+            processing_data[part] = value
+        return processing_data
+    
+    async def request_processing_stream(self, url, html_content):
+        """
+        Solicita procesamiento al Servidor B recibiendo cada resultado
+        apenas termina.
+        
+        La solicitud sale en paralelo con el parsing, así que el Servidor B
+        extrae por su cuenta las URLs de imágenes y recursos del HTML. Si
+        la comunicación falla se emite 'error' y el valor por defecto de
+        cada resultado que no llegó.
+        
+        Yields:
+            Tuplas (nombre, valor) en orden de finalización
         """
+        # Preparar solicitud para el servidor de procesamiento
+        # El HTML va completo: el mensaje se comprime (ver
+        # processing_compression_level). 'stream' se agrega por conexión,
+        # según lo acordado con cada Servidor B
+        request_data = {
+            'url': url,
+            'html': html_content
+        }
+        # Comprimir un HTML grande bloquearía el event loop
+        offload = (
+            self.processing_compression_level > 0
+            and len(html_content) >= self.processing_offload_bytes
+        )
+        
+        received = set()
+        if self.processing_mux is not None:
+            parts = self._multiplexed_parts(request_data, received, offload)
+        else:
+            parts = self._pooled_parts(request_data, received, offload)
+        
         try:
-            # Preparar solicitud para el servidor de procesamiento
-            request_data = {
-                'url': url,
-                'html': html_content[:10000]  # Limitar tamaño
-            }
+            async for part, value in parts:
+                yield part, value
+            return
             
-            # Serializar con el protocolo
-            message = Protocol.encode(request_data)
-            
-            # Conectar de forma asíncrona al servidor de procesamiento
-            reader, writer = await asyncio.open_connection(
-                self.processing_host, 
-                self.processing_port
-            )
+        except ConnectionRefusedError as e:
+            self.record_error('processing', e)
+            error = 'Processing server not available'
+        except Exception as e:
+            self.record_error('processing', e)
+            error = f'Processing failed: {str(e)}'
+        finally:
+            await parts.aclose()
+        
+        yield 'error', error
+        for part, default in PROCESSING_DEFAULTS.items():
+            if part not in received:
+                yield part, list(default) if isinstance(default, list) else default
+    
+    async def _pooled_parts(self, request_data, received, offload=False):
+        """
+        Envía la solicitud por una conexión del pool, una solicitud a la vez.
+        
+        Args:
+            request_data: Diccionario con la solicitud
+            received: Conjunto donde se registran los resultados recibidos
+            offload: Si True, la solicitud se serializa y comprime en el
+                executor por defecto del loop
             
+        Yields:
+            Tuplas (nombre, valor) en orden de finalización
+        """
+        message, encoding = None, None
+        
+        for attempt in range(2):
+            # Conexión persistente del pool (la segunda vez, una nueva)
+            conn = await self.processing_pool.acquire(fresh=attempt > 0)
+            completed = False
             try:
+                # Se serializa de nuevo solo si la conexión nueva acordó
+                # otras capacidades
+                conn_encoding, encode = self._processing_encoder(request_data, conn.peer)
+                if conn_encoding != encoding:
+                    encoding = conn_encoding
+                    if offload:
+                        message = await asyncio.get_running_loop().run_in_executor(None, encode)
+                    else:
+                        message = encode()
+                
                 # Enviar solicitud
-                writer.write(message)
-                await writer.drain()
+                conn.writer.writelines(message)
+                await conn.writer.drain()
                 
-                # Recibir respuesta
-                response = await Protocol.receive(reader)
+                # Recibir un mensaje por resultado hasta el de cierre
+                while True:
+                    response = await Protocol.receive(conn.reader)
+                    if 'part' in response:
+                        received.add(response['part'])
+                        yield response['part'], response['data']
+                    elif response.get('done'):
+                        break
+                    else:
+                        # Servidor B sin streaming: respuesta completa
+                        for part, value in response.items():
+                            received.add(part)
+                            yield part, value
+                        break
                 
-                return response
+                completed = True
+                return
                 
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Una conexión reutilizada pudo haber sido cerrada por el
+                # Servidor B mientras estaba ociosa: reintentar una vez
+                if conn.uses > 1 and not received and attempt == 0:
+                    continue
+                raise
             finally:
-                writer.close()
-                await writer.wait_closed()
+                # Solo se reutiliza si la conversación terminó completa
+                await self.processing_pool.release(conn, reusable=completed)
+    
+    def _processing_encoder(self, request_data, peer):
+        """
+        Serialización de una solicitud según lo acordado con el Servidor B.
+        
+        Con un Servidor B anterior al handshake (versión 0) se usa el
+        formato simple en JSON, sin 'stream', y se espera una única
+        respuesta. Si no, el formato extendido indica el códec y la
+        compresión en los flags; el streaming y los segmentos binarios se
+        piden solo si se acordaron (o si no hubo handshake).
+        
+        Args:
+            request_data: Diccionario con la solicitud (sin 'stream')
+            peer: Capabilities acordadas con la conexión (None sin handshake)
+            
+        Returns:
+            Tupla (clave que identifica la serialización, función sin
+            argumentos que devuelve la lista de buffers del mensaje)
+        """
+        if peer is not None and peer.legacy:
+            return ('simple',), lambda: [Protocol.encode(request_data)]
+        
+        options = {
+            'codec': self.processing_codec,
+            'compress_level': self.processing_compression_level,
+            'compress_min_size': self.processing_compression_min_bytes
+        }
+        data = request_data
+        if peer is not None:
+            options = peer.encode_options(**options)
+        if peer is None or peer.supports('streaming'):
+            data = dict(request_data, stream=True)
+        
+        encode = functools.partial(
+            Protocol.encode_frame_parts, Protocol.REQUEST, 1, data, **options
+        )
+        return ('extended', 'stream' in data, options), encode
+    
+    async def _multiplexed_parts(self, request_data, received, offload=False):
+        """
+        Envía la solicitud por la conexión multiplexada compartida.
+        
+        Si el Servidor B no acordó la feature 'multiplex', la solicitud va
+        por el pool de conexiones.
+        
+        Args:
+            request_data: Diccionario con la solicitud
+            received: Conjunto donde se registran los resultados recibidos
+            offload: Si True, la solicitud se serializa y comprime en el
+                executor por defecto del loop
+            
+        Yields:
+            Tuplas (nombre, valor) en orden de finalización
+        """
+        if not await self.processing_mux.multiplexed():
+            async for part, value in self._pooled_parts(request_data, received, offload):
+                yield part, value
+            return
+        
+        peer = self.processing_mux.peer
+        if peer is None or peer.supports('streaming'):
+            request_data = dict(request_data, stream=True)
+        
+        for attempt in range(2):
+            frames = self.processing_mux.stream(request_data, offload=offload)
+            try:
+                async for frame in frames:
+                    if frame.type == Protocol.PART:
+                        received.add(frame.data['part'])
+                        yield frame.data['part'], frame.data['data']
+                    elif frame.type == Protocol.RESPONSE:
+                        # Respuesta completa (solicitud sin streaming o error)
+                        for part, value in frame.data.items():
+                            received.add(part)
+                            yield part, value
+                return
                 
-        except ConnectionRefusedError:
-            return {
-                'error': 'Processing server not available',
-                'screenshot': None,
-                'performance': None,
-                'thumbnails': []
-            }
-        except Exception as e:
-            return {
-                'error': f'Processing failed: {str(e)}',
-                'screenshot': None,
-                'performance': None,
-                'thumbnails': []
-            }
+            except ConnectionError:
+                # La conexión compartida se cayó: reconectar una vez
+                if not received and attempt == 0:
+                    continue
+                raise
+            finally:
+                # Liberar la solicitud aunque se deje de iterar antes
+                await frames.aclose()
     
     async def start(self):
         """Inicia el servidor"""
         runner = web.AppRunner(self.app)
         await runner.setup()
         
-        # Determinar familia de direcciones (IPv4 o IPv6)
-        try:
-            family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
-        except:
-            family = socket.AF_INET
-        
-        site = web.TCPSite(runner, self.host, self.port, family=family)
+        # Socket de escucha IPv4 o IPv6 según la dirección (compartido entre
+        # workers con SO_REUSEPORT en el modo pre-fork)
+        sock = create_listening_socket(self.host, self.port, reuse_port=self.reuse_port)
+        site = web.SockSite(runner, sock)
         await site.start()
         
-        print(f"Servidor de Scraping iniciado en {self.host}:{self.port}")
-        print(f"Workers asíncronos: {self.workers}")
-        print(f"Servidor de procesamiento: {self.processing_host}:{self.processing_port}")
+        publisher = None
+        if self.registry is not None:
+            # Puerto interno para que otros workers reenvíen consultas de /jobs
+            internal = create_listening_socket('127.0.0.1', 0)
+            self.internal_port = internal.getsockname()[1]
+            await web.SockSite(runner, internal).start()
+            publisher = asyncio.ensure_future(self._publish_stats_loop())
+        
+        self.loop_monitor.start()
+        if self.processing_mux is None:
+            await self.processing_pool.start()
+        
+        if self.worker_id is None:
+            print(f"Servidor de Scraping iniciado en {self.host}:{self.port}")
+            print(f"Workers asíncronos: {self.workers}")
+            print(f"Pool de parsing: {self.parse_executor_kind} ({self.parse_workers} workers)")
+            print(f"Servidor de procesamiento: {self.processing_host}:{self.processing_port}")
+        else:
+            print(f"Worker {self.worker_id} (pid {os.getpid()}) escuchando en {self.host}:{self.port}")
+        
+        # Mantener el servidor corriendo hasta SIGINT o SIGTERM
+        stop_event = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Plataforma sin señales en el event loop
         
-        # Mantener el servidor corriendo
         try:
-            await asyncio.Event().wait()
+            await stop_event.wait()
         except KeyboardInterrupt:
             print("\nDeteniendo servidor...")
         finally:
+            if publisher is not None:
+                publisher.cancel()
+            await self.jobs.close()
+            await self.processing_pool.close()
+            if self.processing_mux is not None:
+                await self.processing_mux.close()
+            await self.loop_monitor.stop()
             await self.http_client.close()
+            if self._peer_session is not None:
+                await self._peer_session.close()
             await runner.cleanup()
+            if self.parse_executor is not None:
+                self.parse_executor.shutdown(wait=True, cancel_futures=True)
+            if self.compression_executor is not None:
+                self.compression_executor.shutdown(wait=False, cancel_futures=True)
+    
+    # Segundos entre publicaciones de métricas en el registro del pre-fork
+    STATS_INTERVAL = 1
+    
+    async def _publish_stats_loop(self):
+        """Publica periódicamente las métricas del worker en el registro"""
+        while True:
+            self.registry.publish(self.worker_id, {
+                'pid': os.getpid(),
+                'internal_port': self.internal_port,
+                'updated_at': time.time(),
+                'stats': self.get_stats(),
+                'metrics': self.metrics.snapshot()
+            })
+            await asyncio.sleep(self.STATS_INTERVAL)
+
+
+def run_worker(worker_id, registry_dir, server_kwargs):
+    """
+    Punto de entrada de cada proceso worker del modo pre-fork.
+    
+    Args:
+        worker_id: Número de worker asignado por el supervisor
+        registry_dir: Directorio del registro compartido
+        server_kwargs: Argumentos para ScrapingServer
+    """
+    server = ScrapingServer(
+        **server_kwargs,
+        worker_id=worker_id,
+        registry=WorkerRegistry(registry_dir),
+        reuse_port=True
+    )
+    try:
+        asyncio.run(server.start())
+    except KeyboardInterrupt:
+        pass
 
 
 def parse_arguments():
@@ -231,6 +1734,13 @@ def parse_arguments():
         help='Número de workers (default: 4)'
     )
     
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=1,
+        help='Procesos worker con su propio event loop en el mismo puerto (default: 1)'
+    )
+    
     parser.add_argument(
         '--processing-host',
         default='127.0.0.1',
@@ -244,21 +1754,320 @@ def parse_arguments():
         help='Puerto del servidor de procesamiento (default: 8001)'
     )
     
+    parser.add_argument(
+        '--processing-pool-min',
+        type=int,
+        default=1,
+        help='Conexiones persistentes mínimas con el servidor de procesamiento (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--processing-pool-max',
+        type=int,
+        default=16,
+        help='Conexiones simultáneas máximas con el servidor de procesamiento (default: 16)'
+    )
+    
+    parser.add_argument(
+        '--processing-pool-idle',
+        type=float,
+        default=60,
+        help='Segundos tras los cuales se cierra una conexión ociosa (default: 60)'
+    )
+    
+    parser.add_argument(
+        '--processing-multiplex',
+        action='store_true',
+        help='Multiplexar todas las solicitudes de procesamiento sobre una única conexión'
+    )
+    
+    parser.add_argument(
+        '--processing-codec',
+        choices=sorted(CODECS),
+        default='json',
+        help='Códec de los mensajes con el servidor de procesamiento (default: json)'
+    )
+    
+    parser.add_argument(
+        '--processing-compression-level',
+        type=int,
+        choices=range(0, 10),
+        default=6,
+        metavar='{0-9}',
+        help='Nivel de zlib de los mensajes al servidor de procesamiento; 0 la deshabilita (default: 6)'
+    )
+    
+    parser.add_argument(
+        '--processing-compression-min-bytes',
+        type=int,
+        default=1024,
+        help='Tamaño mínimo de un mensaje al servidor de procesamiento para comprimirlo (default: 1024)'
+    )
+    
+    parser.add_argument(
+        '--no-processing-handshake',
+        action='store_true',
+        help='No negociar versión y capacidades al conectar con el servidor de procesamiento'
+    )
+    
+    parser.add_argument(
+        '--max-inflight',
+        type=int,
+        default=32,
+        help='Requests de scraping atendidos a la vez (default: 32)'
+    )
+    
+    parser.add_argument(
+        '--max-queue',
+        type=int,
+        default=64,
+        help='Requests de scraping que pueden esperar lugar; el resto recibe 503 (default: 64)'
+    )
+    
+    parser.add_argument(
+        '--max-queue-wait',
+        type=float,
+        default=2.0,
+        help='Espera máxima en la cola de admisión en segundos (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--codel-target-ms',
+        type=float,
+        default=0,
+        help='Espera máxima en ms cuando la cola es persistente (CoDel); 0 lo deshabilita (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--codel-interval-ms',
+        type=float,
+        default=100,
+        help='Tiempo en ms sin vaciarse tras el cual la cola se considera persistente (default: 100)'
+    )
+    
+    parser.add_argument(
+        '--host-concurrency',
+        type=int,
+        default=5,
+        help='Descargas simultáneas máximas por host (default: 5)'
+    )
+    
+    parser.add_argument(
+        '--host-rate',
+        type=float,
+        default=0,
+        help='Requests por segundo por host; 0 sin límite (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--host-burst',
+        type=int,
+        default=1,
+        help='Requests seguidos permitidos a un host ocioso con --host-rate (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--cache-entries',
+        type=int,
+        default=1000,
+        help='Máximo de resultados en la caché (default: 1000)'
+    )
+    
+    parser.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=256,
+        help='Tamaño máximo de la caché en MB (default: 256)'
+    )
+    
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=300,
+        help='Tiempo de vida de cada resultado en segundos, 0 deshabilita la caché (default: 300)'
+    )
+    
+    parser.add_argument(
+        '--batch-concurrency',
+        type=int,
+        default=16,
+        help='Máximo de URLs simultáneas por solicitud de batch (default: 16)'
+    )
+    
+    parser.add_argument(
+        '--crawl-max-pages',
+        type=int,
+        default=1000,
+        help='Máximo de páginas por solicitud de crawl (default: 1000)'
+    )
+    
+    parser.add_argument(
+        '--crawl-concurrency',
+        type=int,
+        default=16,
+        help='Máximo de páginas simultáneas por solicitud de crawl (default: 16)'
+    )
+    
+    parser.add_argument(
+        '--crawl-state-dir',
+        default=None,
+        help='Directorio para frontera en disco y checkpoints de crawls con crawl_id (default: deshabilitado)'
+    )
+    
+    parser.add_argument(
+        '--robots-cache-entries',
+        type=int,
+        default=1000,
+        help='Máximo de sitios en la caché de robots.txt (default: 1000)'
+    )
+    
+    parser.add_argument(
+        '--robots-ttl',
+        type=float,
+        default=86400,
+        help='Vigencia en segundos de un robots.txt sin max-age (default: 86400)'
+    )
+    
+    parser.add_argument(
+        '--job-max',
+        type=int,
+        default=1000,
+        help='Máximo de trabajos en la tabla de /jobs (default: 1000)'
+    )
+    
+    parser.add_argument(
+        '--job-ttl',
+        type=float,
+        default=3600,
+        help='Segundos que se conserva un trabajo terminado (default: 3600)'
+    )
+    
+    parser.add_argument(
+        '--job-concurrency',
+        type=int,
+        default=8,
+        help='Máximo de trabajos ejecutándose a la vez (default: 8)'
+    )
+    
+    parser.add_argument(
+        '--compression-level',
+        type=int,
+        choices=range(0, 10),
+        default=6,
+        metavar='{0-9}',
+        help='Nivel de compresión gzip/deflate de las respuestas; 0 la deshabilita (default: 6)'
+    )
+    
+    parser.add_argument(
+        '--compression-min-bytes',
+        type=int,
+        default=1024,
+        help='Tamaño mínimo en bytes de una respuesta para comprimirla (default: 1024)'
+    )
+    
+    parser.add_argument(
+        '--compression-offload-bytes',
+        type=int,
+        default=64 * 1024,
+        help='Tamaño a partir del cual se comprime en un thread, fuera del event loop (default: 65536)'
+    )
+    
+    parser.add_argument(
+        '--compression-codecs',
+        default='gzip,deflate',
+        help='Códecs habilitados en orden de preferencia, separados por coma (default: gzip,deflate)'
+    )
+    
+    parser.add_argument(
+        '--parse-executor',
+        choices=['process', 'thread', 'inline'],
+        default='process',
+        help='Pool donde se parsea el HTML (default: process)'
+    )
+    
+    parser.add_argument(
+        '--parse-workers',
+        type=int,
+        default=None,
+        help='Número de workers del pool de parsing (default: número de CPUs)'
+    )
+    
     return parser.parse_args()
 
 
 def main():
     args = parse_arguments()
     
-    # Crear y ejecutar servidor
-    server = ScrapingServer(
-        args.ip, 
-        args.port, 
-        args.workers,
-        args.processing_host,
-        args.processing_port
+    # En modo pre-fork los workers se reparten las CPUs para el parsing
+    parse_workers = args.parse_workers
+    if args.processes > 1 and parse_workers is None:
+        parse_workers = max(1, (os.cpu_count() or 1) // args.processes)
+    
+    server_kwargs = dict(
+        host=args.ip,
+        port=args.port,
+        workers=args.workers,
+        processing_host=args.processing_host,
+        processing_port=args.processing_port,
+        parse_executor=args.parse_executor,
+        parse_workers=parse_workers,
+        cache_entries=args.cache_entries,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        cache_ttl=args.cache_ttl,
+        batch_concurrency=args.batch_concurrency,
+        job_max=args.job_max,
+        job_ttl=args.job_ttl,
+        job_concurrency=args.job_concurrency,
+        processing_pool_min=args.processing_pool_min,
+        processing_pool_max=args.processing_pool_max,
+        processing_pool_idle=args.processing_pool_idle,
+        processing_multiplex=args.processing_multiplex,
+        processing_codec=args.processing_codec,
+        processing_compression_level=args.processing_compression_level,
+        processing_compression_min_bytes=args.processing_compression_min_bytes,
+        processing_handshake=not args.no_processing_handshake,
+        max_inflight=args.max_inflight,
+        max_queue=args.max_queue,
+        max_queue_wait=args.max_queue_wait,
+        codel_target=args.codel_target_ms / 1000 if args.codel_target_ms > 0 else None,
+        codel_interval=args.codel_interval_ms / 1000,
+        host_concurrency=args.host_concurrency,
+        host_rate=args.host_rate or None,
+        host_burst=args.host_burst,
+        crawl_max_pages=args.crawl_max_pages,
+        crawl_concurrency=args.crawl_concurrency,
+        crawl_state_dir=args.crawl_state_dir,
+        robots_cache_entries=args.robots_cache_entries,
+        robots_ttl=args.robots_ttl,
+        compression_level=args.compression_level,
+        compression_min_bytes=args.compression_min_bytes,
+        compression_offload_bytes=args.compression_offload_bytes,
+        compression_codecs=[
+            name.strip() for name in args.compression_codecs.split(',') if name.strip()
+        ]
     )
     
+    if args.processes > 1:
+        # Verificar que el puerto se puede compartir antes de lanzar workers
+        try:
+            create_listening_socket(args.ip, args.port, reuse_port=True).close()
+        except (OSError, RuntimeError) as e:
+            print(f"No se puede escuchar en {args.ip}:{args.port}: {e}")
+            sys.exit(1)
+        
+        print(f"Servidor de Scraping iniciado en {args.ip}:{args.port}")
+        print(f"Procesos worker: {args.processes} (pid supervisor {os.getpid()})")
+        print(f"Workers asíncronos por proceso: {args.workers}")
+        print(f"Pool de parsing por proceso: {args.parse_executor} ({parse_workers} workers)")
+        print(f"Servidor de procesamiento: {args.processing_host}:{args.processing_port}")
+        
+        Supervisor(args.processes, run_worker, (server_kwargs,)).run()
+        print("\nServidor detenido")
+        return
+    
+    # Crear y ejecutar servidor
+    server = ScrapingServer(**server_kwargs)
+    
     try:
         asyncio.run(server.start())
     except KeyboardInterrupt:
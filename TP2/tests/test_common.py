@@ -0,0 +1,604 @@
+"""
+Tests para los módulos comunes.
+"""
+
+import sys
+import os
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from unittest import mock
+import asyncio
+import json
+import socket
+import struct
+import threading
+import zlib
+import bs4
+from common.document import ParsedDocument
+from common.protocol import Protocol, MultiplexedClient, Capabilities, LEGACY_CAPABILITIES
+from common.serialization import Codec, get_codec, codec_by_id
+from scraper.html_parser import HTMLParser
+from scraper.metadata_extractor import MetadataExtractor
+from processor.image_processor import ImageProcessor
+from processor.performance import PerformanceAnalyzer
+
+
+class TestParsedDocument(unittest.TestCase):
+    """Tests para el ParsedDocument compartido"""
+
+    def setUp(self):
+        """Configurar HTML de prueba"""
+        self.sample_html = """
+        <html lang="es">
+        <head>
+            <title>Documento</title>
+            <meta name="description" content="Descripción">
+            <link rel="stylesheet" href="/styles.css">
+            <script src="/app.js"></script>
+            <script type="application/ld+json">{"@type": "Article"}</script>
+        </head>
+        <body>
+            <h1>Principal</h1>
+            <a href="/a">A</a>
+            <a href="/a">A repetido</a>
+            <a href="mailto:test@example.com">Mail</a>
+            <img src="/foto.jpg">
+            <img src="/foto.jpg">
+            <img src="/logo.png">
+        </body>
+        </html>
+        """
+
+    def test_parses_once_for_all_extractors(self):
+        """Test que todos los extractores comparten un único parseo"""
+        with mock.patch('common.document.BeautifulSoup', wraps=bs4.BeautifulSoup) as bs:
+            document = ParsedDocument(self.sample_html)
+            parser = HTMLParser(document)
+            parser.get_title()
+            parser.get_links("https://example.com/")
+            parser.get_structure()
+            parser.count_images()
+            MetadataExtractor.extract_meta_tags(document)
+            MetadataExtractor.extract_language(document)
+            ImageProcessor()._extract_image_urls(document, "https://example.com/")
+            PerformanceAnalyzer()._extract_resources(document, "https://example.com/")
+
+            self.assertEqual(bs.call_count, 1)
+
+    def test_memoize(self):
+        """Test que los campos se calculan una sola vez"""
+        document = ParsedDocument(self.sample_html)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 42
+
+        self.assertEqual(document.memoize('campo', compute), 42)
+        self.assertEqual(document.memoize('campo', compute), 42)
+        self.assertEqual(len(calls), 1)
+
+    def test_image_and_resource_urls(self):
+        """Test de extracción de URLs de imágenes y recursos"""
+        document = ParsedDocument(self.sample_html)
+
+        self.assertEqual(
+            document.image_urls("https://example.com/"),
+            ["https://example.com/foto.jpg", "https://example.com/logo.png"]
+        )
+        self.assertEqual(
+            document.resource_urls("https://example.com/"),
+            [
+                "https://example.com/styles.css",
+                "https://example.com/app.js",
+                "https://example.com/foto.jpg",
+                "https://example.com/logo.png",
+            ]
+        )
+
+    def test_text_content_keeps_tree_intact(self):
+        """Test que extraer texto no destruye scripts usados por otros extractores"""
+        document = ParsedDocument(self.sample_html)
+        text = HTMLParser(document).get_text_content()
+
+        self.assertIn("Principal", text)
+        self.assertNotIn("Article", text)
+        self.assertEqual(len(MetadataExtractor.extract_structured_data(document)), 1)
+
+    def test_ensure_reuses_document(self):
+        """Test que ensure no vuelve a parsear un documento existente"""
+        document = ParsedDocument(self.sample_html)
+        self.assertIs(ParsedDocument.ensure(document), document)
+        self.assertIs(ParsedDocument.ensure(document.soup).soup, document.soup)
+
+
+
+class TestProtocolFrames(unittest.TestCase):
+    """Tests para los mensajes extendidos del protocolo"""
+
+    def test_frame_roundtrip(self):
+        """Test que tipo, request id y datos se conservan"""
+        message = Protocol.encode_frame(Protocol.PART, 7, {'part': 'thumbnails', 'data': []})
+
+        async def read():
+            reader = asyncio.StreamReader()
+            reader.feed_data(message)
+            return await Protocol.receive_frame(reader)
+
+        frame = asyncio.run(read())
+        self.assertEqual(frame.type, Protocol.PART)
+        self.assertEqual(frame.request_id, 7)
+        self.assertEqual(frame.data, {'part': 'thumbnails', 'data': []})
+        self.assertEqual(Protocol.decode(message), frame.data)
+
+    def test_simple_and_extended_on_same_socket(self):
+        """Test que ambos formatos conviven en la misma conexión"""
+        left, right = socket.socketpair()
+        try:
+            left.sendall(Protocol.encode({'a': 1}))
+            left.sendall(Protocol.encode_frame(Protocol.REQUEST, 3, {'b': 2}))
+
+            simple = Protocol.receive_frame_socket(right)
+            extended = Protocol.receive_frame_socket(right)
+        finally:
+            left.close()
+            right.close()
+
+        self.assertIsNone(simple.request_id)
+        self.assertEqual(simple.data, {'a': 1})
+        self.assertEqual((extended.type, extended.request_id), (Protocol.REQUEST, 3))
+        self.assertEqual(extended.data, {'b': 2})
+
+
+class TestSerialization(unittest.TestCase):
+    """Tests para los códecs de serialización"""
+
+    VALUE = {
+        'url': 'https://example.com/página',
+        'html': '<p>ñ "comillas" \\ \n</p>' * 100,
+        'numbers': [0, -1, 2 ** 40, 2 ** 80, 1.5],
+        'flags': [True, False, None],
+        'nested': {'a': {'b': []}, '': ''}
+    }
+
+    def test_roundtrip(self):
+        """Test que todos los códecs conservan los valores"""
+        for name in ('json', 'binary'):
+            codec = get_codec(name)
+            data = codec.encode(self.VALUE)
+            self.assertEqual(codec.decode(data), self.VALUE, name)
+            self.assertEqual(codec.decode(memoryview(bytearray(data))), self.VALUE, name)
+        self.assertIs(codec_by_id(1), get_codec('binary'))
+
+    def test_binary_bytes_and_errors(self):
+        """Test que el códec binario lleva bytes y rechaza datos inválidos"""
+        codec = get_codec('binary')
+        self.assertEqual(codec.decode(codec.encode({'png': b'\x89PNG\x00'})), {'png': b'\x89PNG\x00'})
+
+        # Los bytes son vistas sobre el buffer recibido, sin copiarlos
+        buffer = bytearray(codec.encode([b'uno', b'dos']))
+        first, second = codec.decode(buffer)
+        self.assertIsInstance(first, memoryview)
+        self.assertIs(first.obj, buffer)
+        self.assertEqual((bytes(first), bytes(second)), (b'uno', b'dos'))
+
+        data = codec.encode(self.VALUE)
+        with self.assertRaises(ValueError):
+            codec.decode(data[:-3])
+        with self.assertRaises(ValueError):
+            codec.decode(data + b'N')
+        with self.assertRaises(TypeError):
+            codec.encode({1: 'clave no string'})
+        with self.assertRaises(ValueError):
+            get_codec('msgpack')
+        with self.assertRaises(TypeError):
+            Codec()
+
+    def test_deep_nesting_rejected(self):
+        """Test que un mensaje anidado sin límite se rechaza como ValueError"""
+        depth = sys.getrecursionlimit() * 2
+        binary = (b'l' + struct.pack('>I', 1)) * depth + b'N'
+        with self.assertRaises(ValueError):
+            get_codec('binary').decode(binary)
+        with self.assertRaises(ValueError):
+            get_codec('json').decode(b'[' * depth + b']' * depth)
+
+    def test_frame_codec(self):
+        """Test que el códec viaja en los flags y el receptor lo detecta"""
+        message = Protocol.encode_frame(Protocol.REQUEST, 5, self.VALUE, codec='binary')
+        left, right = socket.socketpair()
+        try:
+            left.sendall(message)
+            frame = Protocol.receive_frame_socket(right)
+        finally:
+            left.close()
+            right.close()
+
+        self.assertEqual(frame.data, self.VALUE)
+        self.assertEqual(Protocol.frame_codec(frame), 'binary')
+        self.assertEqual(Protocol.decode(message), self.VALUE)
+
+
+class TestAttachments(unittest.TestCase):
+    """Tests para los mensajes multi-parte con segmentos binarios"""
+
+    DATA = {
+        'screenshot': b'\x89PNG' + bytes(range(256)) * 40,
+        'thumbnails': [b'\xff\xd8uno', bytearray(b'\xff\xd8dos')],
+        'performance': {'load_time_ms': 12}
+    }
+
+    def test_parts_sent_without_copy(self):
+        """Test que los segmentos se envían tal cual y se reconstruyen"""
+        for codec in ('json', 'binary'):
+            parts = Protocol.encode_frame_parts(Protocol.RESPONSE, 9, self.DATA, codec=codec)
+            self.assertIs(parts[1], self.DATA['screenshot'])
+            self.assertEqual(len(parts), 4)
+
+            left, right = socket.socketpair()
+            try:
+                Protocol.send_parts(left, parts)
+                frame = Protocol.receive_frame_socket(right)
+            finally:
+                left.close()
+                right.close()
+
+            self.assertTrue(frame.flags & Protocol.ATTACHMENTS)
+            self.assertEqual(frame.data, self.DATA, codec)
+            self.assertEqual(Protocol.frame_codec(frame), codec)
+
+    def test_async_receive_and_errors(self):
+        """Test de la recepción asíncrona y de mensajes multi-parte corruptos"""
+        message = Protocol.encode_frame(Protocol.PART, 2, {'part': 'screenshot', 'data': b'png'})
+
+        async def read(data):
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            return await Protocol.receive_frame(reader)
+
+        self.assertEqual(asyncio.run(read(message)).data, {'part': 'screenshot', 'data': b'png'})
+        self.assertEqual(Protocol.decode(message)['data'], b'png')
+
+        # Un segmento menos que lo declarado en el header
+        corrupt = bytearray(message)
+        length = int.from_bytes(corrupt[:4], 'big') - 1
+        corrupt[:4] = length.to_bytes(4, 'big')
+        with self.assertRaises(ValueError):
+            asyncio.run(read(bytes(corrupt[:-1])))
+
+    def test_simple_format_uses_base64(self):
+        """Test que el formato simple envía los bytes en base64"""
+        import base64
+        data = Protocol.decode(Protocol.encode({'screenshot': b'png'}))
+        self.assertEqual(data, {'screenshot': base64.b64encode(b'png').decode()})
+
+
+class TestFrameCompression(unittest.TestCase):
+    """Tests para la compresión zlib de los mensajes"""
+
+    HTML = '<html><body>' + '<p><img src="/img/foto.jpg"> Texto</p>' * 2000 + '</body></html>'
+
+    def test_compressed_roundtrip(self):
+        """Test que los datos grandes se comprimen y se recuperan completos"""
+        data = {'url': 'https://example.com', 'html': self.HTML}
+        plain = Protocol.encode_frame(Protocol.REQUEST, 1, data)
+        for codec in ('json', 'binary'):
+            message = Protocol.encode_frame(Protocol.REQUEST, 1, data, codec=codec, compress_level=6)
+            self.assertLess(len(message), len(plain) // 5)
+
+            left, right = socket.socketpair()
+            try:
+                left.sendall(message)
+                frame = Protocol.receive_frame_socket(right)
+            finally:
+                left.close()
+                right.close()
+
+            self.assertTrue(Protocol.frame_compressed(frame))
+            self.assertEqual(frame.data, data)
+            self.assertEqual(Protocol.frame_codec(frame), codec)
+
+    def test_threshold_and_attachments(self):
+        """Test del tamaño mínimo y de que los segmentos no se comprimen"""
+        small = Protocol.encode_frame(Protocol.REQUEST, 1, {'url': 'x'}, compress_level=6)
+        self.assertFalse(small[5] & Protocol.COMPRESSED)
+
+        # Si comprimir no achica los datos, se envían sin comprimir
+        frame = Protocol.encode_frame(Protocol.REQUEST, 1, {'n': 'abc'},
+                                      compress_level=6, compress_min_size=1)
+        self.assertFalse(frame[5] & Protocol.COMPRESSED)
+
+        data = {'html': self.HTML, 'screenshot': b'\x89PNG' + os.urandom(2048)}
+        parts = Protocol.encode_frame_parts(Protocol.RESPONSE, 3, data, compress_level=6)
+        self.assertIs(parts[1], data['screenshot'])
+        self.assertTrue(parts[0][5] & Protocol.COMPRESSED)
+        self.assertEqual(Protocol.decode(b''.join(parts)), data)
+
+    def test_invalid_compressed_data(self):
+        """Test que los datos comprimidos corruptos o enormes se rechazan"""
+        def frame(payload):
+            header = struct.pack('>IBBI', len(payload) | Protocol.EXTENDED,
+                                 Protocol.REQUEST, Protocol.COMPRESSED, 1)
+            return header + payload
+
+        with self.assertRaises(ValueError):
+            Protocol.decode(frame(b'no es zlib'))
+        with self.assertRaises(ValueError):
+            Protocol.decode(frame(zlib.compress(b'{"a": 1}')[:-3]))
+
+        # Una bomba de descompresión supera el máximo de un mensaje
+        bomb = zlib.compress(b' ' * (Protocol.MAX_MESSAGE_SIZE + 1), 9)
+        with self.assertRaises(ValueError):
+            Protocol.decode(frame(bomb))
+
+
+class TestHandshake(unittest.TestCase):
+    """Tests para el handshake de capacidades"""
+
+    def test_negotiate(self):
+        """Test que se acuerda la intersección y los mínimos"""
+        local = Protocol.local_capabilities()
+        remote = Capabilities.from_dict({
+            'version': 7, 'codecs': ['msgpack', 'binary', 'json'], 'compression': ['zstd'],
+            'max_frame_size': 1024, 'features': ['attachments', 'futura']
+        })
+        agreed = local.negotiate(remote)
+        self.assertEqual(agreed, Capabilities(1, ['json', 'binary'], [], 1024, ['attachments']))
+
+        options = agreed.encode_options('binary', compress_level=6)
+        self.assertEqual((options['codec'], options['compress_level']), ('binary', 0))
+        with self.assertRaises(ValueError):
+            Protocol.encode_frame_parts(Protocol.REQUEST, 1, {'html': 'x' * 2000}, **options)
+
+        with self.assertRaises(ValueError):
+            Capabilities.from_dict({'version': 1, 'codecs': 'json'})
+
+    def test_hello_rejected_by_older_decoders(self):
+        """Test que un HELLO no pasa por solicitud en versiones anteriores"""
+        hello = Protocol.encode_hello(Protocol.local_capabilities())
+        self.assertEqual(hello[5], Protocol.HANDSHAKE_CODEC)
+        with self.assertRaises(ValueError):
+            codec_by_id(hello[5] & Protocol.CODEC_MASK)
+        with self.assertRaises(ValueError):
+            json.loads(hello[10:])
+        self.assertEqual(Protocol.decode(hello)['version'], Protocol.VERSION)
+
+    def test_legacy_server_fallback(self):
+        """Test que un servidor original (responde error al HELLO) se usa como legacy"""
+        requests = []
+
+        async def handle(reader, writer):
+            # Comportamiento del Servidor B original: un mensaje por
+            # conexión, longitud de 4 bytes y JSON; ante cualquier error
+            # responde un error en formato simple
+            try:
+                length = struct.unpack('>I', await reader.readexactly(4))[0]
+                if length > 50 * 1024 * 1024:
+                    raise ValueError(f"Mensaje demasiado grande: {length} bytes")
+                data = json.loads((await reader.readexactly(length)).decode('utf-8'))
+                requests.append(data)
+                response = Protocol.encode({'echo': data})
+            except Exception as e:
+                response = Protocol.encode({'error': f'Processing error: {str(e)}'})
+            writer.write(response)
+            await writer.drain()
+            writer.close()
+
+        async def run_test():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            client = MultiplexedClient('127.0.0.1', port, codec='binary',
+                                       compress_level=6, handshake=True)
+            multiplexed = await client.multiplexed()
+            peer = client.peer
+            await client.close()
+
+            # Con versión 0 se habla el formato original
+            reader, writer, _ = await Protocol.open_session('127.0.0.1', port)
+            writer.write(Protocol.encode({'url': 'https://example.com'}))
+            response = await Protocol.receive(reader)
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return multiplexed, peer, response
+
+        multiplexed, peer, response = asyncio.run(run_test())
+        self.assertFalse(multiplexed)
+        self.assertEqual(peer, LEGACY_CAPABILITIES)
+        self.assertTrue(peer.legacy)
+        self.assertEqual(response, {'echo': {'url': 'https://example.com'}})
+        self.assertEqual(requests, [{'url': 'https://example.com'}])
+
+
+class TestZeroCopyReceive(unittest.TestCase):
+    """Tests para la recepción sin copias"""
+
+    def test_socket_receive_into_buffer(self):
+        """Test que el receptor síncrono arma el mensaje en un único buffer"""
+        screenshot = os.urandom(3 * 1024 * 1024)
+        parts = Protocol.encode_frame_parts(Protocol.RESPONSE, 1, {'screenshot': screenshot})
+        left, right = socket.socketpair()
+        try:
+            sender = threading.Thread(target=Protocol.send_parts, args=(left, parts))
+            sender.start()
+            frame = Protocol.receive_frame_socket(right)
+            sender.join()
+        finally:
+            left.close()
+            right.close()
+
+        # El segmento es una vista sobre el buffer recibido
+        self.assertIsInstance(frame.data['screenshot'], memoryview)
+        self.assertIsInstance(frame.data['screenshot'].obj, bytearray)
+        self.assertEqual(frame.data['screenshot'], screenshot)
+
+    def test_buffered_stream_reader(self):
+        """Test del reader asíncrono: mensajes grandes, chicos y EOF"""
+        screenshot = os.urandom(5 * 1024 * 1024)
+
+        async def handle(reader, writer):
+            writer.writelines(Protocol.encode_frame_parts(
+                Protocol.PART, 1, {'part': 'screenshot', 'data': screenshot}
+            ))
+            for n in range(50):
+                writer.write(Protocol.encode_frame(Protocol.PART, 2, {'n': n}))
+            writer.write(Protocol.encode_frame(Protocol.DONE, 2, {})[:-1])
+            await writer.drain()
+            writer.close()
+
+        async def run_test():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await Protocol.open_connection('127.0.0.1', port)
+            try:
+                # Dejar que lleguen datos antes de leer
+                await asyncio.sleep(0.05)
+                big = await Protocol.receive_frame(reader)
+                small = [await Protocol.receive_frame(reader) for _ in range(50)]
+                with self.assertRaises(asyncio.IncompleteReadError):
+                    await Protocol.receive_frame(reader)
+                return big, small, reader.at_eof()
+            finally:
+                writer.close()
+                await writer.wait_closed()
+                server.close()
+                await server.wait_closed()
+
+        big, small, at_eof = asyncio.run(run_test())
+        self.assertEqual(big.data['data'], screenshot)
+        self.assertEqual([frame.data['n'] for frame in small], list(range(50)))
+        self.assertTrue(at_eof)
+
+
+class TestMultiplexedClient(unittest.TestCase):
+    """Tests para el cliente multiplexado"""
+
+    async def start_server(self, handle):
+        """Servidor de prueba en un puerto libre"""
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        return server, server.sockets[0].getsockname()[1]
+
+    def test_out_of_order_responses(self):
+        """Test que las respuestas se emparejan aunque lleguen en otro orden"""
+        async def handle(reader, writer):
+            # Recibir tres solicitudes y responderlas en orden inverso
+            frames = [await Protocol.receive_frame(reader) for _ in range(3)]
+            for frame in reversed(frames):
+                writer.write(Protocol.encode_frame(
+                    Protocol.RESPONSE, frame.request_id, {'echo': frame.data['n']}
+                ))
+            await writer.drain()
+            writer.close()
+
+        async def run_test():
+            server, port = await self.start_server(handle)
+            client = MultiplexedClient('127.0.0.1', port)
+            results = await asyncio.gather(*[client.request({'n': n}) for n in range(3)])
+            stats = client.stats()
+            await client.close()
+            server.close()
+            await server.wait_closed()
+            return results, stats
+
+        results, stats = asyncio.run(run_test())
+        self.assertEqual(results, [{'echo': 0}, {'echo': 1}, {'echo': 2}])
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_stream_ends_with_done(self):
+        """Test que un stream entrega las partes y termina con DONE"""
+        async def handle(reader, writer):
+            frame = await Protocol.receive_frame(reader)
+            writer.write(Protocol.encode_frame(Protocol.PART, frame.request_id, {'part': 'a'}))
+            writer.write(Protocol.encode_frame(Protocol.DONE, frame.request_id, {'done': True}))
+            await writer.drain()
+
+        async def run_test():
+            server, port = await self.start_server(handle)
+            client = MultiplexedClient('127.0.0.1', port)
+            frames = [frame async for frame in client.stream({})]
+            await client.close()
+            server.close()
+            await server.wait_closed()
+            return frames
+
+        frames = asyncio.run(run_test())
+        self.assertEqual([frame.type for frame in frames], [Protocol.PART, Protocol.DONE])
+
+    def test_binary_codec_echoed(self):
+        """Test que el servidor responde con el códec de la solicitud"""
+        async def handle(reader, writer):
+            frame = await Protocol.receive_frame(reader)
+            writer.write(Protocol.encode_frame(
+                Protocol.RESPONSE, frame.request_id,
+                {'codec': Protocol.frame_codec(frame), 'echo': frame.data},
+                codec=Protocol.frame_codec(frame)
+            ))
+            await writer.drain()
+
+        async def run_test():
+            server, port = await self.start_server(handle)
+            client = MultiplexedClient('127.0.0.1', port, codec='binary')
+            result = await client.request({'html': 'ñ' * 1000})
+            await client.close()
+            server.close()
+            await server.wait_closed()
+            return result
+
+        result = asyncio.run(run_test())
+        self.assertEqual(result, {'codec': 'binary', 'echo': {'html': 'ñ' * 1000}})
+
+    def test_compressed_request(self):
+        """Test que las solicitudes grandes viajan comprimidas y offload no cambia el resultado"""
+        async def handle(reader, writer):
+            for _ in range(2):
+                frame = await Protocol.receive_frame(reader)
+                writer.write(Protocol.encode_frame(
+                    Protocol.RESPONSE, frame.request_id,
+                    {'compressed': Protocol.frame_compressed(frame), 'size': len(frame.data['html'])}
+                ))
+            await writer.drain()
+
+        async def run_test():
+            server, port = await self.start_server(handle)
+            client = MultiplexedClient('127.0.0.1', port, compress_level=6)
+            results = [
+                await client.request({'html': '<p>x</p>' * 5000}),
+                [frame.data async for frame in client.stream({'html': '<p>'}, offload=True)][0]
+            ]
+            await client.close()
+            server.close()
+            await server.wait_closed()
+            return results
+
+        results = asyncio.run(run_test())
+        self.assertEqual(results, [
+            {'compressed': True, 'size': 40000},
+            {'compressed': False, 'size': 3}
+        ])
+
+    def test_connection_loss_fails_pending(self):
+        """Test que perder la conexión hace fallar las solicitudes en curso"""
+        async def handle(reader, writer):
+            await Protocol.receive_frame(reader)
+            writer.close()
+
+        async def run_test():
+            server, port = await self.start_server(handle)
+            client = MultiplexedClient('127.0.0.1', port)
+            try:
+                with self.assertRaises(ConnectionError):
+                    await asyncio.wait_for(client.request({}), timeout=2)
+            finally:
+                await client.close()
+                server.close()
+                await server.wait_closed()
+            return client.stats()
+
+        self.assertEqual(asyncio.run(run_test())['in_flight'], 0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
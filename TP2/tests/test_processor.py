@@ -16,6 +16,8 @@ from processor.screenshot import ScreenshotGenerator
 from processor.performance import PerformanceAnalyzer
 from processor.image_processor import ImageProcessor
 import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
 
 class TestScreenshotGenerator(unittest.TestCase):
@@ -350,6 +352,249 @@ class TestProcessorIntegration(unittest.TestCase):
         self.assertIsInstance(result, list)
 
 
+class TestProcessingServer(unittest.TestCase):
+    """Tests para el despacho de tareas del servidor de procesamiento"""
+    
+    def setUp(self):
+        """Crear servidor con un pool de threads en lugar de procesos"""
+        import server_processing
+        self.module = server_processing
+        self.server = server_processing.ProcessingServer(
+            ('127.0.0.1', 0), server_processing.ProcessingHandler, 1
+        )
+        self.server.executor.shutdown()
+        self.server.executor = ThreadPoolExecutor(max_workers=3)
+    
+    def tearDown(self):
+        """Cerrar servidor"""
+        self.server.executor.shutdown()
+        self.server.server_close()
+    
+    def test_stream_yields_in_completion_order(self):
+        """Test que cada resultado se entrega apenas termina su tarea"""
+        def slow_screenshot(url):
+            time.sleep(0.2)
+            return 'png'
+        
+        with mock.patch.object(self.module, 'generate_screenshot', slow_screenshot), \
+             mock.patch.object(self.module, 'analyze_performance', lambda url, html: {'num_requests': 1}), \
+             mock.patch.object(self.module, 'process_images', lambda url, html: ['thumb']):
+            parts = list(self.server.process_request_stream({'url': 'https://example.com'}))
+        
+        self.assertEqual(parts[-1], ('screenshot', 'png'))
+        self.assertEqual(
+            dict(parts),
+            {'screenshot': 'png', 'performance': {'num_requests': 1}, 'thumbnails': ['thumb']}
+        )
+    
+    def test_failed_task_uses_default(self):
+        """Test que una tarea que falla devuelve su valor por defecto"""
+        def broken(*args):
+            raise RuntimeError('fallo')
+        
+        with mock.patch.object(self.module, 'generate_screenshot', broken), \
+             mock.patch.object(self.module, 'analyze_performance', broken), \
+             mock.patch.object(self.module, 'process_images', broken):
+            result = self.server.process_request_data({'url': 'https://example.com'})
+        
+        self.assertEqual(result, {'screenshot': None, 'performance': None, 'thumbnails': []})
+    
+    def test_html_not_parsed_in_handler_thread(self):
+        """Test que el HTML se entrega a los workers sin parsearlo en el thread de la conexión"""
+        html = '<html><body><img src="/a.png"><script src="/b.js"></script></body></html>'
+        received = {}
+        
+        def fake_performance(url, html):
+            received['performance'] = html
+            return {}
+        
+        def fake_images(url, html):
+            received['thumbnails'] = html
+            return []
+        
+        with mock.patch.object(self.module, 'ParsedDocument', side_effect=AssertionError('parseo en el handler')), \
+             mock.patch.object(self.module, 'generate_screenshot', lambda url: None), \
+             mock.patch.object(self.module, 'analyze_performance', fake_performance), \
+             mock.patch.object(self.module, 'process_images', fake_images):
+            result = self.server.process_request_data({'url': 'https://example.com', 'html': html})
+        
+        self.assertEqual(result, {'screenshot': None, 'performance': {}, 'thumbnails': []})
+        self.assertEqual(received, {'performance': html, 'thumbnails': html})
+
+    
+    def test_persistent_connection_serves_several_requests(self):
+        """Test que el servidor atiende varias solicitudes por conexión"""
+        import asyncio
+        import threading
+        from server_scraping import ScrapingServer
+        
+        port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        
+        async def run_test():
+            client = ScrapingServer(
+                '127.0.0.1', 0, 1, processing_host='127.0.0.1', processing_port=port,
+                parse_executor='inline'
+            )
+            results = []
+            for _ in range(3):
+                results.append(await client.request_processing(
+                    'https://example.com', '<html></html>'
+                ))
+            stats = client.processing_pool.stats()
+            await client.processing_pool.close()
+            await client.http_client.close()
+            return results, stats
+        
+        try:
+            with mock.patch.object(self.module, 'generate_screenshot', lambda url: 'png'), \
+                 mock.patch.object(self.module, 'analyze_performance', lambda url, html: {}), \
+                 mock.patch.object(self.module, 'process_images', lambda url, html: []):
+                results, stats = asyncio.run(run_test())
+        finally:
+            self.server.shutdown()
+        
+        self.assertEqual(results[-1], {'screenshot': 'png', 'performance': {}, 'thumbnails': []})
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 2)
+
+    
+    def test_multiplexed_requests_answer_as_they_finish(self):
+        """Test que las solicitudes con request id se responden al terminar"""
+        import socket
+        import threading
+        from common.protocol import Protocol
+        
+        def process_request_data(data):
+            time.sleep(data['delay'])
+            return {'n': data['n']}
+        
+        self.server.process_request_data = process_request_data
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        
+        sock = socket.create_connection(self.server.server_address)
+        try:
+            sock.sendall(Protocol.encode_frame(Protocol.REQUEST, 1, {'n': 1, 'delay': 0.3}))
+            sock.sendall(Protocol.encode_frame(Protocol.REQUEST, 2, {'n': 2, 'delay': 0}))
+            first = Protocol.receive_frame_socket(sock)
+            second = Protocol.receive_frame_socket(sock)
+        finally:
+            sock.close()
+            self.server.shutdown()
+        
+        self.assertEqual((first.request_id, first.data), (2, {'n': 2}))
+        self.assertEqual((second.request_id, second.data), (1, {'n': 1}))
+        self.assertEqual(first.type, Protocol.RESPONSE)
+
+    
+    def test_handshake_limits_responses(self):
+        """Test que el servidor responde el HELLO y respeta lo acordado"""
+        import asyncio
+        import threading
+        from common.protocol import Protocol, MultiplexedClient, Capabilities
+        
+        self.server.process_request_data = lambda data: {'html': data['html'], 'screenshot': b'png'}
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        
+        # Cliente que solo acepta JSON sin comprimir aunque pida binario y
+        # zlib, y que no acepta segmentos binarios
+        capabilities = Capabilities(1, ['json'], [], Protocol.MAX_MESSAGE_SIZE, ['multiplex'])
+        
+        async def run_test():
+            client = MultiplexedClient(
+                *self.server.server_address, codec='binary', compress_level=6,
+                handshake=True, capabilities=capabilities
+            )
+            frames = [frame async for frame in client.stream({'html': '<p>x</p>' * 1000})]
+            stats = client.stats()
+            await client.close()
+            return frames, stats
+        
+        try:
+            frames, stats = asyncio.run(run_test())
+        finally:
+            self.server.shutdown()
+        
+        self.assertEqual(frames[-1].data, {
+            'html': '<p>x</p>' * 1000, 'screenshot': base64.b64encode(b'png').decode()
+        })
+        self.assertEqual(Protocol.frame_codec(frames[-1]), 'json')
+        self.assertFalse(Protocol.frame_compressed(frames[-1]))
+        self.assertFalse(frames[-1].flags & Protocol.ATTACHMENTS)
+        self.assertEqual(stats['peer'], {
+            'version': 1, 'codecs': ['json'], 'compression': [],
+            'max_frame_size': Protocol.MAX_MESSAGE_SIZE, 'features': ['multiplex']
+        })
+
+    
+    def test_scraping_server_with_original_processing_server(self):
+        """Test que un Servidor A nuevo funciona con el Servidor B original"""
+        import asyncio
+        import json
+        import socketserver
+        import struct
+        import threading
+        from common.protocol import Protocol
+        from server_scraping import ScrapingServer
+        
+        received = []
+        
+        class OriginalHandler(socketserver.BaseRequestHandler):
+            """handle() del Servidor B original: un mensaje simple por conexión"""
+            
+            def handle(self):
+                try:
+                    length = struct.unpack('>I', Protocol._recv_exact(self.request, 4))[0]
+                    if length > 50 * 1024 * 1024:
+                        raise ValueError(f"Mensaje demasiado grande: {length} bytes")
+                    data = json.loads(bytes(Protocol._recv_exact(self.request, length)).decode('utf-8'))
+                    received.append(data)
+                    self.request.sendall(Protocol.encode({
+                        'screenshot': 'cG5n', 'performance': {}, 'thumbnails': []
+                    }))
+                except Exception as e:
+                    self.request.sendall(Protocol.encode({
+                        'error': f'Processing error: {str(e)}',
+                        'screenshot': None,
+                        'performance': None,
+                        'thumbnails': []
+                    }))
+        
+        original = socketserver.ThreadingTCPServer(('127.0.0.1', 0), OriginalHandler)
+        original.daemon_threads = True
+        thread = threading.Thread(target=original.serve_forever, daemon=True)
+        thread.start()
+        port = original.server_address[1]
+        
+        async def run_test(multiplex):
+            client = ScrapingServer(
+                '127.0.0.1', 0, 1, processing_host='127.0.0.1', processing_port=port,
+                parse_executor='inline', processing_multiplex=multiplex
+            )
+            results = [
+                await client.request_processing('https://example.com', '<html></html>')
+                for _ in range(2)
+            ]
+            await client.processing_pool.close()
+            if client.processing_mux is not None:
+                await client.processing_mux.close()
+            await client.http_client.close()
+            return results
+        
+        try:
+            results = asyncio.run(run_test(False)) + asyncio.run(run_test(True))
+        finally:
+            original.shutdown()
+            original.server_close()
+        
+        for result in results:
+            self.assertEqual(result, {'screenshot': 'cG5n', 'performance': {}, 'thumbnails': []})
+        self.assertEqual(received, [{'url': 'https://example.com', 'html': '<html></html>'}] * 4)
+
+
 def run_tests():
     """Ejecutar todos los tests"""
     # Crear suite de tests
@@ -361,6 +606,7 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestPerformanceAnalyzer))
     suite.addTests(loader.loadTestsFromTestCase(TestImageProcessor))
     suite.addTests(loader.loadTestsFromTestCase(TestProcessorIntegration))
+    suite.addTests(loader.loadTestsFromTestCase(TestProcessingServer))
     
     # Ejecutar
     runner = unittest.TextTestRunner(verbosity=2)
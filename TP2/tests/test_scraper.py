@@ -10,9 +10,28 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 import unittest
 import asyncio
+import json
+import tempfile
 from scraper.html_parser import HTMLParser
 from scraper.metadata_extractor import MetadataExtractor
-from scraper.async_http import AsyncHTTPClient
+from scraper.async_http import AsyncHTTPClient, ResponseTooLarge, UnsupportedContentType
+from scraper.head_parser import HeadParser
+from scraper.extraction import extract_page_data
+from scraper.loop_monitor import LoopLagMonitor
+from scraper.cache import ResponseCache
+from scraper.compression import ResponseCompressor, negotiate
+from scraper.singleflight import SingleFlight
+from scraper.url_utils import normalize_url
+from scraper.jobs import JobManager, JobTableFull
+from scraper.processing_pool import ProcessingConnectionPool
+from scraper.prefork import WorkerRegistry, aggregate_stats, create_listening_socket
+from scraper.metrics import MetricsRegistry, merge_snapshots, render_snapshot
+from scraper.admission import AdmissionController, AdmissionRejected
+from scraper.host_scheduler import HostScheduler, parse_retry_after
+from scraper.crawler import BloomFilter, Crawler
+from scraper.frontier import DiskFrontier
+from scraper.robots import RobotsCache, RobotsRules
+from common.protocol import Protocol
 
 
 class TestHTMLParser(unittest.TestCase):
@@ -240,6 +259,175 @@ class TestAsyncHTTPClient(unittest.TestCase):
         asyncio.run(run_test())
 
 
+class TestBoundedDownloads(unittest.TestCase):
+    """Tests de los límites de tamaño y Content-Type de las descargas"""
+    
+    def run_with_server(self, test):
+        """Ejecuta test(client, base_url) contra un servidor HTTP local"""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+        
+        self.streamed = 0
+        
+        async def stream(request):
+            # Sin Content-Length: 50MB en bloques hasta que el cliente corte
+            response = web.StreamResponse(headers={'Content-Type': 'text/html'})
+            await response.prepare(request)
+            chunk = b'x' * 65536
+            try:
+                for _ in range(800):
+                    await response.write(chunk)
+                    self.streamed += len(chunk)
+            except (ConnectionError, RuntimeError):
+                pass
+            return response
+        
+        async def sized(request):
+            return web.Response(body=b'x' * 300000, content_type='text/html')
+        
+        async def pdf(request):
+            return web.Response(body=b'%PDF-1.4', content_type='application/pdf')
+        
+        async def latin1(request):
+            return web.Response(
+                body='<title>Año</title>'.encode('latin-1'),
+                headers={'Content-Type': 'text/html; charset=latin-1'}
+            )
+        
+        app = web.Application()
+        app.router.add_get('/stream', stream)
+        app.router.add_get('/sized', sized)
+        app.router.add_get('/file.pdf', pdf)
+        app.router.add_get('/latin1', latin1)
+        
+        async def run_test():
+            server = TestServer(app)
+            await server.start_server()
+            client = AsyncHTTPClient(max_concurrent=5, timeout=30)
+            try:
+                return await test(client, str(server.make_url('/')))
+            finally:
+                await client.close()
+                await server.close()
+        
+        return asyncio.run(run_test())
+    
+    def test_stream_aborted_at_limit(self):
+        """Test que un cuerpo sin Content-Length se corta al pasar el límite"""
+        async def test(client, base):
+            with self.assertRaises(ResponseTooLarge):
+                await client.fetch_page(base + 'stream', max_bytes=1024 * 1024)
+            page = await client.fetch_page(base + 'stream', max_bytes=1000, truncate=True)
+            return page['content']
+        
+        content = self.run_with_server(test)
+        self.assertEqual(content, 'x' * 1000)
+        self.assertLess(self.streamed, 50 * 1024 * 1024)
+    
+    def test_content_length_and_type_checked_first(self):
+        """Test que Content-Length y Content-Type se validan sin leer el cuerpo"""
+        async def test(client, base):
+            with self.assertRaises(ResponseTooLarge):
+                await client.fetch_page(base + 'sized', max_bytes=100000)
+            with self.assertRaises(UnsupportedContentType):
+                await client.fetch(base + 'file.pdf')
+            binary = await client.fetch_binary(base + 'file.pdf')
+            page = await client.fetch_page(base + 'sized')
+            return binary, page
+        
+        binary, page = self.run_with_server(test)
+        self.assertEqual(binary, b'%PDF-1.4')
+        self.assertEqual(len(page['content']), 300000)
+    
+    def test_charset_from_headers(self):
+        """Test que el cuerpo se decodifica con el charset de la respuesta"""
+        async def test(client, base):
+            return await client.fetch(base + 'latin1')
+        
+        self.assertEqual(self.run_with_server(test), '<title>Año</title>')
+
+
+class TestHeadParser(unittest.TestCase):
+    """Tests del parseo incremental del <head>"""
+    
+    HEAD = (
+        b'<!DOCTYPE html><html lang="es"><head>'
+        b'<meta charset="utf-8"><title> P\xc3\xa1gina </title>'
+        b'<meta name="description" content="Descripci\xc3\xb3n">'
+        b'<meta property="og:title" content="OG">'
+        b'<meta name="generator" content="ignorado">'
+        b'<link rel="canonical" href="https://example.com/a">'
+        b'</head>'
+    )
+    
+    def test_matches_full_extractors(self):
+        """Test que los resultados coinciden con los extractores completos"""
+        html = self.HEAD + b'<body><p>x</p></body></html>'
+        parser = HeadParser('utf-8')
+        for i in range(0, len(html), 7):
+            if parser.feed(html[i:i + 7]):
+                break
+        parser.close()
+        
+        content = html.decode('utf-8')
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.title, HTMLParser(content).get_title())
+        self.assertEqual(parser.meta_tags(), MetadataExtractor.extract_meta_tags(content))
+        self.assertEqual(parser.language(), 'es')
+        self.assertLess(parser.bytes_fed, len(html))
+    
+    def test_truncated_document(self):
+        """Test que un documento sin </head> se resuelve al cerrar"""
+        parser = HeadParser()
+        self.assertFalse(parser.feed(b'<html><head><title>Corto</title>'))
+        parser.close()
+        self.assertEqual(parser.title, 'Corto')
+        self.assertEqual(parser.meta_tags(), {})
+        self.assertIsNone(parser.language())
+    
+    def test_fetch_head_cancels_download(self):
+        """Test que fetch_head corta la descarga al terminar el head"""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+        
+        streamed = []
+        head = self.HEAD
+        
+        async def huge(request):
+            # Head y luego 50MB de cuerpo sin Content-Length
+            response = web.StreamResponse(headers={'Content-Type': 'text/html'})
+            await response.prepare(request)
+            await response.write(head + b'<body>')
+            chunk = b'<p>x</p>' * 8192
+            try:
+                for _ in range(800):
+                    await response.write(chunk)
+                    streamed.append(len(chunk))
+            except (ConnectionError, RuntimeError):
+                pass
+            return response
+        
+        app = web.Application()
+        app.router.add_get('/huge', huge)
+        
+        async def run_test():
+            server = TestServer(app)
+            await server.start_server()
+            client = AsyncHTTPClient(max_concurrent=5, timeout=30)
+            try:
+                return await client.fetch_head(str(server.make_url('/huge')))
+            finally:
+                await client.close()
+                await server.close()
+        
+        result = asyncio.run(run_test())
+        self.assertEqual(result['title'], 'Página')
+        self.assertEqual(result['meta_tags']['canonical'], 'https://example.com/a')
+        self.assertFalse(result['complete'])
+        self.assertLess(result['bytes_read'], 10 * 1024 * 1024)
+        self.assertLess(sum(streamed), 50 * 1024 * 1024)
+
+
 class TestHTMLParserEdgeCases(unittest.TestCase):
     """Tests de casos límite para el HTMLParser"""
     
@@ -301,6 +489,1472 @@ class TestHTMLParserEdgeCases(unittest.TestCase):
         self.assertEqual(len(links), 1)
 
 
+class TestExtraction(unittest.TestCase):
+    """Tests para la extracción ejecutada en el pool de parsing"""
+    
+    def test_extract_page_data(self):
+        """Test de extracción completa en una sola pasada"""
+        html = """
+        <html>
+        <head><title>Página</title><meta name="description" content="Desc"></head>
+        <body><h1>A</h1><a href="/x">X</a><img src="/foto.jpg"></body>
+        </html>
+        """
+        data = extract_page_data(html, "https://example.com/")
+        
+        self.assertEqual(data['scraping_data']['title'], "Página")
+        self.assertEqual(data['scraping_data']['links'], ["https://example.com/x"])
+        self.assertEqual(data['scraping_data']['meta_tags'], {'description': "Desc"})
+        self.assertEqual(data['scraping_data']['structure'], {'h1': 1})
+        self.assertEqual(data['scraping_data']['images_count'], 1)
+        self.assertEqual(set(data['timings']), {'parse', 'metadata'})
+
+
+class TestLoopLagMonitor(unittest.TestCase):
+    """Tests para el monitor de lag del event loop"""
+    
+    def test_record(self):
+        """Test de registro de muestras"""
+        monitor = LoopLagMonitor()
+        monitor.record(0.010)
+        monitor.record(0.050)
+        monitor.record(-0.001)
+        
+        stats = monitor.stats()
+        self.assertEqual(stats['samples'], 3)
+        self.assertEqual(stats['max_ms'], 50.0)
+        self.assertEqual(stats['last_ms'], 0.0)
+    
+    def test_detects_blocking(self):
+        """Test que un bloqueo del loop se refleja en el lag"""
+        import time
+        
+        async def run_test():
+            monitor = LoopLagMonitor(interval=0.01)
+            monitor.start()
+            await asyncio.sleep(0.02)
+            time.sleep(0.1)  # Bloquear el loop
+            await asyncio.sleep(0.02)
+            await monitor.stop()
+            return monitor.stats()
+        
+        stats = asyncio.run(run_test())
+        self.assertGreaterEqual(stats['max_ms'], 50)
+
+
+class FakeClock:
+    """Reloj manual para tests de expiración"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+    """Tests para la caché de resultados"""
+    
+    def setUp(self):
+        """Configurar caché con reloj manual"""
+        self.clock = FakeClock()
+        self.cache = ResponseCache(max_entries=2, max_bytes=1000, ttl=10, clock=self.clock)
+    
+    def test_hit_and_miss(self):
+        """Test de acierto y fallo"""
+        self.assertEqual(self.cache.lookup('a'), (None, False))
+        self.cache.put('a', {'title': 'A'})
+        
+        entry, fresh = self.cache.lookup('a')
+        self.assertTrue(fresh)
+        self.assertEqual(entry.value, {'title': 'A'})
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+    
+    def test_ttl_and_revalidation(self):
+        """Test de expiración y renovación tras un 304"""
+        self.cache.put('a', {'title': 'A'}, etag='"v1"')
+        self.clock.now = 11
+        
+        entry, fresh = self.cache.lookup('a')
+        self.assertFalse(fresh)
+        self.assertTrue(entry.has_validators())
+        
+        self.cache.refresh('a')
+        _, fresh = self.cache.lookup('a')
+        self.assertTrue(fresh)
+        self.assertEqual(self.cache.stats()['revalidated'], 1)
+    
+    def test_lru_eviction_by_count(self):
+        """Test de desalojo LRU por cantidad de entradas"""
+        self.cache.put('a', 'A')
+        self.cache.put('b', 'B')
+        self.cache.lookup('a')  # 'a' pasa a ser la más reciente
+        self.cache.put('c', 'C')
+        
+        self.assertIsNone(self.cache.lookup('b')[0])
+        self.assertIsNotNone(self.cache.lookup('a')[0])
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+    
+    def test_eviction_by_bytes(self):
+        """Test de desalojo por tamaño total"""
+        self.cache.put('a', 'x' * 600)
+        self.cache.put('b', 'y' * 600)
+        
+        self.assertEqual(len(self.cache), 1)
+        self.assertLessEqual(self.cache.current_bytes, 1000)
+        
+        # Una entrada más grande que la caché no se guarda
+        self.cache.put('c', 'z' * 2000)
+        self.assertIsNone(self.cache.lookup('c')[0])
+
+
+class TestCompression(unittest.TestCase):
+    """Tests de la compresión de respuestas"""
+    
+    def test_negotiate(self):
+        """Test de la negociación de Accept-Encoding con valores q"""
+        available = ['gzip', 'deflate']
+        self.assertEqual(negotiate('gzip, deflate', available), 'gzip')
+        self.assertEqual(negotiate('deflate;q=1, gzip;q=0.5', available), 'deflate')
+        self.assertEqual(negotiate('gzip;q=0, *', available), 'deflate')
+        self.assertEqual(negotiate('br', available), None)
+        self.assertEqual(negotiate('identity', available), None)
+        self.assertEqual(negotiate(None, available), None)
+    
+    def test_compress_inline_and_offloaded(self):
+        """Test que los cuerpos grandes se comprimen en el executor"""
+        import gzip
+        import zlib
+        from concurrent.futures import ThreadPoolExecutor
+        
+        executor = ThreadPoolExecutor(max_workers=1)
+        compressor = ResponseCompressor(level=6, offload_size=1000, executor=executor)
+        small = b'{"a": 1}' * 10
+        large = b'{"html": "<p>texto</p>"}' * 5000
+        
+        async def run_test():
+            return (
+                await compressor.compress(small, 'deflate'),
+                await compressor.compress(large, 'gzip')
+            )
+        
+        try:
+            (small_body, _), (large_body, cpu) = asyncio.run(run_test())
+        finally:
+            executor.shutdown()
+        
+        self.assertEqual(zlib.decompress(small_body), small)
+        self.assertEqual(gzip.decompress(large_body), large)
+        self.assertLess(len(large_body), len(large) // 10)
+        self.assertGreaterEqual(cpu, 0)
+        
+        self.assertFalse(compressor.eligible(b'x' * 10))
+        with self.assertRaises(ValueError):
+            ResponseCompressor(codecs=['zstd'])
+    
+    def test_server_compresses_responses(self):
+        """Test que el servidor comprime según Accept-Encoding y lo mide"""
+        from aiohttp.test_utils import TestClient, TestServer
+        from server_scraping import ScrapingServer
+        
+        async def run_test():
+            server = ScrapingServer(
+                '127.0.0.1', 0, 4, parse_executor='inline', cache_ttl=0,
+                compression_min_bytes=100
+            )
+            client = TestClient(TestServer(server.app))
+            await client.start_server()
+            try:
+                gzipped = await client.get('/stats', headers={'Accept-Encoding': 'gzip'})
+                stats = await gzipped.json()
+                plain = await client.get('/stats', headers={'Accept-Encoding': 'identity'})
+                small = await client.get('/health', headers={'Accept-Encoding': 'gzip'})
+                metrics = await client.get('/metrics', headers={'Accept-Encoding': 'identity'})
+                return gzipped.headers, stats, plain.headers, small.headers, await metrics.text()
+            finally:
+                await client.close()
+                await server.http_client.close()
+                server.compression_executor.shutdown()
+        
+        gzipped, stats, plain, small, text = asyncio.run(run_test())
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzipped['Vary'], 'Accept-Encoding')
+        self.assertIn('http_client', stats)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertNotIn('Content-Encoding', small)
+        self.assertIn('scraper_response_compression_total{encoding="gzip"} 1', text)
+        self.assertIn('scraper_response_compression_total{encoding="identity"} 1', text)
+        self.assertIn('scraper_response_compression_saved_bytes_total{encoding="gzip"}', text)
+        self.assertIn('scraper_response_compression_cpu_seconds_total{encoding="gzip"}', text)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests para la deduplicación de requests concurrentes"""
+    
+    def test_concurrent_calls_share_work(self):
+        """Test que llamadas concurrentes ejecutan el trabajo una sola vez"""
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'resultado'
+        
+        async def run_test():
+            flight = SingleFlight()
+            results = await asyncio.gather(*[flight.do('k', work) for _ in range(10)])
+            return flight, results
+        
+        flight, results = asyncio.run(run_test())
+        self.assertEqual(results, ['resultado'] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats(), {'in_flight': 0, 'leaders': 1, 'coalesced': 9})
+    
+    def test_cancelled_waiter_does_not_cancel_work(self):
+        """Test que cancelar un cliente no cancela el trabajo compartido"""
+        async def work():
+            await asyncio.sleep(0.05)
+            return 'ok'
+        
+        async def run_test():
+            flight = SingleFlight()
+            first = asyncio.ensure_future(flight.do('k', work))
+            second = asyncio.ensure_future(flight.do('k', work))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+        
+        self.assertEqual(asyncio.run(run_test()), 'ok')
+    
+    def test_errors_are_shared(self):
+        """Test que los errores se propagan a todos los que esperan"""
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError('fallo')
+        
+        async def run_test():
+            flight = SingleFlight()
+            return await asyncio.gather(
+                flight.do('k', work), flight.do('k', work), return_exceptions=True
+            )
+        
+        results = asyncio.run(run_test())
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+
+class TestNormalizeURL(unittest.TestCase):
+    """Tests para la normalización de URLs"""
+    
+    def test_normalize_url(self):
+        """Test de normalización de esquema, dominio, puerto y fragmento"""
+        self.assertEqual(normalize_url("HTTP://Example.COM:80"), "http://example.com/")
+        self.assertEqual(
+            normalize_url("https://example.com:8443/a?b=1#frag"),
+            "https://example.com:8443/a?b=1"
+        )
+        self.assertEqual(normalize_url("http://[::1]:8000/x"), "http://[::1]:8000/x")
+
+
+class TestScrapeMany(unittest.TestCase):
+    """Tests para el scraping por lotes del servidor"""
+    
+    def test_results_in_completion_order(self):
+        """Test que los resultados salen en orden de finalización con su índice"""
+        from server_scraping import ScrapingServer
+        
+        async def fake_scrape(url):
+            await asyncio.sleep(0.05 if url.endswith('/lenta') else 0)
+            return {'url': url, 'status': 'success'}
+        
+        async def run_test():
+            server = ScrapingServer('127.0.0.1', 0, 4, parse_executor='inline', cache_ttl=0)
+            server.scrape = fake_scrape
+            urls = ['https://example.com/lenta', 'https://example.com/rapida', 'invalida']
+            records = [r async for r in server.scrape_many(urls, concurrency=3)]
+            await server.http_client.close()
+            return records
+        
+        records = asyncio.run(run_test())
+        self.assertEqual([index for index, _ in records][-1], 0)
+        self.assertEqual(sorted(index for index, _ in records), [0, 1, 2])
+        by_index = dict(records)
+        self.assertEqual(by_index[2]['status'], 'error')
+        self.assertEqual(by_index[1]['status'], 'success')
+
+
+class TestScrapePipeline(unittest.TestCase):
+    """Tests para el pipeline de scraping de una URL"""
+    
+    def make_server(self, parse_delay, processing_delay, parse_error=None):
+        """Servidor con descarga, parsing y procesamiento simulados"""
+        from server_scraping import ScrapingServer
+        
+        server = ScrapingServer('127.0.0.1', 0, 4, parse_executor='inline', cache_ttl=0)
+        
+        async def fetch_page(url, etag=None, last_modified=None):
+            return {'status': 200, 'content': '<html></html>', 'etag': None, 'last_modified': None}
+        
+        async def parse_page(html_content, url):
+            await asyncio.sleep(parse_delay)
+            if parse_error:
+                raise parse_error
+            return {'scraping_data': {'title': 'T'}}
+        
+        async def request_processing_stream(url, html_content):
+            await asyncio.sleep(processing_delay)
+            yield 'performance', {'load_time_ms': 1}
+        
+        server.http_client.fetch_page = fetch_page
+        server.parse_page = parse_page
+        server.request_processing_stream = request_processing_stream
+        return server
+    
+    def test_parse_overlaps_processing(self):
+        """Test que la latencia total es max(parse, processing) y no la suma"""
+        async def run_test():
+            server = self.make_server(parse_delay=0.2, processing_delay=0.2)
+            events = [event async for event in server.scrape_events('https://example.com')]
+            await server.http_client.close()
+            return events
+        
+        events = asyncio.run(run_test())
+        result = events[-1][1]
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['scraping_data'], {'title': 'T'})
+        self.assertEqual(result['processing_data'], {'performance': {'load_time_ms': 1}})
+        self.assertGreaterEqual(result['timings']['parse_ms'], 200)
+        self.assertGreaterEqual(result['timings']['processing_ms'], 200)
+        self.assertLess(result['timings']['total_ms'], 350)
+    
+    def test_events_in_completion_order(self):
+        """Test que los resultados del Servidor B pueden llegar antes que el parsing"""
+        async def run_test():
+            server = self.make_server(parse_delay=0.1, processing_delay=0)
+            events = [event async for event, _ in server.scrape_events('https://example.com')]
+            await server.http_client.close()
+            return events
+        
+        self.assertEqual(asyncio.run(run_test()), ['performance', 'scraping_data', 'result'])
+    
+    def test_parse_error_cancels_processing(self):
+        """Test que un error de parsing cancela el procesamiento en curso"""
+        async def run_test():
+            server = self.make_server(
+                parse_delay=0, processing_delay=1, parse_error=ValueError('HTML inválido')
+            )
+            events = [event async for event in server.scrape_events('https://example.com')]
+            await server.http_client.close()
+            return events
+        
+        events = asyncio.run(run_test())
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][1]['status'], 'error')
+        self.assertEqual(events[0][1]['message'], 'HTML inválido')
+    
+    def test_images_encoded_at_edge(self):
+        """Test que las imágenes crudas se codifican en base64 solo al responder"""
+        import base64
+        from aiohttp.test_utils import TestClient, TestServer
+        
+        png = b'\x89PNG\r\n\x1a\n' + bytes(range(256))
+        
+        async def run_test():
+            server = self.make_server(parse_delay=0, processing_delay=0)
+            
+            async def request_processing_stream(url, html_content):
+                yield 'screenshot', png
+                yield 'thumbnails', [b'\xff\xd8jpeg']
+            
+            server.request_processing_stream = request_processing_stream
+            client = TestClient(TestServer(server.app))
+            await client.start_server()
+            try:
+                url = 'https://example.com'
+                full = await (await client.get('/scrape', params={'url': url})).json()
+                bare = await (await client.get('/scrape', params={'url': url, 'images': 'none'})).json()
+                invalid = await client.get('/scrape', params={'url': url, 'images': 'raw'})
+                return full, bare, invalid.status
+            finally:
+                await client.close()
+                await server.http_client.close()
+        
+        full, bare, invalid_status = asyncio.run(run_test())
+        self.assertEqual(base64.b64decode(full['processing_data']['screenshot']), png)
+        self.assertEqual(full['processing_data']['thumbnails'], [base64.b64encode(b'\xff\xd8jpeg').decode()])
+        self.assertIsNone(bare['processing_data']['screenshot'])
+        self.assertEqual(bare['processing_data']['thumbnails'], [])
+        self.assertEqual(invalid_status, 400)
+
+
+class TestJobManager(unittest.TestCase):
+    """Tests para la tabla de trabajos asíncronos"""
+    
+    def test_job_lifecycle(self):
+        """Test de un trabajo desde que se encola hasta que termina"""
+        async def work(job):
+            job.update_stage('fetch', 'done')
+            await asyncio.sleep(0.01)
+            return {'status': 'success'}
+        
+        async def run_test():
+            manager = JobManager(max_jobs=10)
+            job = manager.submit('scrape', {'url': 'https://example.com'}, work)
+            self.assertEqual(job.status, 'queued')
+            await job.task
+            return manager, job
+        
+        manager, job = asyncio.run(run_test())
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result, {'status': 'success'})
+        self.assertEqual(job.to_dict()['stages']['fetch'], 'done')
+        self.assertIs(manager.get(job.id), job)
+    
+    def test_failed_job(self):
+        """Test de un trabajo que lanza una excepción"""
+        async def work(job):
+            raise ValueError('fallo')
+        
+        async def run_test():
+            manager = JobManager()
+            job = manager.submit('scrape', {}, work)
+            await asyncio.sleep(0.01)
+            return job
+        
+        job = asyncio.run(run_test())
+        self.assertEqual(job.status, 'error')
+        self.assertEqual(job.error, 'fallo')
+    
+    def test_expiry_and_bounds(self):
+        """Test de expiración y del límite de la tabla"""
+        clock = FakeClock()
+        
+        async def quick(job):
+            return 'ok'
+        
+        async def slow(job):
+            await asyncio.sleep(10)
+        
+        async def run_test():
+            manager = JobManager(max_jobs=2, ttl=60, clock=clock)
+            done = manager.submit('scrape', {}, quick)
+            await asyncio.sleep(0.01)
+            
+            # El trabajo terminado expira después del TTL
+            clock.now = 100
+            self.assertIsNone(manager.get(done.id))
+            
+            # Con la tabla llena de trabajos activos se rechaza el siguiente
+            manager.submit('scrape', {}, slow)
+            manager.submit('scrape', {}, slow)
+            with self.assertRaises(JobTableFull):
+                manager.submit('scrape', {}, slow)
+            await manager.close()
+            return manager.stats()
+        
+        stats = asyncio.run(run_test())
+        self.assertEqual(stats['rejected'], 1)
+        self.assertEqual(stats['expired'], 1)
+
+
+class TestProcessingConnectionPool(unittest.TestCase):
+    """Tests para el pool de conexiones al servidor de procesamiento"""
+    
+    async def start_echo_server(self):
+        """Servidor que responde cada mensaje recibido en la misma conexión"""
+        self.connections = 0
+        
+        async def handle(reader, writer):
+            self.connections += 1
+            try:
+                while True:
+                    data = await Protocol.receive(reader)
+                    writer.write(Protocol.encode(data))
+                    await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            writer.close()
+        
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        return server, server.sockets[0].getsockname()[1]
+    
+    def test_connections_are_reused(self):
+        """Test que solicitudes sucesivas reutilizan la misma conexión"""
+        async def run_test():
+            server, port = await self.start_echo_server()
+            pool = ProcessingConnectionPool('127.0.0.1', port, min_size=1, max_size=2)
+            await pool.start()
+            
+            replies = []
+            for i in range(3):
+                conn = await pool.acquire()
+                conn.writer.write(Protocol.encode({'n': i}))
+                await conn.writer.drain()
+                replies.append(await Protocol.receive(conn.reader))
+                await pool.release(conn)
+            
+            stats = pool.stats()
+            await pool.close()
+            server.close()
+            await server.wait_closed()
+            return replies, stats
+        
+        replies, stats = asyncio.run(run_test())
+        self.assertEqual(replies, [{'n': 0}, {'n': 1}, {'n': 2}])
+        self.assertEqual(self.connections, 1)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 3)
+        self.assertEqual(stats['idle'], 1)
+    
+    def test_incomplete_conversation_discards_connection(self):
+        """Test que una conexión liberada como no reutilizable se cierra"""
+        async def run_test():
+            server, port = await self.start_echo_server()
+            pool = ProcessingConnectionPool('127.0.0.1', port, min_size=0)
+            
+            conn = await pool.acquire()
+            await pool.release(conn, reusable=False)
+            conn = await pool.acquire()
+            await pool.release(conn)
+            
+            stats = pool.stats()
+            await pool.close()
+            server.close()
+            await server.wait_closed()
+            return stats
+        
+        stats = asyncio.run(run_test())
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['discarded'], 1)
+    
+    def test_legacy_server_skips_handshake_and_reuse(self):
+        """Test que con un servidor de un mensaje por conexión solo se intenta el handshake una vez"""
+        received = []
+        rejected = []
+        
+        async def handle(reader, writer):
+            # Como el Servidor B original: un mensaje simple por conexión
+            try:
+                length = int.from_bytes(await reader.readexactly(4), 'big')
+                if length > 50 * 1024 * 1024:
+                    rejected.append(length)
+                    reply = {'error': 'Processing error: Mensaje demasiado grande'}
+                else:
+                    received.append(json.loads(await reader.readexactly(length)))
+                    reply = {'ok': len(received)}
+                writer.write(Protocol.encode(reply))
+                await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            writer.close()
+        
+        async def run_test():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            pool = ProcessingConnectionPool('127.0.0.1', port, min_size=0, handshake=True)
+            
+            replies = []
+            for i in range(3):
+                conn = await pool.acquire()
+                conn.writer.write(Protocol.encode({'n': i}))
+                await conn.writer.drain()
+                replies.append(await Protocol.receive(conn.reader))
+                await pool.release(conn)
+            
+            stats = pool.stats()
+            await pool.close()
+            server.close()
+            await server.wait_closed()
+            return replies, stats
+        
+        replies, stats = asyncio.run(run_test())
+        self.assertEqual(replies, [{'ok': 1}, {'ok': 2}, {'ok': 3}])
+        self.assertEqual(received, [{'n': 0}, {'n': 1}, {'n': 2}])
+        self.assertEqual(len(rejected), 1)  # Un único HELLO
+        self.assertEqual(stats['created'], 3)
+        self.assertEqual(stats['reused'], 0)
+        self.assertEqual(stats['discarded'], 3)
+        self.assertEqual(stats['legacy_peers'], 3)
+    
+    def test_max_size_limits_connections(self):
+        """Test que nunca hay más de max_size conexiones en uso"""
+        async def run_test():
+            server, port = await self.start_echo_server()
+            pool = ProcessingConnectionPool('127.0.0.1', port, min_size=0, max_size=1)
+            
+            first = await pool.acquire()
+            waiter = asyncio.ensure_future(pool.acquire())
+            await asyncio.sleep(0.05)
+            blocked = not waiter.done()
+            await pool.release(first)
+            second = await asyncio.wait_for(waiter, timeout=1)
+            await pool.release(second)
+            
+            stats = pool.stats()
+            await pool.close()
+            server.close()
+            await server.wait_closed()
+            return blocked, second is first, stats
+        
+        blocked, same, stats = asyncio.run(run_test())
+        self.assertTrue(blocked)
+        self.assertTrue(same)
+        self.assertEqual(stats['created'], 1)
+    
+    def test_health_check_replaces_closed_connections(self):
+        """Test que el mantenimiento descarta conexiones cerradas por el servidor"""
+        async def run_test():
+            server, port = await self.start_echo_server()
+            pool = ProcessingConnectionPool('127.0.0.1', port, min_size=1)
+            await pool.start()
+            
+            conn = await pool.acquire()
+            await pool.release(conn)
+            # Simular que el servidor cerró la conexión ociosa
+            conn.reader.feed_eof()
+            await pool.check_health()
+            
+            stats = pool.stats()
+            await pool.close()
+            server.close()
+            await server.wait_closed()
+            return stats
+        
+        stats = asyncio.run(run_test())
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['discarded'], 1)
+        self.assertEqual(stats['idle'], 1)
+    
+    def test_full_html_sent_compressed(self):
+        """Test que el HTML llega completo al Servidor B y comprimido"""
+        from server_scraping import ScrapingServer
+        
+        html = '<html><body>' + '<p>Texto</p>' * 20000 + '<img src="/al-final.jpg"></body></html>'
+        received = {}
+        
+        async def handle(reader, writer):
+            while True:
+                length = int.from_bytes(await reader.readexactly(4), 'big') & ~Protocol.EXTENDED
+                header = await reader.readexactly(6)
+                frame = Protocol.decode((length | Protocol.EXTENDED).to_bytes(4, 'big')
+                                        + header + await reader.readexactly(length))
+                if header[0] != Protocol.HELLO:
+                    break
+                writer.write(Protocol.encode_hello(Protocol.local_capabilities()))
+            received['wire_bytes'] = length
+            received['compressed'] = bool(header[1] & Protocol.COMPRESSED)
+            received['data'] = frame
+            writer.write(Protocol.encode({'screenshot': None, 'performance': None, 'thumbnails': []}))
+            await writer.drain()
+        
+        async def run_test():
+            processing = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = processing.sockets[0].getsockname()[1]
+            server = ScrapingServer('127.0.0.1', 0, 4, processing_port=port,
+                                    parse_executor='inline', cache_ttl=0)
+            result = await server.request_processing('https://example.com', html)
+            await server.processing_pool.close()
+            await server.http_client.close()
+            processing.close()
+            await processing.wait_closed()
+            return result
+        
+        result = asyncio.run(run_test())
+        self.assertNotIn('error', result)
+        self.assertTrue(received['compressed'])
+        self.assertEqual(received['data']['html'], html)
+        self.assertNotIn('html_truncated', received['data'])
+        self.assertLess(received['wire_bytes'], len(html) // 10)
+
+
+class TestPrefork(unittest.TestCase):
+    """Tests para el modo pre-fork"""
+    
+    def test_reuse_port_shares_address(self):
+        """Test que dos sockets con SO_REUSEPORT escuchan en el mismo puerto"""
+        import socket
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            self.skipTest('SO_REUSEPORT no disponible')
+        
+        first = create_listening_socket('127.0.0.1', 0, reuse_port=True)
+        try:
+            port = first.getsockname()[1]
+            second = create_listening_socket('127.0.0.1', port, reuse_port=True)
+            self.assertEqual(second.getsockname()[1], port)
+            second.close()
+        finally:
+            first.close()
+    
+    def test_registry_roundtrip(self):
+        """Test que los workers publican y leen su información"""
+        with tempfile.TemporaryDirectory() as directory:
+            registry = WorkerRegistry(directory)
+            registry.publish(0, {'pid': 10, 'stats': {}})
+            registry.publish(1, {'pid': 11, 'stats': {}})
+            registry.publish(WorkerRegistry.SUPERVISOR, {'restarts': 0})
+            registry.remove(1)
+            
+            self.assertEqual(registry.workers(), {'0': {'pid': 10, 'stats': {}}})
+            self.assertEqual(registry.read(WorkerRegistry.SUPERVISOR), {'restarts': 0})
+            self.assertIsNone(registry.read(1))
+    
+    def test_aggregate_stats(self):
+        """Test que los contadores se suman y los máximos se combinan"""
+        stats = [
+            {'loop_lag': {'avg_ms': 1.0, 'max_ms': 5.0, 'samples': 10},
+             'cache': {'hits': 3, 'ttl': 300}, 'pool': {'connected': True}},
+            {'loop_lag': {'avg_ms': 3.0, 'max_ms': 2.0, 'samples': 20},
+             'cache': None, 'pool': {'connected': False}},
+        ]
+        
+        self.assertEqual(aggregate_stats(stats), {
+            'loop_lag': {'avg_ms': 2.0, 'max_ms': 5.0, 'samples': 30},
+            'cache': {'hits': 3, 'ttl': 300},
+            'pool': {'connected': False}
+        })
+    
+    def test_job_ids_identify_worker(self):
+        """Test que los ids de trabajo llevan el prefijo del worker"""
+        async def run_test():
+            manager = JobManager(id_prefix='w2-')
+            
+            async def work(job):
+                return {}
+            
+            job = manager.submit('scrape', {}, work)
+            await manager.close()
+            return job.id
+        
+        self.assertTrue(asyncio.run(run_test()).startswith('w2-'))
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests para las métricas en formato Prometheus"""
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test que los buckets se exponen acumulados con +Inf, suma y cantidad"""
+        metrics = MetricsRegistry()
+        histogram = metrics.histogram('latency_seconds', 'Latencia', ['stage'], buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, stage='fetch')
+        
+        text = metrics.render()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{stage="fetch",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{stage="fetch",le="1.0"} 3', text)
+        self.assertIn('latency_seconds_bucket{stage="fetch",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_sum{stage="fetch"} 3.65', text)
+        self.assertIn('latency_seconds_count{stage="fetch"} 4', text)
+    
+    def test_counter_and_callback_gauge(self):
+        """Test de contadores con etiquetas y gauges leídos al exponer"""
+        metrics = MetricsRegistry()
+        errors = metrics.counter('errors_total', 'Errores', ['type'])
+        errors.inc(type='TimeoutError')
+        errors.inc(type='TimeoutError')
+        state = {'active': 3}
+        metrics.gauge('slots', 'Ocupación', ['state'], func=lambda: dict(state))
+        
+        state['active'] = 5
+        text = metrics.render()
+        self.assertIn('errors_total{type="TimeoutError"} 2', text)
+        self.assertIn('slots{state="active"} 5', text)
+        
+        with self.assertRaises(ValueError):
+            errors.inc()
+    
+    def test_merge_snapshots(self):
+        """Test que las métricas de varios procesos se suman"""
+        snapshots = []
+        for count in (1, 2):
+            metrics = MetricsRegistry()
+            metrics.counter('requests_total', 'Requests').inc(count)
+            snapshots.append(metrics.snapshot())
+        
+        self.assertIn('requests_total 3', render_snapshot(merge_snapshots(snapshots)))
+    
+    def test_merge_gauges_by_mode(self):
+        """Test que los gauges se combinan según su modo y no siempre sumando"""
+        snapshots = {}
+        for worker_id, lag in (('0', 0.2), ('1', 0.05)):
+            metrics = MetricsRegistry()
+            metrics.counter('requests_total', 'Requests').inc(2)
+            metrics.gauge('in_flight', 'En curso').set(3)
+            metrics.gauge('lag_seconds', 'Lag', merge='max').set(lag)
+            metrics.gauge('load', 'Carga', merge='avg').set(lag * 10)
+            slots = metrics.gauge('slots', 'Slots', ['state'], merge='worker')
+            slots.set(32, state='limit')
+            snapshots[worker_id] = metrics.snapshot()
+        
+        text = render_snapshot(merge_snapshots(snapshots))
+        self.assertIn('requests_total 4', text)
+        self.assertIn('in_flight 6', text)
+        self.assertIn('lag_seconds 0.2\n', text)
+        self.assertIn('load 1.25\n', text)
+        self.assertIn('slots{state="limit",worker="0"} 32', text)
+        self.assertIn('slots{state="limit",worker="1"} 32', text)
+        self.assertNotIn('slots{state="limit"} 64', text)
+        
+        with self.assertRaises(ValueError):
+            MetricsRegistry().gauge('x', 'X', merge='min')
+    
+    def test_metrics_endpoint(self):
+        """Test que /metrics cuenta los requests por endpoint y status"""
+        from aiohttp.test_utils import TestClient, TestServer
+        from server_scraping import ScrapingServer
+        
+        async def run_test():
+            server = ScrapingServer('127.0.0.1', 0, 4, parse_executor='inline', cache_ttl=0)
+            client = TestClient(TestServer(server.app))
+            await client.start_server()
+            try:
+                await client.get('/health')
+                await client.get('/no-existe')
+                response = await client.get('/metrics')
+                return response.headers['Content-Type'], await response.text()
+            finally:
+                await client.close()
+                await server.http_client.close()
+        
+        content_type, text = asyncio.run(run_test())
+        self.assertTrue(content_type.startswith('text/plain'))
+        self.assertIn('scraper_http_requests_total{endpoint="/health",status="200"} 1', text)
+        self.assertIn('scraper_http_requests_total{endpoint="unmatched",status="404"} 1', text)
+        self.assertIn('scraper_requests_in_flight{endpoint="/metrics"} 1', text)
+        self.assertIn('scraper_http_client_slots{state="limit"} 4', text)
+
+
+class TestAdmissionController(unittest.TestCase):
+    """Tests para el control de admisión"""
+    
+    def test_fast_path_and_queue_full(self):
+        """Test que con la cola llena el rechazo es inmediato"""
+        async def run_test():
+            admission = AdmissionController(max_concurrent=1, max_queue=1, max_wait=5)
+            self.assertEqual(await admission.acquire(), 0.0)
+            
+            waiter = asyncio.ensure_future(admission.acquire())
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejected) as ctx:
+                await admission.acquire()
+            
+            admission.release(0.5)
+            await waiter
+            admission.release(0.5)
+            return admission, ctx.exception
+        
+        admission, rejected = asyncio.run(run_test())
+        self.assertEqual(rejected.reason, 'queue_full')
+        self.assertGreaterEqual(rejected.retry_after, 1)
+        self.assertEqual(admission.active, 0)
+        self.assertEqual(admission.admitted, 2)
+        self.assertEqual(admission.rejected['queue_full'], 1)
+    
+    def test_wait_timeout(self):
+        """Test que un request que espera demasiado se rechaza"""
+        async def run_test():
+            admission = AdmissionController(max_concurrent=1, max_queue=4, max_wait=0.05)
+            await admission.acquire()
+            with self.assertRaises(AdmissionRejected) as ctx:
+                await admission.acquire()
+            return admission, ctx.exception
+        
+        admission, rejected = asyncio.run(run_test())
+        self.assertEqual(rejected.reason, 'timeout')
+        self.assertEqual(admission.queue_length, 0)
+        self.assertEqual(admission.active, 1)
+    
+    def test_release_hands_slot_in_order(self):
+        """Test que los lugares liberados se entregan en orden de llegada"""
+        async def run_test():
+            admission = AdmissionController(max_concurrent=1, max_queue=4, max_wait=5)
+            await admission.acquire()
+            order = []
+            
+            async def wait(n):
+                await admission.acquire()
+                order.append(n)
+            
+            tasks = [asyncio.ensure_future(wait(n)) for n in range(3)]
+            await asyncio.sleep(0)
+            for _ in range(3):
+                admission.release()
+                await asyncio.sleep(0)
+            await asyncio.gather(*tasks)
+            return order, admission.active
+        
+        order, active = asyncio.run(run_test())
+        self.assertEqual(order, [0, 1, 2])
+        self.assertEqual(active, 1)
+    
+    def test_codel_shortens_wait_when_queue_persists(self):
+        """Test que con la cola persistente la espera máxima baja al objetivo"""
+        clock = FakeClock()
+        
+        async def run_test():
+            admission = AdmissionController(
+                max_concurrent=1, max_queue=4, max_wait=5,
+                codel_target=0.01, codel_interval=0.1, clock=clock
+            )
+            await admission.acquire()
+            first = asyncio.ensure_future(admission.acquire())
+            await asyncio.sleep(0)
+            self.assertFalse(admission.overloaded())
+            
+            # La cola no se vació durante más de un intervalo
+            clock.now = 1.0
+            self.assertTrue(admission.overloaded())
+            with self.assertRaises(AdmissionRejected) as ctx:
+                await admission.acquire()
+            
+            first.cancel()
+            return admission, ctx.exception
+        
+        admission, rejected = asyncio.run(run_test())
+        self.assertEqual(rejected.reason, 'codel')
+        self.assertEqual(admission.queue_length, 0)
+    
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        """Test que cancelar un request en cola no pierde lugares"""
+        async def run_test():
+            admission = AdmissionController(max_concurrent=1, max_queue=4, max_wait=5)
+            await admission.acquire()
+            
+            async def use_slot():
+                async with admission.slot():
+                    pass
+            
+            waiter = asyncio.ensure_future(use_slot())
+            await asyncio.sleep(0)
+            
+            # El lugar se entrega y el request se cancela a la vez
+            admission.release()
+            waiter.cancel()
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                pass
+            return admission
+        
+        admission = asyncio.run(run_test())
+        self.assertEqual(admission.active, 0)
+        self.assertEqual(admission.queue_length, 0)
+    
+    def test_overloaded_server_answers_503(self):
+        """Test que el servidor responde 503 con Retry-After al saturarse"""
+        from aiohttp.test_utils import TestClient, TestServer
+        from server_scraping import ScrapingServer
+        
+        async def run_test():
+            server = ScrapingServer(
+                '127.0.0.1', 0, 4, parse_executor='inline', cache_ttl=0,
+                max_inflight=1, max_queue=0
+            )
+            release = asyncio.Event()
+            
+            async def slow_scrape(url):
+                await release.wait()
+                return {'url': url, 'status': 'success'}
+            
+            server.scrape = slow_scrape
+            client = TestClient(TestServer(server.app))
+            await client.start_server()
+            try:
+                first = asyncio.ensure_future(client.get('/scrape?url=https://example.com/a'))
+                while server.admission.active == 0:
+                    await asyncio.sleep(0.01)
+                
+                rejected = await client.get('/scrape?url=https://example.com/b')
+                health = await client.get('/health')
+                release.set()
+                accepted = await first
+                return rejected.status, rejected.headers.get('Retry-After'), \
+                    health.status, accepted.status
+            finally:
+                await client.close()
+                await server.http_client.close()
+        
+        rejected, retry_after, health, accepted = asyncio.run(run_test())
+        self.assertEqual(rejected, 503)
+        self.assertEqual(retry_after, '1')
+        self.assertEqual(health, 200)
+        self.assertEqual(accepted, 200)
+
+
+class TestHostScheduler(unittest.TestCase):
+    """Tests para el planificador de descargas por host"""
+    
+    def test_rate_limit_per_host(self):
+        """Test que el token bucket espacia los requests a un mismo host"""
+        async def run_test():
+            scheduler = HostScheduler(max_concurrent=10, rate=20, burst=1)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            for _ in range(3):
+                async with scheduler.slot('a.example'):
+                    pass
+            elapsed = loop.time() - start
+            
+            # Otro host no espera por la tasa del primero
+            other_start = loop.time()
+            async with scheduler.slot('b.example'):
+                pass
+            return elapsed, loop.time() - other_start
+        
+        elapsed, other = asyncio.run(run_test())
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(other, 0.04)
+    
+    def test_max_per_host(self):
+        """Test que un host no supera su máximo de descargas simultáneas"""
+        async def run_test():
+            scheduler = HostScheduler(max_concurrent=10, max_per_host=1)
+            await scheduler.acquire('a.example')
+            second = asyncio.ensure_future(scheduler.acquire('a.example'))
+            await scheduler.acquire('b.example')
+            await asyncio.sleep(0)
+            blocked = not second.done()
+            
+            scheduler.release('a.example')
+            await second
+            return blocked, scheduler.active
+        
+        blocked, active = asyncio.run(run_test())
+        self.assertTrue(blocked)
+        self.assertEqual(active, 2)
+    
+    def test_round_robin_between_hosts(self):
+        """Test que los lugares se reparten en round-robin entre hosts"""
+        async def run_test():
+            scheduler = HostScheduler(max_concurrent=1, max_per_host=5)
+            await scheduler.acquire('a.example')
+            order = []
+            
+            async def fetch(host):
+                async with scheduler.slot(host):
+                    order.append(host[0])
+            
+            tasks = [asyncio.ensure_future(fetch(host)) for host in
+                     ('a.example',) * 3 + ('b.example',) * 2]
+            await asyncio.sleep(0)
+            scheduler.release('a.example')
+            await asyncio.gather(*tasks)
+            return order, scheduler.stats()
+        
+        order, stats = asyncio.run(run_test())
+        self.assertEqual(order, ['a', 'b', 'a', 'b', 'a'])
+        self.assertEqual((stats['active'], stats['waiting'], stats['hosts']), (0, 0, 0))
+    
+    def test_throttle_and_recovery(self):
+        """Test que 429/503 reducen la tasa y las respuestas exitosas la recuperan"""
+        clock = FakeClock()
+        
+        async def run_test():
+            scheduler = HostScheduler(max_per_host=4, rate=None, clock=clock)
+            async with scheduler.slot('a.example'):
+                scheduler.feedback('a.example', 429)
+            throttled = scheduler.stats()['throttled']['a.example']['rate']
+            
+            for _ in range(5):
+                clock.now += 1
+                async with scheduler.slot('a.example'):
+                    scheduler.feedback('a.example', 200)
+            return throttled, scheduler.stats()
+        
+        throttled, stats = asyncio.run(run_test())
+        self.assertEqual(throttled, 2.0)
+        self.assertEqual(stats['throttle_events'], 1)
+        self.assertEqual(stats['throttled'], {})
+    
+    def test_retry_after_blocks_host(self):
+        """Test que Retry-After demora los siguientes requests al host"""
+        clock = FakeClock()
+        
+        async def run_test():
+            scheduler = HostScheduler(rate=100, clock=clock)
+            async with scheduler.slot('a.example'):
+                scheduler.feedback('a.example', 503, '30')
+            return scheduler.stats()['throttled']['a.example']
+        
+        throttled = asyncio.run(run_test())
+        self.assertEqual(throttled, {'rate': 50.0, 'blocked_for': 30.0})
+    
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        """Test que cancelar un request en espera no pierde lugares"""
+        async def run_test():
+            scheduler = HostScheduler(max_concurrent=1)
+            await scheduler.acquire('a.example')
+            waiter = asyncio.ensure_future(scheduler.acquire('b.example'))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            scheduler.release('a.example')
+            
+            async with scheduler.slot('c.example'):
+                pass
+            return scheduler.stats()
+        
+        stats = asyncio.run(run_test())
+        self.assertEqual((stats['active'], stats['waiting'], stats['hosts_waiting']), (0, 0, 0))
+    
+    def test_parse_retry_after(self):
+        """Test de Retry-After en segundos y como fecha HTTP"""
+        self.assertEqual(parse_retry_after('120', 0), 120.0)
+        self.assertEqual(parse_retry_after('Thu, 01 Jan 1970 00:01:00 GMT', 0), 60.0)
+        self.assertIsNone(parse_retry_after('mañana', 0))
+        self.assertIsNone(parse_retry_after(None, 0))
+
+
+class TestCrawler(unittest.TestCase):
+    """Tests para el crawl recursivo"""
+    
+    # Sitio de prueba: cada página enlaza a sus dos hijas en un árbol binario
+    BASE = 'https://site.example/p/'
+    
+    async def fetch(self, url):
+        """Fetch falso que devuelve los enlaces de la página"""
+        await asyncio.sleep(0)
+        n = int(url.rsplit('/', 1)[1])
+        links = [f'{self.BASE}{2 * n}', f'{self.BASE}{2 * n + 1}', url,
+                 'https://other.example/', f'https://site.example/private/{n}']
+        return {'url': url, 'status': 'success', 'scraping_data': {'links': links}}
+    
+    def crawl(self, crawler, seeds):
+        async def run_test():
+            return [record async for record in crawler.crawl(seeds)]
+        return asyncio.run(run_test())
+    
+    def test_breadth_first_with_depth_limit(self):
+        """Test que se visita por niveles hasta la profundidad máxima"""
+        crawler = Crawler(self.fetch, max_depth=2, max_pages=100, concurrency=1,
+                          exclude='/private/')
+        records = self.crawl(crawler, [f'{self.BASE}1'])
+        
+        self.assertEqual([r['url'].rsplit('/', 1)[1] for r in records],
+                         ['1', '2', '3', '4', '5', '6', '7'])
+        self.assertEqual([r['depth'] for r in records], [0, 1, 1, 2, 2, 2, 2])
+        self.assertEqual(records[0]['links_queued'], 2)
+        self.assertEqual(records[-1]['links_queued'], 0)
+    
+    def test_page_limit_and_scope(self):
+        """Test del límite de páginas y de los filtros de alcance"""
+        crawler = Crawler(self.fetch, max_depth=10, max_pages=5, concurrency=4,
+                          include=r'/p/\d+$')
+        records = self.crawl(crawler, [f'{self.BASE}1'])
+        stats = crawler.stats()
+        
+        self.assertEqual(len(records), 5)
+        self.assertEqual(stats['pages'], 5)
+        self.assertTrue(all(r['url'].startswith(self.BASE) for r in records))
+        self.assertEqual(len({r['url'] for r in records}), 5)
+    
+    def test_other_domains_when_allowed(self):
+        """Test que same_domain=False sigue enlaces externos"""
+        crawler = Crawler(self.fetch, max_depth=1, max_pages=100, same_domain=False,
+                          include='other|/p/')
+        
+        async def fetch(url):
+            if 'other' in url:
+                raise ConnectionError('unreachable')
+            return await self.fetch(url)
+        
+        crawler.fetch = fetch
+        records = self.crawl(crawler, [f'{self.BASE}1'])
+        failed = [r for r in records if r['status'] == 'error']
+        
+        self.assertEqual([r['url'] for r in failed], ['https://other.example/'])
+        self.assertEqual(failed[0]['message'], 'unreachable')
+        self.assertEqual(crawler.stats()['errors'], 1)
+    
+    def test_bloom_filter(self):
+        """Test que el filtro de Bloom no tiene falsos negativos y escala"""
+        seen = BloomFilter(capacity=100, error_rate=0.01)
+        urls = [f'https://site.example/p/{n}' for n in range(1000)]
+        
+        added = sum(seen.add(url) for url in urls[:500])
+        self.assertFalse(seen.add(urls[0]))
+        self.assertTrue(all(url in seen for url in urls[:500]))
+        
+        # Los falsos positivos (al agregar o consultar) están acotados
+        false_positives = sum(url in seen for url in urls[500:])
+        self.assertGreater(added, 480)
+        self.assertLess(false_positives, 25)
+        self.assertEqual(len(seen), added)
+        self.assertLess(seen.nbytes, 2000)
+    
+    def test_crawl_endpoint(self):
+        """Test que /crawl devuelve una línea por página y el resumen"""
+        from aiohttp.test_utils import TestClient, TestServer
+        from server_scraping import ScrapingServer
+        
+        async def run_test():
+            server = ScrapingServer('127.0.0.1', 0, 4, parse_executor='inline', cache_ttl=0)
+            server.fetch_and_parse = self.fetch
+            client = TestClient(TestServer(server.app))
+            await client.start_server()
+            try:
+                response = await client.post('/crawl', json={
+                    'url': f'{self.BASE}1', 'max_depth': 1, 'exclude': '/private/',
+                    'robots': False
+                })
+                lines = [json.loads(line) for line in (await response.text()).splitlines()]
+                invalid = await client.post('/crawl', json={'url': f'{self.BASE}1', 'include': '('})
+                return lines, invalid.status
+            finally:
+                await client.close()
+                await server.http_client.close()
+        
+        lines, invalid_status = asyncio.run(run_test())
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[-1]['summary']['pages'], 3)
+        self.assertIn('pages_per_sec', lines[-1]['summary'])
+        self.assertEqual(invalid_status, 400)
+
+
+class TestDiskFrontier(unittest.TestCase):
+    """Tests para la frontera en disco y los checkpoints del crawl"""
+    
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = self._tmp.name
+    
+    def tearDown(self):
+        self._tmp.cleanup()
+    
+    def test_memory_bounded_and_fifo_per_host(self):
+        """Test que la memoria queda acotada y cada host conserva su orden"""
+        frontier = DiskFrontier(self.directory, hot_size=10, max_hot=25,
+                                segment_bytes=2048, write_buffer_bytes=512)
+        for n in range(3000):
+            frontier.push(f'https://h{n % 3}.example/{n}', 1)
+        
+        stats = frontier.stats()
+        self.assertEqual(stats['pending'], 3000)
+        self.assertLessEqual(stats['in_memory'], 25)
+        
+        popped = [frontier.pop()[0] for _ in range(3000)]
+        self.assertEqual(len(frontier), 0)
+        self.assertLessEqual(frontier.stats()['in_memory'], 25)
+        
+        # Round-robin entre hosts y FIFO dentro de cada uno
+        self.assertEqual([url.split('/')[2][1] for url in popped[:6]], list('012012'))
+        for host in range(3):
+            numbers = [int(url.rsplit('/', 1)[1]) for url in popped
+                       if url.startswith(f'https://h{host}.')]
+            self.assertEqual(numbers, sorted(numbers))
+    
+    def test_restore_from_snapshot(self):
+        """Test que se retoma desde el snapshot y se descarta lo posterior"""
+        frontier = DiskFrontier(self.directory, hot_size=2, segment_bytes=256)
+        for n in range(20):
+            frontier.push(f'https://a.example/{n}', 0)
+        
+        first = frontier.pop()[0]
+        frontier.done(first)
+        in_flight = frontier.pop()[0]
+        
+        snapshot = frontier.snapshot()
+        frontier.sync(snapshot)
+        frontier.commit(snapshot)
+        
+        # Lo que pasa después del checkpoint se pierde con el "crash"
+        frontier.push('https://a.example/late', 1)
+        frontier.pop()
+        
+        restored = DiskFrontier(self.directory, hot_size=2, segment_bytes=256)
+        restored.restore(snapshot)
+        urls = [restored.pop()[0] for _ in range(len(restored))]
+        
+        self.assertEqual(urls[0], in_flight)
+        self.assertEqual(urls[1:], [f'https://a.example/{n}' for n in range(2, 20)])
+    
+    def test_crawl_resumes_from_checkpoint(self):
+        """Test que un crawl interrumpido se retoma sin repetir páginas"""
+        base = 'https://site.example/p/'
+        
+        async def fetch(url):
+            await asyncio.sleep(0)
+            n = int(url.rsplit('/', 1)[1])
+            return {'url': url, 'status': 'success',
+                    'scraping_data': {'links': [f'{base}{2 * n}', f'{base}{2 * n + 1}']}}
+        
+        def new_crawler():
+            return Crawler(fetch, max_depth=3, max_pages=100, concurrency=1,
+                           state_dir=self.directory, checkpoint_every=1)
+        
+        async def run_test():
+            # Primera ejecución: se interrumpe tras 5 páginas
+            crawler = new_crawler()
+            first = []
+            records = crawler.crawl([f'{base}1'])
+            async for record in records:
+                first.append(record['url'])
+                if len(first) == 5:
+                    break
+            await records.aclose()
+            
+            crawler = new_crawler()
+            second = [record['url'] async for record in crawler.crawl([f'{base}1'])]
+            stats = crawler.stats()
+            
+            again = new_crawler()
+            third = [record['url'] async for record in again.crawl([f'{base}1'])]
+            return first, second, third, stats
+        
+        first, second, third, stats = asyncio.run(run_test())
+        self.assertEqual(len(first), 5)
+        self.assertEqual(set(first) & set(second), set())
+        self.assertEqual(len(set(first) | set(second)), 15)
+        self.assertTrue(stats['resumed'])
+        self.assertEqual(stats['pages'], 15)
+        self.assertEqual(third, [])
+    
+    def test_bloom_filter_roundtrip(self):
+        """Test que el filtro de URLs vistas se serializa sin pérdidas"""
+        seen = BloomFilter(capacity=10)
+        for n in range(50):
+            seen.add(f'https://site.example/{n}')
+        
+        restored = BloomFilter.loads(seen.dumps())
+        self.assertEqual(len(restored), len(seen))
+        self.assertTrue(all(f'https://site.example/{n}' in restored for n in range(50)))
+        self.assertFalse(restored.add('https://site.example/0'))
+
+
+class TestRobots(unittest.TestCase):
+    """Tests para la caché y el matcher de robots.txt"""
+    
+    ROBOTS = """
+User-agent: *
+Disallow: /private/
+Allow: /private/public
+Disallow: /*.pdf$
+
+User-agent: OtherBot
+User-agent: WebScraper
+Disallow: /search*q=
+Allow: /search
+"""
+    
+    class FakeHTTPClient:
+        """Cliente falso que cuenta las descargas de robots.txt"""
+        
+        def __init__(self, pages):
+            self.pages = pages
+            self.requests = []
+        
+        async def fetch_page(self, url, **kwargs):
+            self.requests.append(url)
+            await asyncio.sleep(0.01)
+            page = self.pages[url]
+            if isinstance(page, Exception):
+                raise page
+            return dict(page, etag=None, last_modified=None)
+    
+    def test_longest_match_wins(self):
+        """Test de precedencia: gana la regla más larga y, si empatan, Allow"""
+        rules = RobotsRules.parse(self.ROBOTS, 'Googlebot')
+        
+        self.assertFalse(rules.allowed('/private/data'))
+        self.assertTrue(rules.allowed('/private/public/page'))
+        self.assertTrue(rules.allowed('/public'))
+        self.assertTrue(RobotsRules([('/a', False), ('/a', True)]).allowed('/a'))
+    
+    def test_wildcards_and_anchor(self):
+        """Test de '*' y '$' en los patrones"""
+        rules = RobotsRules.parse(self.ROBOTS, 'Googlebot')
+        
+        self.assertFalse(rules.allowed('/docs/file.pdf'))
+        self.assertTrue(rules.allowed('/docs/file.pdf?download=1'))
+        self.assertTrue(rules.allowed('/docs/file.pdfx'))
+    
+    def test_user_agent_group(self):
+        """Test que se usa el grupo propio (no '*') y sus reglas"""
+        rules = RobotsRules.parse(self.ROBOTS, 'webscraper')
+        
+        self.assertTrue(rules.allowed('/private/data'))
+        self.assertFalse(rules.allowed('/search?lang=en&q=python'))
+        self.assertTrue(rules.allowed('/search?lang=en'))
+        self.assertTrue(rules.allowed('/robots.txt'))
+    
+    def test_cache_single_flight_and_ttl(self):
+        """Test que cada origen se descarga una vez y vence según max-age"""
+        clock = FakeClock()
+        http = self.FakeHTTPClient({
+            'https://a.example/robots.txt': {
+                'status': 200, 'content': self.ROBOTS, 'cache_control': 'public, max-age=120'
+            }
+        })
+        cache = RobotsCache(http, clock=clock)
+        
+        async def run_test():
+            first = await asyncio.gather(*[
+                cache.allowed(f'https://a.example/search?q={n}') for n in range(5)
+            ])
+            cached = await cache.allowed('https://A.example/private/x')
+            clock.now = 121
+            await cache.allowed('https://a.example/')
+            return first, cached
+        
+        first, cached = asyncio.run(run_test())
+        self.assertEqual(first, [False] * 5)
+        self.assertTrue(cached)
+        self.assertEqual(len(http.requests), 2)
+        self.assertEqual(cache.stats()['coalesced'], 4)
+        self.assertEqual(cache.stats()['blocked'], 5)
+    
+    def test_cache_errors_and_eviction(self):
+        """Test de 404 (todo permitido), 503/errores (todo prohibido) y LRU"""
+        http = self.FakeHTTPClient({
+            'https://missing.example/robots.txt': {
+                'status': 404, 'content': 'Not found', 'cache_control': None
+            },
+            'https://down.example/robots.txt': {
+                'status': 503, 'content': '', 'cache_control': None
+            },
+            'https://broken.example/robots.txt': ConnectionError('unreachable')
+        })
+        cache = RobotsCache(http, max_entries=2)
+        
+        async def run_test():
+            return [
+                await cache.allowed('https://missing.example/any'),
+                await cache.allowed('https://down.example/any'),
+                await cache.allowed('https://broken.example/any')
+            ]
+        
+        self.assertEqual(asyncio.run(run_test()), [True, False, False])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['errors'], 2)
+    
+    def test_crawler_skips_blocked_pages(self):
+        """Test que el crawl no descarga las páginas prohibidas"""
+        base = 'https://site.example/'
+        fetched = []
+        
+        async def fetch(url):
+            fetched.append(url)
+            links = [f'{base}private/{n}' for n in range(3)] + [f'{base}ok']
+            return {'url': url, 'status': 'success', 'scraping_data': {'links': links}}
+        
+        http = self.FakeHTTPClient({
+            f'{base}robots.txt': {
+                'status': 200, 'content': 'User-agent: *\nDisallow: /private/', 'cache_control': None
+            }
+        })
+        crawler = Crawler(fetch, max_depth=1, max_pages=10, robots=RobotsCache(http))
+        
+        async def run_test():
+            return [record async for record in crawler.crawl([base])]
+        
+        records = asyncio.run(run_test())
+        self.assertEqual(sorted(fetched), [base, f'{base}ok'])
+        self.assertEqual(sum(r['status'] == 'blocked' for r in records), 3)
+        self.assertEqual(crawler.stats()['blocked'], 3)
+        self.assertEqual(crawler.stats()['pages'], 2)
+
+
 def run_tests():
     """Ejecutar todos los tests"""
     # Crear suite de tests
@@ -311,7 +1965,26 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestHTMLParser))
     suite.addTests(loader.loadTestsFromTestCase(TestMetadataExtractor))
     suite.addTests(loader.loadTestsFromTestCase(TestAsyncHTTPClient))
+    suite.addTests(loader.loadTestsFromTestCase(TestBoundedDownloads))
+    suite.addTests(loader.loadTestsFromTestCase(TestHeadParser))
     suite.addTests(loader.loadTestsFromTestCase(TestHTMLParserEdgeCases))
+    suite.addTests(loader.loadTestsFromTestCase(TestExtraction))
+    suite.addTests(loader.loadTestsFromTestCase(TestLoopLagMonitor))
+    suite.addTests(loader.loadTestsFromTestCase(TestResponseCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestCompression))
+    suite.addTests(loader.loadTestsFromTestCase(TestSingleFlight))
+    suite.addTests(loader.loadTestsFromTestCase(TestNormalizeURL))
+    suite.addTests(loader.loadTestsFromTestCase(TestScrapeMany))
+    suite.addTests(loader.loadTestsFromTestCase(TestScrapePipeline))
+    suite.addTests(loader.loadTestsFromTestCase(TestJobManager))
+    suite.addTests(loader.loadTestsFromTestCase(TestProcessingConnectionPool))
+    suite.addTests(loader.loadTestsFromTestCase(TestPrefork))
+    suite.addTests(loader.loadTestsFromTestCase(TestMetrics))
+    suite.addTests(loader.loadTestsFromTestCase(TestAdmissionController))
+    suite.addTests(loader.loadTestsFromTestCase(TestHostScheduler))
+    suite.addTests(loader.loadTestsFromTestCase(TestCrawler))
+    suite.addTests(loader.loadTestsFromTestCase(TestDiskFrontier))
+    suite.addTests(loader.loadTestsFromTestCase(TestRobots))
     
     # Ejecutar
     runner = unittest.TextTestRunner(verbosity=2)